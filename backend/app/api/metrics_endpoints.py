@@ -0,0 +1,17 @@
+# app/api/metrics_endpoints.py
+from fastapi import APIRouter
+from backend.app.dependencies import get_embedding_cache, get_search_engine
+from backend.app.utils.resource_pools import pool_stats
+
+router = APIRouter()
+
+
+@router.get("/metrics")
+async def metrics():
+    """Resource pool usage, retrieval latency and review fill rate per retrieval mode, and cache hit rates."""
+    embedding_cache = get_embedding_cache()
+    return {
+        "pools": pool_stats(),
+        "retrieval": get_search_engine().stats(),
+        "caches": {"embeddings": embedding_cache.stats() if embedding_cache is not None else None},
+    }
@@ -1,68 +1,295 @@
 # app/api/search_endpoints.py
-from fastapi import APIRouter, Depends, HTTPException
-from typing import Dict, Any, List
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from typing import Dict, Any, AsyncIterator, List, Optional, Tuple
 from backend.app.core.search_service import SearchService  # Changed to absolute import
 from backend.app.core.rag_pipeline import RAGPipeline  # Changed to absolute import
 from backend.app.dependencies import get_search_service_dep, get_rag_pipeline_dep  # Updated dependency import
+from backend.app.utils.deadline import DeadlineExceeded, deadline_scope
+from backend.app.config import SEARCH_DEADLINE_SECONDS
 from backend.app.schemas.llm_outputs import ProductAnalysis
-from backend.app.schemas.search import ProductReview, ProductSearchResult, SearchResponse
+from backend.app.schemas.search import (
+    BatchSearchRequest,
+    BatchSearchResponse,
+    ProductReview,
+    ProductSearchResult,
+    SearchFilters,
+    SearchResponse,
+)
+import asyncio
+import json
 import logging
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
 
+def _request_budget(deadline_ms: Optional[int]) -> Optional[float]:
+    """Seconds this request may take: the client's `deadline_ms` or the configured default."""
+    if deadline_ms is not None:
+        return max(0, deadline_ms) / 1000
+    return SEARCH_DEADLINE_SECONDS if SEARCH_DEADLINE_SECONDS > 0 else None
+
+
+def _search_filters(
+    category: Optional[str],
+    min_rating: Optional[float],
+    min_price: Optional[float],
+    max_price: Optional[float],
+) -> Optional[SearchFilters]:
+    """Filters from the query parameters, or None when none were given."""
+    try:
+        filters = SearchFilters(
+            category=category, min_rating=min_rating, min_price=min_price, max_price=max_price
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    return None if filters.is_empty() else filters
+
+
+async def _embed_and_check_cache(
+    search_service: SearchService,
+    query: str,
+    products_k: int,
+    bypass_cache: bool,
+    filters: Optional[SearchFilters] = None,
+) -> Tuple[Optional[List[float]], Optional[SearchResponse]]:
+    """Embed the query for the semantic cache and return a cached response on a hit.
+
+    Queries the lexical index answers directly are neither embedded nor cached.
+    """
+    if search_service.semantic_cache is None or search_service.is_exact_match(query, products_k, filters):
+        return None, None
+    query_embedding = await search_service.embed_query(query)
+    if bypass_cache:
+        return query_embedding, None
+    return query_embedding, search_service.lookup_cached_response(query, query_embedding, products_k, filters)
+
+
+def _build_result_items(
+    search_results: List[Dict[str, Any]], analysis_map: Dict[str, ProductAnalysis]
+) -> List[ProductSearchResult]:
+    response_items: List[ProductSearchResult] = []
+    for product in search_results:
+        asin = product.get("asin") or "unknown"
+        reviews_payload = [
+            ProductReview(
+                content=review.get("content", ""),
+                rating=review.get("rating"),
+                verified_purchase=review.get("verified_purchase"),
+                user_id=review.get("user_id"),
+                timestamp=review.get("timestamp"),
+                similarity=review.get("similarity"),
+                has_rating=review.get("has_rating"),
+            )
+            for review in product.get("reviews", [])
+        ]
+
+        response_items.append(
+            ProductSearchResult(
+                asin=asin,
+                product_title=product.get("product_title", ""),
+                cleaned_item_description=product.get("cleaned_item_description", ""),
+                product_categories=product.get("product_categories", ""),
+                similarity=product.get("similarity"),
+                avg_rating=product.get("avg_rating"),
+                rating_count=product.get("rating_count"),
+                displayed_rating=product.get("displayed_rating"),
+                combined_score=product.get("combined_score"),
+                reviews=reviews_payload,
+                analysis=analysis_map.get(asin),
+            )
+        )
+    return response_items
+
+
+def _cache_if_complete(
+    search_service: SearchService,
+    query_embedding: Optional[List[float]],
+    products_k: int,
+    response: SearchResponse,
+    filters: Optional[SearchFilters] = None,
+) -> None:
+    # Bypassing only skips the lookup; a fresh response still refreshes the cache.
+    if query_embedding is not None and not any(
+        RAGPipeline.is_placeholder(item.analysis) for item in response.results
+    ):
+        search_service.cache_response(query_embedding, products_k, response, filters)
+
+
 # app/api/search_endpoints.py
 @router.get("/search", response_model=SearchResponse)
 async def hybrid_search(
     query: str,
     products_k: int = 3,
+    bypass_cache: bool = False,
+    deadline_ms: Optional[int] = None,
+    category: Optional[str] = None,
+    min_rating: Optional[float] = Query(None, ge=0, le=5),
+    min_price: Optional[float] = Query(None, ge=0),
+    max_price: Optional[float] = Query(None, ge=0),
     search_service: SearchService = Depends(get_search_service_dep),
     rag_pipeline: RAGPipeline = Depends(get_rag_pipeline_dep),
 ):
+    """Retrieve products and their analyses within the request deadline.
+
+    Analyses still running when the deadline passes are returned as placeholders, so a
+    slow LLM call bounds the latency instead of failing the request. `category` (exact
+    main category), `min_rating`, `min_price` and `max_price` restrict which products
+    retrieval considers.
+    """
     logger.info("Entering hybrid_search endpoint")  # Added log statement
+    filters = _search_filters(category, min_rating, min_price, max_price)
     try:
-        search_results = await search_service.search_products(query, products_k)
-        analyses = await rag_pipeline.generate_batch_explanations(query, search_results)
+        with deadline_scope(_request_budget(deadline_ms)):
+            query_embedding, cached = await _embed_and_check_cache(
+                search_service, query, products_k, bypass_cache, filters
+            )
+            if cached is not None:
+                return cached
+
+            search_results = await search_service.search_products(
+                query, products_k, query_embedding=query_embedding, filters=filters
+            )
+            analyses = await rag_pipeline.generate_batch_explanations(query, search_results)
         analysis_map: Dict[str, ProductAnalysis] = {
             analysis.asin: analysis for analysis in analyses if analysis.asin
         }
 
-        response_items: List[ProductSearchResult] = []
-        for product in search_results:
-            asin = product.get("asin") or "unknown"
-            reviews_payload = [
-                ProductReview(
-                    content=review.get("content", ""),
-                    rating=review.get("rating"),
-                    verified_purchase=review.get("verified_purchase"),
-                    user_id=review.get("user_id"),
-                    timestamp=review.get("timestamp"),
-                    similarity=review.get("similarity"),
-                    has_rating=review.get("has_rating"),
-                )
-                for review in product.get("reviews", [])
-            ]
-
-            response_items.append(
-                ProductSearchResult(
-                    asin=asin,
-                    product_title=product.get("product_title", ""),
-                    cleaned_item_description=product.get("cleaned_item_description", ""),
-                    product_categories=product.get("product_categories", ""),
-                    similarity=product.get("similarity"),
-                    avg_rating=product.get("avg_rating"),
-                    rating_count=product.get("rating_count"),
-                    displayed_rating=product.get("displayed_rating"),
-                    combined_score=product.get("combined_score"),
-                    reviews=reviews_payload,
-                    analysis=analysis_map.get(asin),
-                )
+        response_items = _build_result_items(search_results, analysis_map)
+        response = SearchResponse(query=query, count=len(response_items), results=response_items)
+        _cache_if_complete(search_service, query_embedding, products_k, response, filters)
+        return response
+    except DeadlineExceeded as e:
+        # Retrieval itself did not finish in time; there is nothing partial to return
+        logger.error(f"API deadline exceeded: {str(e)}")
+        raise HTTPException(status_code=504, detail=str(e))
+    except Exception as e:
+        logger.error(f"API error: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.post("/search/batch", response_model=BatchSearchResponse)
+async def hybrid_search_batch(
+    request: BatchSearchRequest,
+    deadline_ms: Optional[int] = None,
+    search_service: SearchService = Depends(get_search_service_dep),
+    rag_pipeline: RAGPipeline = Depends(get_rag_pipeline_dep),
+):
+    """Search for many queries in one call; `responses` follows the order of `queries`."""
+    logger.info(f"Entering hybrid_search_batch endpoint with {len(request.queries)} queries")
+    try:
+        with deadline_scope(_request_budget(deadline_ms)):
+            results_per_query = await search_service.search_products_batch(
+                request.queries, request.products_k, filters=request.filters
             )
 
-        return SearchResponse(query=query, count=len(response_items), results=response_items)
+            analysis_maps: List[Dict[str, ProductAnalysis]] = [{} for _ in request.queries]
+            if request.include_analysis:
+                analyses_per_query = await asyncio.gather(
+                    *(
+                        rag_pipeline.generate_batch_explanations(query, results)
+                        for query, results in zip(request.queries, results_per_query)
+                    )
+                )
+                analysis_maps = [
+                    {analysis.asin: analysis for analysis in analyses if analysis.asin}
+                    for analyses in analyses_per_query
+                ]
+
+        responses = []
+        for query, results, analysis_map in zip(request.queries, results_per_query, analysis_maps):
+            items = _build_result_items(results, analysis_map)
+            responses.append(SearchResponse(query=query, count=len(items), results=items))
+        return BatchSearchResponse(count=len(responses), responses=responses)
+    except DeadlineExceeded as e:
+        logger.error(f"API deadline exceeded: {str(e)}")
+        raise HTTPException(status_code=504, detail=str(e))
     except Exception as e:
         logger.error(f"API error: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
+
+
+def _ndjson(event: Dict[str, Any]) -> str:
+    return json.dumps(event, default=str) + "\n"
+
+
+@router.get("/search/stream")
+async def hybrid_search_stream(
+    query: str,
+    products_k: int = 3,
+    bypass_cache: bool = False,
+    deadline_ms: Optional[int] = None,
+    category: Optional[str] = None,
+    min_rating: Optional[float] = Query(None, ge=0, le=5),
+    min_price: Optional[float] = Query(None, ge=0),
+    max_price: Optional[float] = Query(None, ge=0),
+    search_service: SearchService = Depends(get_search_service_dep),
+    rag_pipeline: RAGPipeline = Depends(get_rag_pipeline_dep),
+):
+    """Stream search results as NDJSON events.
+
+    Emits a `results` event with the retrieved products (without analyses) as soon as
+    retrieval finishes, then one `analysis` event per product as its LLM chunk completes,
+    and finally a `done` event. Failures after the stream has started are reported as an
+    `error` event because the HTTP status has already been sent. The deadline covers the
+    whole stream; analyses not ready by then arrive as placeholders.
+    """
+    logger.info("Entering hybrid_search_stream endpoint")
+    filters = _search_filters(category, min_rating, min_price, max_price)
+    try:
+        with deadline_scope(_request_budget(deadline_ms)) as deadline:
+            query_embedding, cached = await _embed_and_check_cache(
+                search_service, query, products_k, bypass_cache, filters
+            )
+            search_results = None
+            if cached is None:
+                search_results = await search_service.search_products(
+                    query, products_k, query_embedding=query_embedding, filters=filters
+                )
+    except DeadlineExceeded as e:
+        logger.error(f"API deadline exceeded: {str(e)}")
+        raise HTTPException(status_code=504, detail=str(e))
+    except Exception as e:
+        logger.error(f"API error: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+    async def events() -> AsyncIterator[str]:
+        if cached is not None:
+            yield _ndjson({"event": "results", **cached.model_dump(mode="json")})
+            yield _ndjson({"event": "done", "query": query, "count": cached.count})
+            return
+
+        response_items = _build_result_items(search_results, {})
+        yield _ndjson(
+            {
+                "event": "results",
+                "query": query,
+                "count": len(response_items),
+                "results": [item.model_dump(mode="json") for item in response_items],
+            }
+        )
+
+        analysis_map: Dict[str, ProductAnalysis] = {}
+        # The response body is produced after the endpoint returns, so re-enter what is left
+        # of the request's budget
+        try:
+            with deadline_scope(deadline.remaining() if deadline is not None else None):
+                async for analysis in rag_pipeline.stream_batch_explanations(query, search_results):
+                    analysis_map[analysis.asin] = analysis
+                    yield _ndjson(
+                        {"event": "analysis", "asin": analysis.asin, "analysis": analysis.model_dump(mode="json")}
+                    )
+        except Exception as e:
+            logger.error(f"Streaming analysis failed: {str(e)}")
+            yield _ndjson({"event": "error", "detail": str(e)})
+            return
+
+        response_items = _build_result_items(search_results, analysis_map)
+        response = SearchResponse(query=query, count=len(response_items), results=response_items)
+        _cache_if_complete(search_service, query_embedding, products_k, response, filters)
+        yield _ndjson({"event": "done", "query": query, "count": response.count})
+
+    return StreamingResponse(events(), media_type="application/x-ndjson")
     
 
 # Add this to search_endpoints.py
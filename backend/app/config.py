@@ -1,4 +1,5 @@
 import os
+from typing import Optional
 
 # Google Cloud Project ID
 PROJECT_ID = os.environ.get("PROJECT_ID")
@@ -17,6 +18,9 @@ BIGQUERY_REVIEW_TABLE = os.environ.get("BIGQUERY_REVIEW_TABLE", "review_embeddin
 # LLM Model Name (Vertex AI PaLM or Gemini)
 LLM_MODEL_NAME = os.environ.get("LLM_MODEL_NAME", "gemini-2.0-flash-lite") 
 
+# Vertex AI text embedding model used for queries
+EMBEDDING_MODEL_NAME = os.environ.get("EMBEDDING_MODEL_NAME", "text-embedding-005")
+
 # Optional: Sentiment Analysis Model Name (Vertex AI or other)
 SENTIMENT_MODEL_NAME = os.environ.get("SENTIMENT_MODEL_NAME")
 
@@ -41,8 +45,138 @@ def _get_int_env(name: str, default: int) -> int:
 		return default
 
 
+def _get_dataset_object_env(name: str, object_name: str) -> Optional[str]:
+	"""`name` from the environment, else `object_name` in BIGQUERY_DATASET_ID; None if neither is set."""
+	raw = os.environ.get(name)
+	if raw:
+		return raw
+	if not BIGQUERY_DATASET_ID:
+		return None
+	return f"{BIGQUERY_DATASET_ID}.{object_name}"
+
+
+def _get_float_env(name: str, default: float) -> float:
+	raw = os.environ.get(name)
+	if raw is None:
+		return default
+	try:
+		return float(raw)
+	except ValueError:
+		return default
+
+
+# Use the Gemini SDK's native async API instead of running generate_content in a thread
+LLM_ASYNC_ENABLED = _get_bool_env("LLM_ASYNC_ENABLED", True)
+
+# BigQuery retrieval query: "vector_search" (parameterized VECTOR_SEARCH) or
+# "table_function" (calls the product_with_reviews_search table function)
+BIGQUERY_SEARCH_MODE = os.environ.get("BIGQUERY_SEARCH_MODE", "vector_search").strip().lower()
+BIGQUERY_SEARCH_FUNCTION = _get_dataset_object_env("BIGQUERY_SEARCH_FUNCTION", "product_with_reviews_search")
+# Take avg_rating / rating_count from the per-product aggregate table built by
+# bigQuery/review_aggregates.sql instead of the matched reviews
+REVIEW_AGGREGATES_ENABLED = _get_bool_env("REVIEW_AGGREGATES_ENABLED", False)
+BIGQUERY_REVIEW_AGGREGATES_TABLE = _get_dataset_object_env(
+	"BIGQUERY_REVIEW_AGGREGATES_TABLE", "product_review_aggregates"
+)
+
+# Retrieval result format: "arrow" (Storage Read API / to_arrow, needs pyarrow) or "rows"
+BIGQUERY_RESULT_FORMAT = os.environ.get("BIGQUERY_RESULT_FORMAT", "arrow").strip().lower()
+
+# BigQuery job polling interval (seconds), backing off from the initial to the max value
+BIGQUERY_POLL_INITIAL_SECONDS = _get_float_env("BIGQUERY_POLL_INITIAL_SECONDS", 0.05)
+BIGQUERY_POLL_MAX_SECONDS = _get_float_env("BIGQUERY_POLL_MAX_SECONDS", 1.0)
+
+# Upstream resource limits: executor threads for blocking SDK calls and max in-flight
+# requests per service (see app/utils/resource_pools.py)
+LLM_MAX_WORKERS = _get_int_env("LLM_MAX_WORKERS", 16)
+LLM_MAX_CONCURRENCY = _get_int_env("LLM_MAX_CONCURRENCY", 16)
+EMBEDDING_MAX_WORKERS = _get_int_env("EMBEDDING_MAX_WORKERS", 8)
+EMBEDDING_MAX_CONCURRENCY = _get_int_env("EMBEDDING_MAX_CONCURRENCY", 8)
+BIGQUERY_MAX_WORKERS = _get_int_env("BIGQUERY_MAX_WORKERS", 8)
+BIGQUERY_MAX_CONCURRENCY = _get_int_env("BIGQUERY_MAX_CONCURRENCY", 16)
+
 # RAG batching / prompt configuration
 RAG_BATCHING_ENABLED = _get_bool_env("RAG_BATCHING_ENABLED", True)
 RAG_BATCH_SIZE = _get_int_env("RAG_BATCH_SIZE", 3)
 RAG_MAX_PROMPT_TOKENS = _get_int_env("RAG_MAX_PROMPT_TOKENS", 65536)
 RAG_MAX_REVIEW_CHARS = _get_int_env("RAG_MAX_REVIEW_CHARS", 4000)
+# Review selection: drop near-duplicate reviews and trim the rest to a per-product budget
+RAG_REVIEW_SELECTION_ENABLED = _get_bool_env("RAG_REVIEW_SELECTION_ENABLED", True)
+RAG_REVIEW_TOKEN_BUDGET = _get_int_env("RAG_REVIEW_TOKEN_BUDGET", 1200)
+RAG_REVIEW_MAX_TOKENS = _get_int_env("RAG_REVIEW_MAX_TOKENS", 300)
+RAG_REVIEW_DUPLICATE_THRESHOLD = _get_float_env("RAG_REVIEW_DUPLICATE_THRESHOLD", 0.8)
+# Stream LLM output and surface each product analysis as soon as its JSON object closes
+RAG_STREAMING_ENABLED = _get_bool_env("RAG_STREAMING_ENABLED", True)
+
+# Per-request time budget for /search; unfinished analyses degrade to placeholders when
+# it runs out. 0 disables the deadline. Clients can tighten it with `deadline_ms`.
+SEARCH_DEADLINE_SECONDS = _get_float_env("SEARCH_DEADLINE_SECONDS", 20.0)
+
+# Adaptive chunk sizing: choose products per prompt from observed latency and parse
+# failures instead of the fixed RAG_BATCH_SIZE (which becomes the starting size)
+RAG_ADAPTIVE_CHUNKING = _get_bool_env("RAG_ADAPTIVE_CHUNKING", False)
+RAG_MAX_BATCH_SIZE = _get_int_env("RAG_MAX_BATCH_SIZE", 8)
+RAG_MAX_OUTPUT_TOKENS = _get_int_env("RAG_MAX_OUTPUT_TOKENS", 8192)
+
+# RAG concurrency: max in-flight LLM calls per request. The process-wide cap is
+# LLM_MAX_CONCURRENCY, held by VertexAIClient around every Gemini call
+RAG_MAX_CONCURRENCY = _get_int_env("RAG_MAX_CONCURRENCY", 4)
+
+# Hedged LLM calls: race a duplicate request once a call outlives the given percentile of
+# recent latencies (learned per chunk size). At most RAG_HEDGE_MAX_RATE of calls are hedged.
+RAG_HEDGING_ENABLED = _get_bool_env("RAG_HEDGING_ENABLED", False)
+RAG_HEDGE_PERCENTILE = _get_float_env("RAG_HEDGE_PERCENTILE", 0.95)
+RAG_HEDGE_MAX_RATE = _get_float_env("RAG_HEDGE_MAX_RATE", 0.1)
+RAG_HEDGE_MIN_SAMPLES = _get_int_env("RAG_HEDGE_MIN_SAMPLES", 20)
+
+# Query embedding cache (in-process LRU + optional SQLite file)
+EMBEDDING_CACHE_ENABLED = _get_bool_env("EMBEDDING_CACHE_ENABLED", True)
+EMBEDDING_CACHE_MAX_ENTRIES = _get_int_env("EMBEDDING_CACHE_MAX_ENTRIES", 10000)
+EMBEDDING_CACHE_TTL_SECONDS = _get_int_env("EMBEDDING_CACHE_TTL_SECONDS", 7 * 24 * 3600)
+EMBEDDING_CACHE_PATH = os.environ.get("EMBEDDING_CACHE_PATH")
+EMBEDDING_CACHE_DISK_MAX_ENTRIES = _get_int_env("EMBEDDING_CACHE_DISK_MAX_ENTRIES", 100000)
+
+# Semantic response cache for near-duplicate queries
+SEMANTIC_CACHE_ENABLED = _get_bool_env("SEMANTIC_CACHE_ENABLED", True)
+SEMANTIC_CACHE_CAPACITY = _get_int_env("SEMANTIC_CACHE_CAPACITY", 1000)
+SEMANTIC_CACHE_THRESHOLD = _get_float_env("SEMANTIC_CACHE_THRESHOLD", 0.95)
+SEMANTIC_CACHE_TTL_SECONDS = _get_int_env("SEMANTIC_CACHE_TTL_SECONDS", 900)
+
+# Per-product analysis cache: "memory", "sqlite" or "none"
+ANALYSIS_CACHE_BACKEND = os.environ.get("ANALYSIS_CACHE_BACKEND", "memory").strip().lower()
+ANALYSIS_CACHE_PATH = os.environ.get("ANALYSIS_CACHE_PATH", "analysis_cache.sqlite")
+ANALYSIS_CACHE_MAX_ENTRIES = _get_int_env("ANALYSIS_CACHE_MAX_ENTRIES", 5000)
+ANALYSIS_CACHE_TTL_SECONDS = _get_int_env("ANALYSIS_CACHE_TTL_SECONDS", 7 * 24 * 3600)
+# Analyses generated offline by `python -m backend.app.core.pregenerate` (optional)
+PREGENERATED_ANALYSES_PATH = os.environ.get("PREGENERATED_ANALYSES_PATH")
+
+# Retrieval backend: "bigquery" (VECTOR_SEARCH) or "local" (in-process NumPy index)
+RETRIEVAL_BACKEND = os.environ.get("RETRIEVAL_BACKEND", "bigquery").strip().lower()
+# Review retrieval: "global" (one review search filtered to the product candidates),
+# "two_stage" (product candidates first, then nearest reviews within those ASINs) or
+# "centroid" (rank on review centroids from the aggregates, no review search)
+RETRIEVAL_REVIEW_MODE = os.environ.get("RETRIEVAL_REVIEW_MODE", "global").strip().lower()
+LOCAL_PRODUCTS_PATH = os.environ.get("LOCAL_PRODUCTS_PATH", "product_embeddings.parquet")
+LOCAL_REVIEWS_PATH = os.environ.get("LOCAL_REVIEWS_PATH", "review_embeddings.parquet")
+# "exact" brute-force search or "ivf" approximate search
+LOCAL_INDEX_MODE = os.environ.get("LOCAL_INDEX_MODE", "exact").strip().lower()
+LOCAL_INDEX_NLIST = _get_int_env("LOCAL_INDEX_NLIST", 0)
+LOCAL_INDEX_NPROBE = _get_int_env("LOCAL_INDEX_NPROBE", 8)
+# Optional memory-mapped embedding stores (see app/core/embedding_store.py)
+LOCAL_PRODUCTS_STORE_PATH = os.environ.get("LOCAL_PRODUCTS_STORE_PATH")
+LOCAL_REVIEWS_STORE_PATH = os.environ.get("LOCAL_REVIEWS_STORE_PATH")
+# Per-product review aggregates from `python -m backend.app.core.review_aggregates`
+LOCAL_REVIEW_AGGREGATES_PATH = os.environ.get("LOCAL_REVIEW_AGGREGATES_PATH")
+
+# BM25 product index from `python -m backend.app.core.lexical_index` (optional). Its ranking
+# is fused with vector retrieval, and identifier-like queries (ASINs, model numbers) it
+# matches unambiguously skip the embedding and vector search
+LEXICAL_INDEX_PATH = os.environ.get("LEXICAL_INDEX_PATH")
+LEXICAL_RRF_K = _get_int_env("LEXICAL_RRF_K", 60)
+LEXICAL_EXACT_MATCH_ENABLED = _get_bool_env("LEXICAL_EXACT_MATCH_ENABLED", True)
+
+# Coalesce concurrent identical searches and analysis generations into one upstream call
+SINGLE_FLIGHT_ENABLED = _get_bool_env("SINGLE_FLIGHT_ENABLED", True)
+
+# Batched search: max queries per BigQuery job (the embeddings travel as a query parameter)
+SEARCH_BATCH_MAX_QUERIES = _get_int_env("SEARCH_BATCH_MAX_QUERIES", 250)
@@ -0,0 +1,202 @@
+# app/core/analysis_cache.py
+"""Cache of generated `ProductAnalysis` objects.
+
+An analysis depends on the product, the reviews shown to the LLM, the prompt and the
+model, so the key is (asin, review-set fingerprint, prompt version, model name). Values
+are stored as JSON so any backend can hold them; two backends are provided: an
+in-process LRU and a SQLite file that survives restarts.
+"""
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import logging
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Iterable, List, Optional, Protocol, Tuple
+
+from pydantic import ValidationError
+
+from backend.app.schemas.llm_outputs import ProductAnalysis
+from backend.app.utils.lru_cache import LRUCache
+
+logger = logging.getLogger(__name__)
+
+
+class AnalysisCacheBackend(Protocol):
+    """Key/value store for serialized analyses."""
+
+    # Whether calls block on I/O and should be moved off the event loop
+    blocking: bool
+
+    def get(self, key: str) -> Optional[str]:
+        ...
+
+    def set(self, key: str, payload: str) -> None:
+        ...
+
+
+class MemoryAnalysisCacheBackend:
+    blocking = False
+
+    def __init__(self, max_entries: int = 5000, ttl_seconds: Optional[float] = None):
+        self._entries: LRUCache[str] = LRUCache(max_entries, ttl_seconds)
+
+    def get(self, key: str) -> Optional[str]:
+        return self._entries.get(key)
+
+    def set(self, key: str, payload: str) -> None:
+        self._entries.set(key, payload)
+
+
+class SQLiteAnalysisCacheBackend:
+    """SQLite-backed store with TTL and least-recently-used trimming."""
+
+    blocking = True
+
+    def __init__(self, path: str, max_entries: int = 50000, ttl_seconds: Optional[float] = None):
+        self.path = path
+        self.max_entries = max(1, max_entries)
+        self.ttl_seconds = ttl_seconds if ttl_seconds and ttl_seconds > 0 else None
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS product_analyses (
+                    cache_key TEXT PRIMARY KEY,
+                    payload TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    last_used REAL NOT NULL
+                )
+                """
+            )
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS product_analyses_last_used ON product_analyses (last_used)"
+            )
+            self._conn.commit()
+
+    def get(self, key: str) -> Optional[str]:
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT payload, created_at FROM product_analyses WHERE cache_key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            payload, created_at = row
+            if self.ttl_seconds and created_at + self.ttl_seconds <= now:
+                self._conn.execute("DELETE FROM product_analyses WHERE cache_key = ?", (key,))
+                self._conn.commit()
+                return None
+            self._conn.execute(
+                "UPDATE product_analyses SET last_used = ? WHERE cache_key = ?", (now, key)
+            )
+            self._conn.commit()
+        return payload
+
+    def set(self, key: str, payload: str) -> None:
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO product_analyses VALUES (?, ?, ?, ?)",
+                (key, payload, now, now),
+            )
+            self._conn.execute(
+                """
+                DELETE FROM product_analyses WHERE cache_key IN (
+                    SELECT cache_key FROM product_analyses
+                    ORDER BY last_used DESC LIMIT -1 OFFSET ?
+                )
+                """,
+                (self.max_entries,),
+            )
+            self._conn.commit()
+
+
+def review_fingerprint(reviews: Iterable[Dict[str, Any]]) -> str:
+    """Order-independent digest of the reviews that are shown to the LLM."""
+
+    parts = sorted(
+        json.dumps(
+            [review.get("content") or "", review.get("rating"), bool(review.get("verified_purchase"))],
+            ensure_ascii=False,
+        )
+        for review in reviews or []
+    )
+    return hashlib.sha1("\n".join(parts).encode("utf-8")).hexdigest()
+
+
+class AnalysisCache:
+    """Looks up and stores post-processed analyses for products."""
+
+    def __init__(self, backend: AnalysisCacheBackend, model_name: str, prompt_version: str):
+        self.backend = backend
+        self.model_name = model_name
+        self.prompt_version = prompt_version
+        self._counters: Dict[str, int] = {"hits": 0, "misses": 0, "stores": 0}
+
+    def key_for(self, product: Dict[str, Any]) -> Optional[str]:
+        asin = product.get("asin")
+        if not asin:
+            return None
+        fingerprint = review_fingerprint(product.get("reviews") or [])
+        return "|".join([str(asin), fingerprint, self.prompt_version, self.model_name])
+
+    async def get_many(self, products: List[Dict[str, Any]]) -> Dict[str, ProductAnalysis]:
+        """Return cached analyses keyed by ASIN for the products that have one."""
+
+        keyed = [(str(p["asin"]), key) for p in products if (key := self.key_for(p))]
+        if not keyed:
+            return {}
+        try:
+            payloads = await self._run(self._get_payloads, [key for _, key in keyed])
+        except sqlite3.Error as exc:
+            logger.warning("Analysis cache read failed: %s", exc)
+            payloads = [None] * len(keyed)
+
+        found: Dict[str, ProductAnalysis] = {}
+        for (asin, _), payload in zip(keyed, payloads):
+            if payload is None:
+                self._counters["misses"] += 1
+                continue
+            try:
+                found[asin] = ProductAnalysis.model_validate_json(payload)
+                self._counters["hits"] += 1
+            except ValidationError as exc:
+                logger.warning("Discarding unreadable cached analysis", extra={"asin": asin, "error": str(exc)})
+                self._counters["misses"] += 1
+        return found
+
+    async def set_many(self, entries: List[Tuple[Dict[str, Any], ProductAnalysis]]) -> None:
+        rows = [
+            (key, analysis.model_dump_json())
+            for product, analysis in entries
+            if (key := self.key_for(product))
+        ]
+        if not rows:
+            return
+        try:
+            await self._run(self._set_payloads, rows)
+        except sqlite3.Error as exc:
+            logger.warning("Analysis cache write failed: %s", exc)
+            return
+        self._counters["stores"] += len(rows)
+
+    def stats(self) -> Dict[str, int]:
+        return dict(self._counters)
+
+    def _get_payloads(self, keys: List[str]) -> List[Optional[str]]:
+        return [self.backend.get(key) for key in keys]
+
+    def _set_payloads(self, rows: List[Tuple[str, str]]) -> None:
+        for key, payload in rows:
+            self.backend.set(key, payload)
+
+    async def _run(self, func, *args):
+        if self.backend.blocking:
+            return await asyncio.to_thread(func, *args)
+        return func(*args)
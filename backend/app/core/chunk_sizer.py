@@ -0,0 +1,143 @@
+"""Adaptive chunk sizing for batched LLM analyses."""
+from __future__ import annotations
+
+import math
+from collections import deque
+from typing import Any, Deque, Dict, List, NamedTuple, Optional
+
+
+class _Observation(NamedTuple):
+    latency: float
+    output_tokens: int
+    parse_failed: bool
+
+
+class AdaptiveChunkSizer:
+    """Picks the products-per-prompt size with the lowest expected wall time.
+
+    `RAGPipeline` records every batch call: chunk size, latency, output tokens and whether
+    the response failed to parse. For a request of `n` products at concurrency `c`, the
+    expected wall time of size `s` is
+
+        ceil(ceil(n / s) / c) * (L(s) + p(s) * (L(s) + p(s) * L(1) * ceil(s / c)))
+
+    where `L` is the mean latency and `p` the parse-failure rate over the last `window`
+    calls: a failed call is retried once and a second failure falls back to per-product
+    calls. Only sizes with `min_samples` observations are scored. Until `initial_size`
+    has that many, it is used as is. Every `explore_every`-th decision tries an
+    under-sampled neighbour of the best size instead. Sizes whose prompt would exceed
+    `max_prompt_tokens`, or whose expected output exceeds `max_output_tokens`, are never
+    chosen. Pass `fixed_size` to make every decision return that size.
+    """
+
+    def __init__(
+        self,
+        initial_size: int,
+        max_size: int = 8,
+        max_prompt_tokens: int = 65536,
+        max_output_tokens: int = 8192,
+        window: int = 50,
+        min_samples: int = 5,
+        explore_every: int = 10,
+        fixed_size: Optional[int] = None,
+    ):
+        self.max_size = max(1, max_size)
+        self.initial_size = min(max(1, initial_size), self.max_size)
+        self.max_prompt_tokens = max_prompt_tokens
+        self.max_output_tokens = max_output_tokens
+        self.window = max(1, window)
+        self.min_samples = max(1, min_samples)
+        self.explore_every = max(0, explore_every)
+        self.fixed_size = fixed_size
+        self._observations: Dict[int, Deque[_Observation]] = {}
+        self._decisions = 0
+
+    def record(self, chunk_size: int, latency: float, output_tokens: int, parse_failed: bool) -> None:
+        samples = self._observations.get(chunk_size)
+        if samples is None:
+            samples = self._observations[chunk_size] = deque(maxlen=self.window)
+        samples.append(_Observation(latency, output_tokens, parse_failed))
+
+    def choose(self, product_count: int, concurrency: int, product_tokens: int) -> int:
+        """Chunk size for `product_count` products of up to `product_tokens` prompt tokens each."""
+
+        if self.fixed_size is not None:
+            return max(1, self.fixed_size)
+        self._decisions += 1
+        candidates = self._candidates(product_count, product_tokens)
+        sampled = [size for size in candidates if self._sample_count(size) >= self.min_samples]
+        if self._sample_count(self.initial_size) < self.min_samples or not sampled:
+            return min(self.initial_size, candidates[-1])
+
+        concurrency = max(1, concurrency)
+        best = min(
+            sampled,
+            # Ties go to the larger size, which costs fewer calls
+            key=lambda size: (self.expected_wall_time(size, product_count, concurrency), -size),
+        )
+        if self.explore_every and self._decisions % self.explore_every == 0:
+            neighbours = [
+                size
+                for size in (best - 1, best + 1)
+                if size in candidates and self._sample_count(size) < self.min_samples
+            ]
+            if neighbours:
+                return min(neighbours, key=self._sample_count)
+        return best
+
+    def expected_wall_time(self, size: int, product_count: int, concurrency: int) -> float:
+        latency = self._mean_latency(size)
+        failure_rate = self._failure_rate(size)
+        fallback_latency = self._fallback_latency()
+        per_call = latency + failure_rate * (
+            latency + failure_rate * fallback_latency * math.ceil(size / concurrency)
+        )
+        waves = math.ceil(math.ceil(product_count / size) / concurrency)
+        return waves * per_call
+
+    def stats(self) -> Dict[int, Dict[str, Any]]:
+        return {
+            size: {
+                "samples": len(samples),
+                "latency_avg": self._mean_latency(size),
+                "parse_failure_rate": self._failure_rate(size),
+                "output_tokens_avg": sum(o.output_tokens for o in samples) / len(samples),
+            }
+            for size, samples in sorted(self._observations.items())
+            if samples
+        }
+
+    def _candidates(self, product_count: int, product_tokens: int) -> List[int]:
+        limit = min(self.max_size, max(1, product_count))
+        if product_tokens > 0:
+            limit = min(limit, max(1, self.max_prompt_tokens // product_tokens))
+        output_per_product = self._output_tokens_per_product()
+        if output_per_product:
+            limit = min(limit, max(1, int(self.max_output_tokens // output_per_product)))
+        return list(range(1, limit + 1))
+
+    def _sample_count(self, size: int) -> int:
+        return len(self._observations.get(size) or ())
+
+    def _mean_latency(self, size: int) -> float:
+        samples = self._observations[size]
+        return sum(o.latency for o in samples) / len(samples)
+
+    def _failure_rate(self, size: int) -> float:
+        samples = self._observations[size]
+        return sum(o.parse_failed for o in samples) / len(samples)
+
+    def _fallback_latency(self) -> float:
+        # Per-product calls are size 1; before any are seen, the fastest size stands in
+        if self._sample_count(1):
+            return self._mean_latency(1)
+        return min(self._mean_latency(size) for size, samples in self._observations.items() if samples)
+
+    def _output_tokens_per_product(self) -> Optional[float]:
+        successes = [
+            o.output_tokens / size
+            for size, samples in self._observations.items()
+            for o in samples
+            if not o.parse_failed
+        ]
+        return sum(successes) / len(successes) if successes else None
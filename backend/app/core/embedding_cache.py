@@ -0,0 +1,228 @@
+# app/core/embedding_cache.py
+"""Two-tier cache for query embeddings.
+
+Tier one is an in-process LRU with TTL; tier two is an optional SQLite file that
+survives restarts and can be shared by every worker on the host. Keys combine the
+embedding model name with the normalized query text.
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import sqlite3
+import threading
+import time
+from array import array
+from typing import Awaitable, Callable, Dict, List, Optional
+
+from backend.app.utils.lru_cache import LRUCache
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_query(query: str) -> str:
+    """Lower-case the query and collapse runs of whitespace."""
+
+    return " ".join(query.lower().split())
+
+
+class SQLiteEmbeddingStore:
+    """Persistent embedding store with TTL and least-recently-used trimming.
+
+    Vectors are kept as float32 blobs.
+    """
+
+    def __init__(self, path: str, ttl_seconds: Optional[float] = None, max_entries: int = 100000):
+        self.path = path
+        self.max_entries = max(1, max_entries)
+        self.ttl_seconds = ttl_seconds if ttl_seconds and ttl_seconds > 0 else None
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS query_embeddings (
+                    cache_key TEXT PRIMARY KEY,
+                    model_name TEXT NOT NULL,
+                    dim INTEGER NOT NULL,
+                    vector BLOB NOT NULL,
+                    created_at REAL NOT NULL,
+                    last_used REAL NOT NULL DEFAULT 0
+                )
+                """
+            )
+            columns = {row[1] for row in self._conn.execute("PRAGMA table_info(query_embeddings)")}
+            if "last_used" not in columns:
+                # Files written before trimming existed; their rows are trimmed first
+                self._conn.execute("ALTER TABLE query_embeddings ADD COLUMN last_used REAL NOT NULL DEFAULT 0")
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS query_embeddings_last_used ON query_embeddings (last_used)"
+            )
+            self._conn.commit()
+
+    def get(self, cache_key: str) -> Optional[List[float]]:
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT vector, created_at FROM query_embeddings WHERE cache_key = ?",
+                (cache_key,),
+            ).fetchone()
+            if row is None:
+                return None
+            blob, created_at = row
+            if self.ttl_seconds and created_at + self.ttl_seconds <= now:
+                self._conn.execute("DELETE FROM query_embeddings WHERE cache_key = ?", (cache_key,))
+                self._conn.commit()
+                return None
+            self._conn.execute(
+                "UPDATE query_embeddings SET last_used = ? WHERE cache_key = ?", (now, cache_key)
+            )
+            self._conn.commit()
+        vector = array("f")
+        vector.frombytes(blob)
+        return vector.tolist()
+
+    def set(self, cache_key: str, model_name: str, embedding: List[float]) -> None:
+        blob = array("f", embedding).tobytes()
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO query_embeddings VALUES (?, ?, ?, ?, ?, ?)",
+                (cache_key, model_name, len(embedding), blob, now, now),
+            )
+            self._conn.execute(
+                """
+                DELETE FROM query_embeddings WHERE cache_key IN (
+                    SELECT cache_key FROM query_embeddings
+                    ORDER BY last_used DESC LIMIT -1 OFFSET ?
+                )
+                """,
+                (self.max_entries,),
+            )
+            self._conn.commit()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM query_embeddings").fetchone()[0]
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+class EmbeddingCache:
+    """Caches query embeddings in memory and, optionally, on disk."""
+
+    def __init__(
+        self,
+        max_entries: int = 10000,
+        ttl_seconds: Optional[float] = None,
+        disk_store: Optional[SQLiteEmbeddingStore] = None,
+    ):
+        self._memory: LRUCache[List[float]] = LRUCache(max_entries, ttl_seconds)
+        self._disk = disk_store
+        self._counters: Dict[str, int] = {"memory_hits": 0, "disk_hits": 0, "misses": 0}
+
+    @staticmethod
+    def cache_key(query: str, model_name: str) -> str:
+        return f"{model_name}\x1f{normalize_query(query)}"
+
+    async def get_or_compute(
+        self,
+        query: str,
+        model_name: str,
+        compute: Callable[[str], Awaitable[List[float]]],
+    ) -> List[float]:
+        """Return the cached embedding for `query`, computing and storing it on a miss.
+
+        `compute` receives the normalized query so the stored vector always matches its key.
+        """
+
+        key = self.cache_key(query, model_name)
+        cached = self._memory.get(key)
+        if cached is not None:
+            self._counters["memory_hits"] += 1
+            return cached
+
+        if self._disk is not None:
+            try:
+                cached = await asyncio.to_thread(self._disk.get, key)
+            except sqlite3.Error as exc:
+                logger.warning("Embedding disk cache read failed: %s", exc)
+                cached = None
+            if cached is not None:
+                self._counters["disk_hits"] += 1
+                self._memory.set(key, cached)
+                return cached
+
+        self._counters["misses"] += 1
+        embedding = list(await compute(normalize_query(query)))
+        self._memory.set(key, embedding)
+        if self._disk is not None:
+            try:
+                await asyncio.to_thread(self._disk.set, key, model_name, embedding)
+            except sqlite3.Error as exc:
+                logger.warning("Embedding disk cache write failed: %s", exc)
+        return embedding
+
+    async def get_or_compute_many(
+        self,
+        queries: List[str],
+        model_name: str,
+        compute_many: Callable[[List[str]], Awaitable[List[List[float]]]],
+    ) -> List[List[float]]:
+        """Batch variant of `get_or_compute`: every miss is embedded in one `compute_many` call.
+
+        Queries that normalize to the same text are embedded once; results follow `queries`.
+        """
+
+        keys = [self.cache_key(query, model_name) for query in queries]
+        normalized = {key: normalize_query(query) for key, query in zip(keys, queries)}
+        found: Dict[str, List[float]] = {}
+        for key in keys:
+            cached = self._memory.get(key)
+            if cached is not None:
+                self._counters["memory_hits"] += 1
+                found[key] = cached
+
+        missing = list(dict.fromkeys(key for key in keys if key not in found))
+        if missing and self._disk is not None:
+            try:
+                disk_values = await asyncio.to_thread(lambda: [self._disk.get(key) for key in missing])
+            except sqlite3.Error as exc:
+                logger.warning("Embedding disk cache read failed: %s", exc)
+                disk_values = [None] * len(missing)
+            for key, cached in zip(missing, disk_values):
+                if cached is not None:
+                    self._counters["disk_hits"] += 1
+                    self._memory.set(key, cached)
+                    found[key] = cached
+            missing = [key for key in missing if key not in found]
+
+        if missing:
+            self._counters["misses"] += len(missing)
+            texts = [normalized[key] for key in missing]
+            embeddings = [list(vector) for vector in await compute_many(texts)]
+            if len(embeddings) != len(texts):
+                raise ValueError(f"Expected {len(texts)} embeddings, got {len(embeddings)}")
+            for key, embedding in zip(missing, embeddings):
+                self._memory.set(key, embedding)
+                found[key] = embedding
+            if self._disk is not None:
+                try:
+                    await asyncio.to_thread(
+                        lambda: [self._disk.set(key, model_name, found[key]) for key in missing]
+                    )
+                except sqlite3.Error as exc:
+                    logger.warning("Embedding disk cache write failed: %s", exc)
+
+        return [found[key] for key in keys]
+
+    def stats(self) -> Dict[str, int]:
+        hits = self._counters["memory_hits"] + self._counters["disk_hits"]
+        return {
+            **self._counters,
+            "hits": hits,
+            "entries": len(self._memory),
+        }
@@ -0,0 +1,265 @@
+# app/core/embedding_store.py
+"""Memory-mapped on-disk embedding store for the local retrieval path.
+
+File layout (all sections 64-byte aligned, little endian):
+
+    b"RAGEMB01" | uint32 header length | JSON header | sections...
+
+Sections:
+    vectors       rows x dim matrix, float16 or int8 codes of the L2-normalized rows
+    scales        float32[dim] per-dimension dequantization scales (int8 only)
+    rescore       optional float16 copy of the normalized rows used to rescore
+                  int8 candidates
+    ids           UTF-8 bytes of every row id (ASIN), concatenated
+    id_offsets    int64[rows + 1] byte offsets into `ids`
+    group_keys    UTF-8 bytes of the sorted distinct ids, concatenated
+    group_key_offsets int64[groups + 1] byte offsets into `group_keys`
+    group_offsets int64[groups + 1] offsets into `group_rows`
+    group_rows    int64[rows] row numbers ordered by id
+
+Rows keep the order they were written in, so they stay aligned with the metadata
+export they came from. The store is opened read-only with `numpy.memmap`, so every
+uvicorn worker on a host shares the same page-cache pages instead of holding its own
+copy of the matrix.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import logging
+import struct
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b"RAGEMB01"
+_ALIGN = 64
+_BLOCK_ROWS = 65536
+
+
+def _pad(length: int) -> int:
+    return (-length) % _ALIGN
+
+
+def _encode_strings(values: Sequence[str]) -> Tuple[bytes, np.ndarray]:
+    encoded = [str(value).encode("utf-8") for value in values]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(item) for item in encoded], out=offsets[1:])
+    return b"".join(encoded), offsets
+
+
+def write_embedding_store(
+    path: str,
+    ids: Sequence[str],
+    vectors: np.ndarray,
+    dtype: str = "int8",
+    include_rescore: bool = True,
+) -> None:
+    """Write `vectors` (one row per id) to `path` in the store format."""
+
+    if dtype not in {"float16", "int8"}:
+        raise ValueError(f"Unsupported store dtype: {dtype}")
+    matrix = np.asarray(vectors, dtype=np.float32)
+    if matrix.ndim != 2 or matrix.shape[0] != len(ids):
+        raise ValueError("vectors must be a 2-D matrix with one row per id")
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    matrix = matrix / norms
+
+    sections: Dict[str, bytes] = {}
+    section_meta: Dict[str, Dict[str, object]] = {}
+
+    def add(name: str, array: np.ndarray) -> None:
+        sections[name] = np.ascontiguousarray(array).tobytes()
+        section_meta[name] = {"dtype": array.dtype.str, "shape": list(array.shape)}
+
+    if dtype == "int8":
+        scales = np.abs(matrix).max(axis=0) / 127.0
+        scales[scales == 0] = 1.0
+        add("vectors", np.clip(np.rint(matrix / scales), -127, 127).astype(np.int8))
+        add("scales", scales.astype(np.float32))
+        if include_rescore:
+            add("rescore", matrix.astype(np.float16))
+    else:
+        add("vectors", matrix.astype(np.float16))
+
+    id_bytes, id_offsets = _encode_strings(ids)
+    sections["ids"] = id_bytes
+    section_meta["ids"] = {"dtype": "|u1", "shape": [len(id_bytes)]}
+    add("id_offsets", id_offsets)
+
+    id_array = np.asarray([str(value) for value in ids], dtype=object)
+    group_rows = np.argsort(id_array, kind="stable").astype(np.int64)
+    sorted_ids = id_array[group_rows]
+    starts = np.flatnonzero(np.r_[True, sorted_ids[1:] != sorted_ids[:-1]]) if len(ids) else np.empty(0, dtype=np.int64)
+    group_key_bytes, group_key_offsets = _encode_strings(sorted_ids[starts].tolist())
+    sections["group_keys"] = group_key_bytes
+    section_meta["group_keys"] = {"dtype": "|u1", "shape": [len(group_key_bytes)]}
+    add("group_key_offsets", group_key_offsets)
+    add("group_offsets", np.r_[starts, len(ids)].astype(np.int64))
+    add("group_rows", group_rows)
+
+    header = {
+        "dtype": dtype,
+        "rows": int(matrix.shape[0]),
+        "dim": int(matrix.shape[1]),
+        "sections": section_meta,
+    }
+    # Section offsets are recorded in the header, so grow the reserved header space
+    # until the serialized header fits in front of the first section.
+    reserved = 0
+    while True:
+        position = len(MAGIC) + 4 + reserved
+        position += _pad(position)
+        for name, payload in sections.items():
+            section_meta[name]["offset"] = position
+            position += len(payload) + _pad(len(payload))
+        header_bytes = json.dumps(header).encode("utf-8")
+        if len(header_bytes) <= reserved:
+            break
+        reserved = len(header_bytes) + 256
+    header_bytes = header_bytes.ljust(reserved)
+
+    with open(path, "wb") as handle:
+        handle.write(MAGIC)
+        handle.write(struct.pack("<I", len(header_bytes)))
+        handle.write(header_bytes)
+        for name, payload in sections.items():
+            handle.seek(section_meta[name]["offset"])
+            handle.write(payload)
+            handle.write(b"\0" * _pad(len(payload)))
+    logger.info("Wrote embedding store", extra={"path": path, "rows": header["rows"], "dtype": dtype})
+
+
+class EmbeddingStore:
+    """Read-only, memory-mapped view of a store written by `write_embedding_store`.
+
+    Implements the same `search(query, top_k)` interface as `VectorIndex`, returning
+    (row numbers, cosine distances). int8 stores score every row with the quantized
+    codes and then rescore the best `top_k * rescore_factor` candidates with the
+    float16 copy when the file includes one.
+    """
+
+    def __init__(self, path: str, rescore_factor: int = 4):
+        self.path = path
+        self.rescore_factor = max(1, rescore_factor)
+        with open(path, "rb") as handle:
+            if handle.read(len(MAGIC)) != MAGIC:
+                raise ValueError(f"{path} is not an embedding store")
+            (header_len,) = struct.unpack("<I", handle.read(4))
+            header = json.loads(handle.read(header_len).decode("utf-8"))
+        self.dtype: str = header["dtype"]
+        self.rows: int = header["rows"]
+        self.dim: int = header["dim"]
+        self._sections = {
+            name: np.memmap(
+                path, mode="r", dtype=np.dtype(meta["dtype"]), offset=meta["offset"], shape=tuple(meta["shape"])
+            )
+            if int(np.prod(meta["shape"])) > 0
+            else np.empty(tuple(meta["shape"]), dtype=np.dtype(meta["dtype"]))
+            for name, meta in header["sections"].items()
+        }
+        self.vectors = self._sections["vectors"]
+        self.scales: Optional[np.ndarray] = self._sections.get("scales")
+        self.rescore_vectors: Optional[np.ndarray] = self._sections.get("rescore")
+        self._group_index: Optional[Dict[str, int]] = None
+
+    @classmethod
+    def open(cls, path: str, rescore_factor: int = 4) -> "EmbeddingStore":
+        return cls(path, rescore_factor=rescore_factor)
+
+    def __len__(self) -> int:
+        return self.rows
+
+    def id_at(self, row: int) -> str:
+        offsets = self._sections["id_offsets"]
+        return bytes(self._sections["ids"][offsets[row]:offsets[row + 1]]).decode("utf-8")
+
+    def ids(self) -> List[str]:
+        return [self.id_at(row) for row in range(self.rows)]
+
+    def group_rows(self, key: str) -> np.ndarray:
+        """Row numbers whose id equals `key` (e.g. every review of one ASIN)."""
+
+        if self._group_index is None:
+            keys = self._sections["group_keys"]
+            key_offsets = self._sections["group_key_offsets"]
+            self._group_index = {
+                bytes(keys[key_offsets[i]:key_offsets[i + 1]]).decode("utf-8"): i
+                for i in range(len(key_offsets) - 1)
+            }
+        group = self._group_index.get(key)
+        if group is None:
+            return np.empty(0, dtype=np.int64)
+        offsets = self._sections["group_offsets"]
+        return np.asarray(self._sections["group_rows"][offsets[group]:offsets[group + 1]])
+
+    def search(
+        self, query: Sequence[float], top_k: int, rows: Optional[np.ndarray] = None
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Nearest rows by cosine distance, optionally restricted to `rows`."""
+
+        q = np.asarray(query, dtype=np.float32)
+        norm = float(np.linalg.norm(q))
+        if norm == 0.0 or self.rows == 0 or top_k <= 0:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        q = q / norm
+
+        candidate_rows = np.arange(self.rows) if rows is None else np.asarray(rows, dtype=np.int64)
+        rescoring = self.dtype == "int8" and self.rescore_vectors is not None
+        first_pass_k = top_k * self.rescore_factor if rescoring else top_k
+        scores = self._approximate_scores(q, candidate_rows)
+        best = _top_k_largest(scores, first_pass_k)
+        best_rows = candidate_rows[best]
+
+        if rescoring:
+            best_rows = np.sort(best_rows)
+            exact = np.asarray(self.rescore_vectors[best_rows], dtype=np.float32) @ q
+            order = _top_k_largest(exact, top_k)
+            return best_rows[order], (1.0 - exact[order]).astype(np.float32)
+        return best_rows, (1.0 - scores[best]).astype(np.float32)
+
+    def _approximate_scores(self, q: np.ndarray, rows: np.ndarray) -> np.ndarray:
+        # Fold the per-dimension scales into the query so codes are used as-is.
+        weights = q * self.scales if self.scales is not None else q
+        scores = np.empty(len(rows), dtype=np.float32)
+        contiguous = rows.size == self.rows
+        for start in range(0, len(rows), _BLOCK_ROWS):
+            stop = min(start + _BLOCK_ROWS, len(rows))
+            block = self.vectors[start:stop] if contiguous else self.vectors[rows[start:stop]]
+            scores[start:stop] = np.asarray(block, dtype=np.float32) @ weights
+        return scores
+
+
+def _top_k_largest(values: np.ndarray, k: int) -> np.ndarray:
+    if k <= 0 or values.size == 0:
+        return np.empty(0, dtype=np.int64)
+    if k < values.size:
+        candidates = np.argpartition(-values, k - 1)[:k]
+    else:
+        candidates = np.arange(values.size)
+    return candidates[np.argsort(-values[candidates], kind="stable")]
+
+
+def main(argv: Optional[Sequence[str]] = None) -> None:
+    """Convert a Parquet/.npz embedding export into a store file."""
+
+    from backend.app.core.local_index import load_embedding_table
+
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    parser.add_argument("source", help="Parquet or .npz export with `asin` and `embedding` columns")
+    parser.add_argument("output", help="Path of the store file to write")
+    parser.add_argument("--dtype", choices=["int8", "float16"], default="int8")
+    parser.add_argument("--no-rescore", action="store_true", help="Omit the float16 rescoring copy")
+    args = parser.parse_args(argv)
+
+    table, embeddings = load_embedding_table(args.source, ["asin"])
+    write_embedding_store(
+        args.output, table["asin"], embeddings, dtype=args.dtype, include_rescore=not args.no_rescore
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,373 @@
+# app/core/lexical_index.py
+"""In-process BM25 index over product text, fused with vector retrieval.
+
+Brand names, model numbers and ASINs are matched poorly by embeddings, so
+`SearchEngine` also ranks products lexically and merges both rankings with reciprocal
+rank fusion. Build the index from the ETL Parquet output (or a product export):
+
+    python -m backend.app.core.lexical_index gs-export/processed_amazon_reviews lexical.npz
+    python -m backend.app.core.lexical_index new_partition.parquet lexical.npz --append
+
+Postings are stored per term as varint-encoded doc-id gaps followed by varint term
+frequencies, all in one byte array. A query decodes only its own terms' postings and
+scores them with NumPy.
+"""
+from __future__ import annotations
+
+import argparse
+import glob
+import logging
+import os
+import re
+from array import array
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+TEXT_COLUMNS = ("product_title", "cleaned_item_description", "product_categories")
+_TOKEN_RE = re.compile(r"[a-z0-9]+(?:[-./][a-z0-9]+)*")
+_SEPARATOR_RE = re.compile(r"[-./]")
+_HAS_LETTER = re.compile(r"[a-z]")
+_HAS_DIGIT = re.compile(r"[0-9]")
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercased alphanumeric tokens; "WH-1000XM4" yields "wh", "1000xm4" and "wh1000xm4"."""
+
+    tokens: List[str] = []
+    for match in _TOKEN_RE.findall((text or "").lower()):
+        parts = _SEPARATOR_RE.split(match)
+        tokens.extend(parts)
+        if len(parts) > 1:
+            tokens.append("".join(parts))
+    return tokens
+
+
+def encode_varints(values: np.ndarray) -> np.ndarray:
+    """LEB128-encode non-negative integers into a uint8 array (7 bits per byte)."""
+
+    values = np.asarray(values, dtype=np.uint64)
+    if not values.size:
+        return np.empty(0, dtype=np.uint8)
+    lengths = np.ones(values.size, dtype=np.int64)
+    for shift in range(7, 64, 7):
+        lengths += values >= (np.uint64(1) << np.uint64(shift))
+    owner = np.repeat(np.arange(values.size), lengths)
+    position = np.arange(owner.size) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+    chunks = (values[owner] >> (np.uint64(7) * position.astype(np.uint64))) & np.uint64(0x7F)
+    more = position < lengths[owner] - 1
+    return (chunks | (more.astype(np.uint64) << np.uint64(7))).astype(np.uint8)
+
+
+def decode_varints(data: np.ndarray) -> np.ndarray:
+    """Inverse of `encode_varints`."""
+
+    data = np.asarray(data, dtype=np.uint8)
+    if not data.size:
+        return np.empty(0, dtype=np.int64)
+    last = (data & 0x80) == 0
+    owner = np.concatenate(([0], np.cumsum(last)[:-1]))
+    starts = np.concatenate(([0], np.flatnonzero(last)[:-1] + 1))
+    position = np.arange(data.size) - starts[owner]
+    chunks = (data & 0x7F).astype(np.uint64) << (np.uint64(7) * position.astype(np.uint64))
+    values = np.zeros(int(last.sum()), dtype=np.uint64)
+    np.bitwise_or.at(values, owner, chunks)
+    return values.astype(np.int64)
+
+
+def reciprocal_rank_fusion(rankings: Sequence[Sequence[str]], k: int = 60) -> List[str]:
+    """Merge ranked id lists by summing 1 / (k + rank); ties keep first-seen order."""
+
+    scores: Dict[str, float] = {}
+    for ranking in rankings:
+        for rank, item in enumerate(ranking, start=1):
+            scores[item] = scores.get(item, 0.0) + 1.0 / (k + rank)
+    order = {item: position for position, item in enumerate(scores)}
+    return sorted(scores, key=lambda item: (-scores[item], order[item]))
+
+
+class LexicalIndex:
+    """BM25 over one document per ASIN, with compressed postings."""
+
+    def __init__(
+        self,
+        asins: Sequence[str],
+        doc_lengths: np.ndarray,
+        terms: Sequence[str],
+        doc_freqs: np.ndarray,
+        offsets: np.ndarray,
+        postings: np.ndarray,
+        k1: float = 1.2,
+        b: float = 0.75,
+    ):
+        self.asins = list(asins)
+        self.doc_lengths = np.asarray(doc_lengths, dtype=np.float32)
+        self.terms = list(terms)
+        self.doc_freqs = np.asarray(doc_freqs, dtype=np.int64)
+        self.offsets = np.asarray(offsets, dtype=np.int64)
+        self.postings = np.asarray(postings, dtype=np.uint8)
+        self.k1 = k1
+        self.b = b
+        self._term_ids = {term: term_id for term_id, term in enumerate(self.terms)}
+        self._asin_rows = {asin.lower(): row for row, asin in enumerate(self.asins)}
+        count = len(self.asins)
+        self._avg_length = float(self.doc_lengths.mean()) if count else 0.0
+        # BM25 idf, kept non-negative for terms in more than half of the documents
+        self._idf = np.log1p((count - self.doc_freqs + 0.5) / (self.doc_freqs + 0.5))
+
+    def __len__(self) -> int:
+        return len(self.asins)
+
+    def __contains__(self, asin: str) -> bool:
+        return asin.lower() in self._asin_rows
+
+    def postings_for(self, term: str) -> Tuple[np.ndarray, np.ndarray]:
+        """(doc rows ascending, term frequencies) for one term."""
+
+        term_id = self._term_ids.get(term)
+        if term_id is None:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+        values = decode_varints(self.postings[self.offsets[term_id]:self.offsets[term_id + 1]])
+        count = int(self.doc_freqs[term_id])
+        return np.cumsum(values[:count]), values[count:]
+
+    def scores(self, query: str) -> np.ndarray:
+        """BM25 score of every document for `query` (zero where no term matches)."""
+
+        scores = np.zeros(len(self.asins), dtype=np.float32)
+        norm = self.k1 * (1.0 - self.b + self.b * self.doc_lengths / (self._avg_length or 1.0))
+        for term in set(tokenize(query)):
+            rows, freqs = self.postings_for(term)
+            if rows.size:
+                tf = freqs.astype(np.float32)
+                # Rows are unique within one term's postings, so plain fancy-index += is safe
+                scores[rows] += self._idf[self._term_ids[term]] * tf * (self.k1 + 1.0) / (tf + norm[rows])
+        return scores
+
+    def search(self, query: str, top_k: int) -> List[Tuple[str, float]]:
+        """The `top_k` best (ASIN, BM25 score) pairs with a positive score."""
+
+        scores = self.scores(query)
+        matched = np.flatnonzero(scores > 0)
+        if not matched.size or top_k <= 0:
+            return []
+        if matched.size > top_k:
+            matched = matched[np.argpartition(-scores[matched], top_k - 1)[:top_k]]
+        ranked = matched[np.argsort(-scores[matched], kind="stable")]
+        return [(self.asins[row], float(scores[row])) for row in ranked]
+
+    def exact_matches(self, query: str, max_hits: int) -> List[str]:
+        """ASINs an identifier-like query names unambiguously, or [] to use full retrieval.
+
+        A query that is an indexed ASIN returns that product. A query with a token mixing
+        letters and digits (a model number) returns the products containing every query
+        token, ranked by BM25, when there are between 1 and `max_hits` of them.
+        """
+
+        terms = list(dict.fromkeys(tokenize(query)))
+        if not terms:
+            return []
+        if len(terms) == 1 and terms[0] in self._asin_rows:
+            return [self.asins[self._asin_rows[terms[0]]]]
+        if not any(_HAS_LETTER.search(term) and _HAS_DIGIT.search(term) for term in terms):
+            return []
+
+        rows: Optional[np.ndarray] = None
+        for term in terms:
+            term_rows, _ = self.postings_for(term)
+            rows = term_rows if rows is None else np.intersect1d(rows, term_rows, assume_unique=True)
+            if not rows.size:
+                return []
+        if rows.size > max_hits:
+            return []
+        scores = self.scores(query)[rows]
+        return [self.asins[row] for row in rows[np.argsort(-scores, kind="stable")]]
+
+    @classmethod
+    def load(cls, path: str) -> "LexicalIndex":
+        with np.load(path, allow_pickle=False) as data:
+            return cls(
+                data["asin"].tolist(),
+                data["doc_length"],
+                data["term"].tolist(),
+                data["doc_freq"],
+                data["offset"],
+                data["postings"],
+            )
+
+    def save(self, path: str) -> None:
+        np.savez(
+            path,
+            asin=np.asarray(self.asins, dtype=str),
+            doc_length=self.doc_lengths.astype(np.int32),
+            term=np.asarray(self.terms, dtype=str),
+            doc_freq=self.doc_freqs,
+            offset=self.offsets,
+            postings=self.postings,
+        )
+
+
+class LexicalIndexBuilder:
+    """Accumulates documents batch by batch and compresses them into a `LexicalIndex`.
+
+    Documents whose ASIN is already present are skipped, so the ETL output, which repeats
+    product columns on every review row, can be fed as is, and `from_index` lets new
+    partitions be appended to an existing index.
+    """
+
+    def __init__(self):
+        self.asins: List[str] = []
+        self._seen: Dict[str, int] = {}
+        self._term_ids: Dict[str, int] = {}
+        self._doc_lengths = array("I")
+        self._entry_terms = array("I")
+        self._entry_docs = array("I")
+        self._entry_freqs = array("I")
+
+    @classmethod
+    def from_index(cls, index: LexicalIndex) -> "LexicalIndexBuilder":
+        builder = cls()
+        builder.asins = list(index.asins)
+        builder._seen = {asin: row for row, asin in enumerate(index.asins)}
+        builder._term_ids = {term: term_id for term_id, term in enumerate(index.terms)}
+        builder._doc_lengths = array("I", index.doc_lengths.astype(np.uint32).tolist())
+        values = decode_varints(index.postings)
+        counts = index.doc_freqs
+        term_of_entry = np.repeat(np.arange(len(counts)), counts)
+        first_entry = np.cumsum(counts) - counts
+        # Term t's values are its gaps then its frequencies, starting at value 2 * first_entry[t]
+        within = np.arange(term_of_entry.size) - first_entry[term_of_entry]
+        gap_at = 2 * first_entry[term_of_entry] + within
+        gaps = values[gap_at]
+        starts = np.zeros(term_of_entry.size, dtype=bool)
+        starts[first_entry[counts > 0]] = True
+        docs = _segment_cumsum(gaps, starts)
+        builder._entry_terms = array("I", term_of_entry.astype(np.uint32).tolist())
+        builder._entry_docs = array("I", docs.astype(np.uint32).tolist())
+        builder._entry_freqs = array("I", values[gap_at + counts[term_of_entry]].astype(np.uint32).tolist())
+        return builder
+
+    def add(self, asin: str, text: str) -> bool:
+        """Index one product; returns False when the ASIN was already indexed."""
+
+        asin = str(asin)
+        if not asin or asin in self._seen:
+            return False
+        doc = len(self.asins)
+        self._seen[asin] = doc
+        self.asins.append(asin)
+        tokens = tokenize(text) + [asin.lower()]
+        counts: Dict[int, int] = {}
+        for token in tokens:
+            term_id = self._term_ids.setdefault(token, len(self._term_ids))
+            counts[term_id] = counts.get(term_id, 0) + 1
+        self._doc_lengths.append(len(tokens))
+        self._entry_terms.extend(counts.keys())
+        self._entry_docs.extend([doc] * len(counts))
+        self._entry_freqs.extend(counts.values())
+        return True
+
+    def add_many(self, asins: Iterable[str], texts: Iterable[str]) -> int:
+        return sum(self.add(asin, text) for asin, text in zip(asins, texts))
+
+    def build(self) -> LexicalIndex:
+        terms = sorted(self._term_ids, key=self._term_ids.get)
+        order = sorted(range(len(terms)), key=terms.__getitem__)
+        remap = np.empty(len(terms), dtype=np.int64)
+        remap[order] = np.arange(len(terms))
+
+        term_ids = remap[np.frombuffer(self._entry_terms, dtype=np.uint32)] if terms else np.empty(0, np.int64)
+        docs = np.frombuffer(self._entry_docs, dtype=np.uint32).astype(np.int64)
+        freqs = np.frombuffer(self._entry_freqs, dtype=np.uint32).astype(np.int64)
+        entries = np.lexsort((docs, term_ids))
+        term_ids, docs, freqs = term_ids[entries], docs[entries], freqs[entries]
+
+        counts = np.bincount(term_ids, minlength=len(terms))
+        first_entry = np.cumsum(counts) - counts
+        starts = np.zeros(docs.size, dtype=bool)
+        starts[first_entry[counts > 0]] = True
+        gaps = docs - np.where(starts, 0, np.concatenate(([0], docs[:-1])))
+
+        values = np.empty(2 * docs.size, dtype=np.int64)
+        within = np.arange(docs.size) - first_entry[term_ids]
+        gap_at = 2 * first_entry[term_ids] + within
+        values[gap_at] = gaps
+        values[gap_at + counts[term_ids]] = freqs
+
+        encoded = encode_varints(values)
+        # Byte offset of every value: each value ends at a byte without the continuation bit
+        value_offsets = np.concatenate(([0], np.flatnonzero((encoded & 0x80) == 0) + 1))
+        offsets = value_offsets[2 * np.concatenate((first_entry, [docs.size]))]
+        return LexicalIndex(
+            self.asins,
+            np.frombuffer(self._doc_lengths, dtype=np.uint32),
+            [terms[i] for i in order],
+            counts,
+            offsets,
+            encoded,
+        )
+
+
+def _segment_cumsum(values: np.ndarray, starts: np.ndarray) -> np.ndarray:
+    """Cumulative sum of `values` restarting wherever `starts` is True."""
+
+    totals = np.cumsum(values)
+    if not totals.size:
+        return totals
+    base = np.where(starts, totals - values, 0)
+    return totals - np.maximum.accumulate(base)
+
+
+def iter_parquet_documents(paths: Sequence[str], batch_size: int = 65536) -> Iterator[Tuple[List[str], List[str]]]:
+    """(asins, texts) batches from Parquet files, read a record batch at a time."""
+
+    try:
+        import pyarrow.parquet as pq  # type: ignore
+    except ImportError as exc:  # pragma: no cover - optional dependency
+        raise RuntimeError("pyarrow is required to build the lexical index from Parquet") from exc
+
+    for path in paths:
+        parquet = pq.ParquetFile(path)
+        available = set(parquet.schema_arrow.names)
+        columns = ["asin"] + [name for name in TEXT_COLUMNS if name in available]
+        for batch in parquet.iter_batches(batch_size=batch_size, columns=columns):
+            table = batch.to_pydict()
+            texts = [
+                " ".join(str(table[name][row] or "") for name in columns[1:])
+                for row in range(batch.num_rows)
+            ]
+            yield table["asin"], texts
+
+
+def _parquet_files(path: str) -> List[str]:
+    if os.path.isdir(path):
+        return sorted(glob.glob(os.path.join(path, "**", "*.parquet"), recursive=True))
+    return [path]
+
+
+def main(argv: Optional[Sequence[str]] = None) -> None:
+    """Build (or extend) the lexical product index from Parquet product or ETL output."""
+
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    parser.add_argument("inputs", nargs="+", help="Parquet files or directories (searched recursively)")
+    parser.add_argument("output", help="Path of the .npz index to write")
+    parser.add_argument("--append", action="store_true", help="Add new ASINs to the existing index at `output`")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    builder = LexicalIndexBuilder()
+    if args.append and os.path.exists(args.output):
+        builder = LexicalIndexBuilder.from_index(LexicalIndex.load(args.output))
+    paths = [file for path in args.inputs for file in _parquet_files(path)]
+    added = 0
+    for asins, texts in iter_parquet_documents(paths):
+        added += builder.add_many(asins, texts)
+    index = builder.build()
+    index.save(args.output)
+    logger.info("Wrote lexical index", extra={"products": len(index), "added": added, "terms": len(index.terms)})
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,547 @@
+# app/core/local_index.py
+"""In-process retrieval backend that mirrors the BigQuery hybrid search.
+
+Product and review embeddings are loaded from a local export (Parquet or NumPy `.npz`)
+into memory and searched with NumPy, either exactly (brute force) or approximately with
+an inverted-file (IVF) index. `LocalRetriever.search` returns rows shaped like the
+BigQuery query output so `SearchEngine._structure_results` can consume either.
+"""
+from __future__ import annotations
+
+import logging
+import math
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+from backend.app.core.embedding_store import EmbeddingStore
+from backend.app.core.review_aggregates import ReviewAggregates
+from backend.app.schemas.search import SearchFilters
+
+logger = logging.getLogger(__name__)
+
+PRODUCT_COLUMNS = (
+    "asin",
+    "product_title",
+    "cleaned_item_description",
+    "product_categories",
+    # Filter columns (see `SearchFilters`); missing columns load as None
+    "main_category",
+    "average_rating",
+    "price",
+)
+REVIEW_COLUMNS = ("asin", "user_id", "rating", "content", "review_timestamp", "verified_purchase")
+REVIEW_MODES = ("global", "two_stage", "centroid")
+# In two-stage mode each candidate's nearest `reviews_per_product * TWO_STAGE_REVIEW_POOL`
+# reviews are scored, leaving room to prefer rated reviews as the global mode does
+TWO_STAGE_REVIEW_POOL = 2
+
+
+def _normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    matrix = np.asarray(matrix, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+def _top_k_smallest(values: np.ndarray, k: int) -> np.ndarray:
+    """Indices of the k smallest values, sorted ascending."""
+    if k <= 0 or values.size == 0:
+        return np.empty(0, dtype=np.int64)
+    if k < values.size:
+        candidates = np.argpartition(values, k - 1)[:k]
+    else:
+        candidates = np.arange(values.size)
+    return candidates[np.argsort(values[candidates], kind="stable")]
+
+
+class VectorIndex:
+    """Cosine-distance index over a matrix of embeddings.
+
+    `mode="exact"` scores every row. `mode="ivf"` clusters rows with k-means into `nlist`
+    inverted lists and only scores the rows in the `nprobe` lists closest to the query.
+    """
+
+    def __init__(
+        self,
+        vectors: np.ndarray,
+        mode: str = "exact",
+        nlist: int = 0,
+        nprobe: int = 8,
+        train_iterations: int = 10,
+        seed: int = 0,
+    ):
+        if mode not in {"exact", "ivf"}:
+            raise ValueError(f"Unknown index mode: {mode}")
+        self.vectors = _normalize_rows(vectors)
+        self.mode = mode
+        self.nprobe = max(1, nprobe)
+        self._centroids: Optional[np.ndarray] = None
+        self._lists: List[np.ndarray] = []
+        if mode == "ivf" and len(self.vectors):
+            nlist = nlist or int(math.sqrt(len(self.vectors)))
+            self._train_ivf(max(1, min(nlist, len(self.vectors))), train_iterations, seed)
+
+    def __len__(self) -> int:
+        return len(self.vectors)
+
+    def search(
+        self, query: Sequence[float], top_k: int, rows: Optional[np.ndarray] = None
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Return (row indices, cosine distances) of the `top_k` nearest rows.
+
+        When `rows` is given, only those rows are scored, exactly, in either mode.
+        """
+
+        q = np.asarray(query, dtype=np.float32)
+        norm = float(np.linalg.norm(q))
+        if norm == 0.0 or not len(self.vectors):
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        q = q / norm
+
+        if rows is not None:
+            rows = np.asarray(rows, dtype=np.int64)
+            distances = 1.0 - self.vectors[rows] @ q
+            best = _top_k_smallest(distances, top_k)
+            return rows[best], distances[best]
+
+        if self._centroids is None:
+            distances = 1.0 - self.vectors @ q
+            best = _top_k_smallest(distances, top_k)
+            return best, distances[best]
+
+        centroid_distances = 1.0 - self._centroids @ q
+        probe = _top_k_smallest(centroid_distances, self.nprobe)
+        rows = np.concatenate([self._lists[i] for i in probe])
+        distances = 1.0 - self.vectors[rows] @ q
+        best = _top_k_smallest(distances, top_k)
+        return rows[best], distances[best]
+
+    def _train_ivf(self, nlist: int, iterations: int, seed: int) -> None:
+        rng = np.random.default_rng(seed)
+        sample_size = min(len(self.vectors), max(nlist * 40, 10000))
+        sample = self.vectors[rng.choice(len(self.vectors), sample_size, replace=False)]
+        centroids = sample[rng.choice(sample_size, nlist, replace=False)].copy()
+
+        for _ in range(iterations):
+            assignment = np.argmax(sample @ centroids.T, axis=1)
+            for cluster in range(nlist):
+                members = sample[assignment == cluster]
+                if len(members):
+                    centroids[cluster] = members.mean(axis=0)
+            centroids = _normalize_rows(centroids)
+
+        assignment = np.concatenate(
+            [
+                np.argmax(self.vectors[start:start + 65536] @ centroids.T, axis=1)
+                for start in range(0, len(self.vectors), 65536)
+            ]
+        )
+        order = np.argsort(assignment, kind="stable")
+        bounds = np.searchsorted(assignment[order], np.arange(nlist + 1))
+        self._centroids = centroids
+        self._lists = [order[bounds[i]:bounds[i + 1]] for i in range(nlist)]
+        logger.info("Trained IVF index", extra={"rows": len(self.vectors), "nlist": nlist})
+
+
+def load_embedding_table(
+    path: str, columns: Sequence[str], include_embeddings: bool = True
+) -> Tuple[Dict[str, List[Any]], Optional[np.ndarray]]:
+    """Load metadata columns and the `embedding` matrix from a Parquet or `.npz` export.
+
+    With `include_embeddings=False` only the metadata is read and the matrix is None,
+    which is how exports are loaded when the vectors come from an `EmbeddingStore`.
+    """
+
+    if path.endswith(".npz"):
+        with np.load(path, allow_pickle=True) as data:
+            row_count = len(data[columns[0]])
+            embeddings = np.asarray(data["embedding"], dtype=np.float32) if include_embeddings else None
+            table = {name: data[name].tolist() if name in data else [None] * row_count for name in columns}
+        return table, embeddings
+
+    try:
+        import pyarrow.parquet as pq  # type: ignore
+    except ImportError as exc:  # pragma: no cover - optional dependency
+        raise RuntimeError("pyarrow is required to load Parquet embedding exports") from exc
+
+    available = set(pq.read_schema(path).names)
+    read_columns = [name for name in columns if name in available]
+    if include_embeddings:
+        read_columns.append("embedding")
+    arrow_table = pq.read_table(path, columns=read_columns)
+    table = {
+        name: arrow_table.column(name).to_pylist() if name in available else [None] * arrow_table.num_rows
+        for name in columns
+    }
+    if not include_embeddings:
+        return table, None
+    embedding_column = arrow_table.column("embedding").combine_chunks()
+    dim = len(embedding_column[0]) if arrow_table.num_rows else 0
+    embeddings = np.asarray(embedding_column.flatten().to_numpy(zero_copy_only=False), dtype=np.float32)
+    return table, embeddings.reshape(arrow_table.num_rows, dim)
+
+
+class LocalRetriever:
+    """Runs the hybrid product + review search against in-memory indexes.
+
+    Candidate counts and the combined score mirror the BigQuery query in
+    `SearchEngine._bigquery_search` (including its use of cosine distance in the
+    similarity terms) so both backends rank results identically.
+
+    `review_mode="global"` searches all reviews once and keeps the matches that belong to
+    a candidate product. `review_mode="two_stage"` looks up each candidate's reviews by
+    ASIN and scores only those, so every candidate gets reviews whenever it has any.
+    `review_mode="centroid"` ranks candidates against the review centroids in
+    `aggregates` and looks up reviews only for the products returned.
+
+    With `aggregates`, `avg_rating` and `rating_count` come from all of a product's
+    reviews instead of the matched ones, as with the BigQuery aggregate table.
+
+    `SearchFilters` are evaluated as a boolean mask over column arrays built at load
+    time, and only the matching rows are searched, so a filtered query still gets
+    `products_k * 5` candidates.
+    """
+
+    def __init__(
+        self,
+        products: Dict[str, List[Any]],
+        product_embeddings: Union[np.ndarray, EmbeddingStore],
+        reviews: Dict[str, List[Any]],
+        review_embeddings: Union[np.ndarray, EmbeddingStore],
+        mode: str = "exact",
+        nlist: int = 0,
+        nprobe: int = 8,
+        review_mode: str = "global",
+        aggregates: Optional[ReviewAggregates] = None,
+    ):
+        if review_mode not in REVIEW_MODES:
+            raise ValueError(f"Unknown review mode: {review_mode}")
+        if review_mode == "centroid" and aggregates is None:
+            raise ValueError("The centroid review mode needs review aggregates")
+        self.products = products
+        self.reviews = reviews
+        self.review_mode = review_mode
+        self.aggregates = aggregates
+        self.product_index = self._build_index(products, product_embeddings, mode, nlist, nprobe)
+        self.review_index = self._build_index(reviews, review_embeddings, mode, nlist, nprobe)
+        self._review_asins = np.asarray(reviews.get("asin", []), dtype=object)
+        self._review_groups: Optional[Dict[str, np.ndarray]] = None
+        self._product_rows: Optional[Dict[str, int]] = None
+        row_count = len(products.get("asin", []))
+        self._categories = np.asarray(products.get("main_category") or [None] * row_count, dtype=object)
+        self._ratings = _float_column(products.get("average_rating"), row_count)
+        self._prices = _float_column(products.get("price"), row_count)
+
+    @staticmethod
+    def _build_index(
+        table: Dict[str, List[Any]],
+        embeddings: Union[np.ndarray, EmbeddingStore],
+        mode: str,
+        nlist: int,
+        nprobe: int,
+    ) -> Union[VectorIndex, EmbeddingStore]:
+        row_count = len(table.get("asin", []))
+        if len(embeddings) != row_count:
+            raise ValueError(f"Embedding rows ({len(embeddings)}) do not match metadata rows ({row_count})")
+        if isinstance(embeddings, EmbeddingStore):
+            # Memory-mapped stores are searched in place; IVF would copy them into RAM.
+            return embeddings
+        return VectorIndex(embeddings, mode=mode, nlist=nlist, nprobe=nprobe)
+
+    @classmethod
+    def from_files(
+        cls,
+        products_path: str,
+        reviews_path: str,
+        mode: str = "exact",
+        nlist: int = 0,
+        nprobe: int = 8,
+        products_store_path: Optional[str] = None,
+        reviews_store_path: Optional[str] = None,
+        review_mode: str = "global",
+        aggregates_path: Optional[str] = None,
+    ) -> "LocalRetriever":
+        """Load exports; `*_store_path` replaces the export's embedding column with a store file.
+
+        `aggregates_path` is a file written by `python -m backend.app.core.review_aggregates`.
+        """
+
+        products, product_embeddings = load_embedding_table(
+            products_path, PRODUCT_COLUMNS, include_embeddings=products_store_path is None
+        )
+        reviews, review_embeddings = load_embedding_table(
+            reviews_path, REVIEW_COLUMNS, include_embeddings=reviews_store_path is None
+        )
+        if products_store_path:
+            product_embeddings = EmbeddingStore.open(products_store_path)
+        if reviews_store_path:
+            review_embeddings = EmbeddingStore.open(reviews_store_path)
+        logger.info(
+            "Loaded local retrieval index",
+            extra={"products": len(product_embeddings), "reviews": len(review_embeddings), "mode": mode},
+        )
+        aggregates = ReviewAggregates.load(aggregates_path) if aggregates_path else None
+        return cls(
+            products, product_embeddings, reviews, review_embeddings, mode, nlist, nprobe, review_mode, aggregates
+        )
+
+    def search(
+        self,
+        query_embedding: Sequence[float],
+        products_k: int = 5,
+        reviews_per_product: int = 3,
+        filters: Optional[SearchFilters] = None,
+    ) -> List[Dict[str, Any]]:
+        allowed = self._filter_rows(filters)
+        if allowed is not None and not allowed.size:
+            return []
+        product_rows, product_distances = self.product_index.search(query_embedding, products_k * 5, rows=allowed)
+        candidates: Dict[str, Tuple[int, float]] = {}
+        for row, distance in zip(product_rows.tolist(), product_distances.tolist()):
+            candidates.setdefault(self.products["asin"][row], (row, distance))
+
+        if self.review_mode == "centroid":
+            return self._centroid_search(query_embedding, candidates, products_k, reviews_per_product)
+        if self.review_mode == "two_stage":
+            # Each product is scored as soon as its own reviews are fetched
+            scored = [
+                self._score_product(
+                    asin,
+                    row,
+                    distance,
+                    self._candidate_reviews(query_embedding, asin, reviews_per_product),
+                    reviews_per_product,
+                )
+                for asin, (row, distance) in candidates.items()
+            ]
+        else:
+            matches = self._global_review_matches(query_embedding, candidates, products_k, reviews_per_product)
+            scored = [
+                self._score_product(asin, row, distance, matches.get(asin, []), reviews_per_product)
+                for asin, (row, distance) in candidates.items()
+            ]
+        scored.sort(key=lambda item: item["combined_score"], reverse=True)
+        return scored[:products_k]
+
+    def lookup(self, asins: Sequence[str], reviews_per_product: int = 3) -> List[Dict[str, Any]]:
+        """Rows for known ASINs without a query embedding, in `asins` order.
+
+        Used when lexical retrieval names products directly. Similarity fields are None
+        and reviews are ordered by rating presence, verified purchase and recency.
+        """
+
+        if self._product_rows is None:
+            self._product_rows = {}
+            for row, asin in enumerate(self.products["asin"]):
+                self._product_rows.setdefault(asin, row)
+        results = []
+        for asin in asins:
+            row = self._product_rows.get(asin)
+            if row is None:
+                continue
+            reviews = [self._review_row(review_row, None) for review_row in self._rows_for_asin(asin).tolist()]
+            reviews = sorted(
+                (review for review in reviews if review is not None),
+                key=lambda r: (
+                    -r["has_rating"],
+                    not r["verified_purchase"],
+                    _timestamp_sort_key(r["review_timestamp"]),
+                ),
+            )
+            avg_rating, rating_count = self._rating_summary(asin, reviews)
+            results.append(
+                {
+                    **self._product_fields(asin, row),
+                    "product_similarity": None,
+                    "reviews": reviews[:reviews_per_product],
+                    "avg_rating": avg_rating,
+                    "rating_count": rating_count,
+                    "combined_score": None,
+                }
+            )
+        return results
+
+    def _filter_rows(self, filters: Optional[SearchFilters]) -> Optional[np.ndarray]:
+        """Product rows passing `filters`, or None when nothing is filtered."""
+
+        if filters is None or filters.is_empty():
+            return None
+        category, min_rating, min_price, max_price = filters.cache_key()
+        mask = np.ones(len(self._ratings), dtype=bool)
+        if category is not None:
+            mask &= self._categories == category
+        # NaN (missing) ratings and prices never satisfy a bound
+        if min_rating is not None:
+            mask &= self._ratings >= min_rating
+        if min_price is not None:
+            mask &= self._prices >= min_price
+        if max_price is not None:
+            mask &= self._prices <= max_price
+        return np.flatnonzero(mask)
+
+    def _centroid_search(
+        self,
+        query_embedding: Sequence[float],
+        candidates: Dict[str, Tuple[int, float]],
+        products_k: int,
+        reviews_per_product: int,
+    ) -> List[Dict[str, Any]]:
+        """Rank on review centroids, then fetch reviews for the returned products only."""
+
+        scored = []
+        for asin, (row, distance) in candidates.items():
+            product = self._score_product(asin, row, distance, [], reviews_per_product)
+            centroid_distance = self.aggregates.centroid_distance(query_embedding, asin)
+            product["combined_score"] += 0.2 * (centroid_distance or 0)
+            scored.append(product)
+        scored.sort(key=lambda item: item["combined_score"], reverse=True)
+        for product in scored[:products_k]:
+            reviews = self._candidate_reviews(query_embedding, product["asin"], reviews_per_product)
+            product["reviews"] = self._rank_reviews(reviews)[:reviews_per_product]
+        return scored[:products_k]
+
+    def _global_review_matches(
+        self,
+        query_embedding: Sequence[float],
+        candidates: Dict[str, Tuple[int, float]],
+        products_k: int,
+        reviews_per_product: int,
+    ) -> Dict[str, List[Dict[str, Any]]]:
+        review_rows, review_distances = self.review_index.search(
+            query_embedding, products_k * reviews_per_product * 10
+        )
+        matches: Dict[str, List[Dict[str, Any]]] = {}
+        for row, distance in zip(review_rows.tolist(), review_distances.tolist()):
+            asin = self._review_asins[row]
+            if asin in candidates:
+                review = self._review_row(row, distance)
+                if review is not None:
+                    matches.setdefault(asin, []).append(review)
+        return matches
+
+    def _candidate_reviews(
+        self, query_embedding: Sequence[float], asin: str, reviews_per_product: int
+    ) -> List[Dict[str, Any]]:
+        """Nearest reviews of one product, searched among that product's rows only."""
+
+        rows = self._rows_for_asin(asin)
+        if not rows.size:
+            return []
+        review_rows, review_distances = self.review_index.search(
+            query_embedding, reviews_per_product * TWO_STAGE_REVIEW_POOL, rows=rows
+        )
+        reviews = [
+            self._review_row(row, distance)
+            for row, distance in zip(review_rows.tolist(), review_distances.tolist())
+        ]
+        return [review for review in reviews if review is not None]
+
+    def _rows_for_asin(self, asin: str) -> np.ndarray:
+        if isinstance(self.review_index, EmbeddingStore):
+            return self.review_index.group_rows(asin)
+        if self._review_groups is None:
+            keys = self._review_asins.astype(str)
+            order = np.argsort(keys, kind="stable")
+            unique, starts = np.unique(keys[order], return_index=True)
+            bounds = np.append(starts, len(order))
+            self._review_groups = {
+                key: order[bounds[i]:bounds[i + 1]] for i, key in enumerate(unique.tolist())
+            }
+        return self._review_groups.get(asin, np.empty(0, dtype=np.int64))
+
+    def _review_row(self, row: int, distance: Optional[float]) -> Optional[Dict[str, Any]]:
+        content = self.reviews["content"][row]
+        if not content or len(content) <= 10:
+            return None
+        rating = self.reviews["rating"][row]
+        return {
+            "user_id": self.reviews["user_id"][row],
+            "rating": rating,
+            "review_content": content,
+            "review_timestamp": self.reviews["review_timestamp"][row],
+            "verified_purchase": self.reviews["verified_purchase"][row],
+            "review_similarity": distance,
+            "has_rating": 1 if rating is not None and rating > 0 else 0,
+        }
+
+    def _score_product(
+        self,
+        asin: str,
+        row: int,
+        distance: float,
+        reviews: List[Dict[str, Any]],
+        reviews_per_product: int,
+    ) -> Dict[str, Any]:
+        avg_rating, rating_count = self._rating_summary(asin, reviews)
+        avg_review_similarity = (
+            sum(r["review_similarity"] for r in reviews) / len(reviews) if reviews else None
+        )
+        return {
+            **self._product_fields(asin, row),
+            "product_similarity": distance,
+            "reviews": self._rank_reviews(reviews)[:reviews_per_product],
+            "avg_rating": avg_rating,
+            "rating_count": rating_count,
+            "combined_score": (
+                0.7 * distance
+                + 0.2 * (avg_review_similarity or 0)
+                + 0.1 * (avg_rating / 5 if avg_rating is not None else 0)
+            ),
+        }
+
+    def _product_fields(self, asin: str, row: int) -> Dict[str, Any]:
+        title = self.products["product_title"][row] or ""
+        description = self.products["cleaned_item_description"][row] or ""
+        categories = self.products["product_categories"][row] or ""
+        return {
+            "asin": asin,
+            "product_title": title,
+            "cleaned_item_description": description,
+            "product_categories": categories,
+            "product_content": f"{title}\n{description}\n{categories}",
+        }
+
+    def _rating_summary(self, asin: str, reviews: List[Dict[str, Any]]) -> Tuple[Optional[float], int]:
+        """(avg_rating, rating_count) from the aggregates when loaded, else from `reviews`."""
+        if self.aggregates is not None:
+            aggregate = self.aggregates.get(asin) or {}
+            return aggregate.get("avg_rating"), aggregate.get("rating_count", 0)
+        ratings = [r["rating"] for r in reviews if r["rating"] is not None]
+        avg_rating = sum(ratings) / len(ratings) if ratings else None
+        return avg_rating, sum(1 for rating in ratings if rating > 0)
+
+    @staticmethod
+    def _rank_reviews(reviews: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        return sorted(
+            reviews,
+            key=lambda r: (
+                -r["has_rating"],
+                r["review_similarity"],
+                -(r["rating"] or 0),
+                _timestamp_sort_key(r["review_timestamp"]),
+            ),
+        )
+
+
+def _float_column(values: Optional[List[Any]], row_count: int) -> np.ndarray:
+    """Numeric filter column with NaN for missing or unparseable values."""
+    column = np.full(row_count, np.nan, dtype=np.float64)
+    for row, value in enumerate(values or ()):
+        try:
+            column[row] = float(value)
+        except (TypeError, ValueError):
+            pass
+    return column
+
+
+def _timestamp_sort_key(value: Any) -> float:
+    """Sort key placing newer timestamps first; missing timestamps sort last."""
+    if value is None:
+        return math.inf
+    if hasattr(value, "timestamp"):
+        return -value.timestamp()
+    try:
+        return -float(value)
+    except (TypeError, ValueError):
+        return math.inf
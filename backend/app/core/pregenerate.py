@@ -0,0 +1,153 @@
+# app/core/pregenerate.py
+"""Offline generation of product analyses into a `PregeneratedAnalysisStore`.
+
+    python -m backend.app.core.pregenerate product_embeddings.parquet analyses.db \
+        --reviews review_embeddings.parquet --asins popular_asins.txt --concurrency 16
+
+Products are read from the same Parquet/.npz exports the local retrieval backend uses
+(embedding columns are not loaded). The store doubles as the checkpoint: it is synced
+after every batch, and ASINs already in it are skipped, so an interrupted run picks up
+where it stopped. Placeholders are never written, so failed products are retried on
+the next run.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import logging
+import time
+from typing import Any, Dict, List, Optional, Sequence
+
+from backend.app.core.local_index import PRODUCT_COLUMNS, REVIEW_COLUMNS, load_embedding_table
+from backend.app.core.pregenerated_store import PregeneratedAnalysisStore
+from backend.app.core.rag_pipeline import RAGPipeline
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_QUERY = "General overview of this product for a typical shopper"
+
+
+def load_products(
+    products_path: str,
+    reviews_path: Optional[str] = None,
+    asins: Optional[Sequence[str]] = None,
+    reviews_per_product: int = 8,
+) -> List[Dict[str, Any]]:
+    """Product dicts shaped like search results, in export order (or `asins` order)."""
+
+    table, _ = load_embedding_table(products_path, PRODUCT_COLUMNS, include_embeddings=False)
+    products: Dict[str, Dict[str, Any]] = {}
+    for row in range(len(table["asin"])):
+        asin = table["asin"][row]
+        if asin and asin not in products:
+            products[asin] = {name: table[name][row] for name in PRODUCT_COLUMNS}
+            products[asin]["reviews"] = []
+
+    if reviews_path:
+        reviews, _ = load_embedding_table(reviews_path, REVIEW_COLUMNS, include_embeddings=False)
+        for row in range(len(reviews["asin"])):
+            product = products.get(reviews["asin"][row])
+            if product is not None:
+                product["reviews"].append(
+                    {
+                        "content": reviews["content"][row],
+                        "rating": reviews["rating"][row],
+                        "verified_purchase": reviews["verified_purchase"][row],
+                        "user_id": reviews["user_id"][row],
+                        "timestamp": reviews["review_timestamp"][row],
+                    }
+                )
+        for product in products.values():
+            # Without a query to rank by, prefer rated, verified and more detailed reviews
+            product["reviews"].sort(
+                key=lambda r: (r["rating"] is None, not r["verified_purchase"], -len(r["content"] or ""))
+            )
+            del product["reviews"][reviews_per_product:]
+
+    if asins is None:
+        return list(products.values())
+    missing = [asin for asin in asins if asin not in products]
+    if missing:
+        logger.warning("ASINs not found in the product export", extra={"missing_count": len(missing)})
+    return [products[asin] for asin in asins if asin in products]
+
+
+async def pregenerate(
+    pipeline: RAGPipeline,
+    store: PregeneratedAnalysisStore,
+    products: List[Dict[str, Any]],
+    query: str = DEFAULT_QUERY,
+    batch_size: int = 64,
+    concurrency: int = 16,
+) -> Dict[str, int]:
+    """Generate and store analyses for the products not yet in `store`."""
+
+    todo = [p for p in products if str(p["asin"]) not in store]
+    counts = {"total": len(products), "skipped": len(products) - len(todo), "stored": 0, "failed": 0}
+    started = time.perf_counter()
+    for start in range(0, len(todo), batch_size):
+        batch = todo[start:start + batch_size]
+        analyses = await pipeline.generate_batch_explanations(query, batch, max_concurrency=concurrency)
+        valid = [a for a in analyses if not RAGPipeline.is_placeholder(a)]
+        store.put_many(valid)
+        store.sync()
+        counts["stored"] += len(valid)
+        counts["failed"] += len(analyses) - len(valid)
+        logger.info(
+            "Pre-generated %s/%s products",
+            min(start + batch_size, len(todo)),
+            len(todo),
+            extra={**counts, "elapsed_s": round(time.perf_counter() - started, 1)},
+        )
+    return counts
+
+
+def main(argv: Optional[Sequence[str]] = None) -> None:
+    """Pre-generate product analyses into a store that /search reads before calling Gemini."""
+
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    parser.add_argument("products", help="Parquet or .npz product export (e.g. of unique_products)")
+    parser.add_argument("output", help="Path of the analysis store to create or resume")
+    parser.add_argument("--reviews", help="Parquet or .npz review export")
+    parser.add_argument("--asins", help="File with one ASIN per line; defaults to every product")
+    parser.add_argument("--query", default=DEFAULT_QUERY, help="Shopper query used in the prompt")
+    parser.add_argument("--reviews-per-product", type=int, default=8)
+    parser.add_argument("--batch-size", type=int, default=64, help="Products per checkpoint")
+    parser.add_argument(
+        "--concurrency", type=int, default=16, help="Max in-flight LLM calls (also capped by LLM_MAX_CONCURRENCY)"
+    )
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    from backend.app.config import LLM_MODEL_NAME
+    from backend.app.core.rag_pipeline import PROMPT_VERSION
+    from backend.app.dependencies import get_langchain_llm
+
+    asins = None
+    if args.asins:
+        with open(args.asins, encoding="utf-8") as handle:
+            asins = [line.strip() for line in handle if line.strip()]
+    products = load_products(args.products, args.reviews, asins, args.reviews_per_product)
+
+    store = PregeneratedAnalysisStore(args.output, writable=True)
+    if store.metadata and not store.matches(LLM_MODEL_NAME, PROMPT_VERSION):
+        parser.error(f"{args.output} holds analyses from {store.metadata}; use a new output path")
+    store.set_metadata(LLM_MODEL_NAME, PROMPT_VERSION)
+    try:
+        counts = asyncio.run(
+            pregenerate(
+                RAGPipeline(get_langchain_llm()),
+                store,
+                products,
+                query=args.query,
+                batch_size=max(1, args.batch_size),
+                concurrency=max(1, args.concurrency),
+            )
+        )
+    finally:
+        store.close()
+    logger.info("Pre-generation finished", extra=counts)
+
+
+if __name__ == "__main__":
+    main()
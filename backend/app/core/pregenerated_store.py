@@ -0,0 +1,113 @@
+# app/core/pregenerated_store.py
+"""Read-mostly store of analyses generated offline for the catalog.
+
+`backend.app.core.pregenerate` fills it ahead of time; `RAGPipeline` looks products up
+by ASIN before calling the LLM. Records are zlib-compressed `ProductAnalysis` JSON in a
+`dbm` file keyed by ASIN, so a lookup is one hash probe and one small read. A metadata
+record notes the prompt version and model the analyses were generated with.
+"""
+from __future__ import annotations
+
+import dbm
+import json
+import logging
+import threading
+import time
+import zlib
+from typing import Any, Dict, Iterable, List, Optional
+
+from pydantic import ValidationError
+
+from backend.app.schemas.llm_outputs import ProductAnalysis
+
+logger = logging.getLogger(__name__)
+
+_META_KEY = b"__meta__"
+
+
+class PregeneratedAnalysisStore:
+    """ASIN -> `ProductAnalysis` lookups backed by a `dbm` file.
+
+    Reads block on disk, so async callers run them in a worker thread; the store is safe
+    to use from several threads at once.
+    """
+
+    def __init__(self, path: str, writable: bool = False):
+        self.path = path
+        self.writable = writable
+        self._db = dbm.open(path, "c" if writable else "r")
+        self._lock = threading.Lock()
+        self._counters: Dict[str, int] = {"hits": 0, "misses": 0}
+        raw_meta = self._db.get(_META_KEY)
+        self.metadata: Dict[str, Any] = json.loads(raw_meta) if raw_meta else {}
+
+    def matches(self, model_name: str, prompt_version: str) -> bool:
+        """Whether the stored analyses came from this model and prompt version."""
+
+        return (
+            self.metadata.get("model_name") == model_name
+            and self.metadata.get("prompt_version") == prompt_version
+        )
+
+    def set_metadata(self, model_name: str, prompt_version: str) -> None:
+        self.metadata = {
+            "model_name": model_name,
+            "prompt_version": prompt_version,
+            "updated_at": time.time(),
+        }
+        with self._lock:
+            self._db[_META_KEY] = json.dumps(self.metadata).encode("utf-8")
+
+    def get(self, asin: str) -> Optional[ProductAnalysis]:
+        with self._lock:
+            payload = self._db.get(str(asin).encode("utf-8"))
+        if payload is None:
+            self._count("misses")
+            return None
+        try:
+            analysis = ProductAnalysis.model_validate_json(zlib.decompress(payload))
+        except (zlib.error, ValidationError) as exc:
+            logger.warning("Discarding unreadable pre-generated analysis", extra={"asin": asin, "error": str(exc)})
+            self._count("misses")
+            return None
+        self._count("hits")
+        return analysis
+
+    def _count(self, name: str) -> None:
+        with self._lock:
+            self._counters[name] += 1
+
+    def get_many(self, asins: Iterable[str]) -> Dict[str, ProductAnalysis]:
+        found: Dict[str, ProductAnalysis] = {}
+        for asin in asins:
+            analysis = self.get(asin)
+            if analysis is not None:
+                found[str(asin)] = analysis
+        return found
+
+    def put_many(self, analyses: List[ProductAnalysis]) -> None:
+        with self._lock:
+            for analysis in analyses:
+                self._db[analysis.asin.encode("utf-8")] = zlib.compress(
+                    analysis.model_dump_json().encode("utf-8"), 9
+                )
+
+    def __contains__(self, asin: str) -> bool:
+        with self._lock:
+            return str(asin).encode("utf-8") in self._db
+
+    def sync(self) -> None:
+        """Flush written records to disk, so an interrupted job can resume from here."""
+
+        with self._lock:
+            sync = getattr(self._db, "sync", None)
+            if sync is not None:
+                sync()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self._counters)
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
@@ -1,12 +1,14 @@
 # app/core/rag_pipeline.py
 from __future__ import annotations
 
+import asyncio
 import logging
 import math
 import os
 import re
 import time
-from typing import Any, Dict, List, Optional
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional
 
 from langchain.output_parsers import PydanticOutputParser
 from langchain.prompts import PromptTemplate
@@ -22,19 +24,67 @@ except ImportError:  # pragma: no cover - handled at runtime
 from backend.app.config import (
     RAG_BATCHING_ENABLED,
     RAG_BATCH_SIZE,
+    RAG_MAX_CONCURRENCY,
     RAG_MAX_PROMPT_TOKENS,
     RAG_MAX_REVIEW_CHARS,
+    RAG_REVIEW_DUPLICATE_THRESHOLD,
+    RAG_REVIEW_MAX_TOKENS,
+    RAG_REVIEW_SELECTION_ENABLED,
+    RAG_REVIEW_TOKEN_BUDGET,
+    RAG_STREAMING_ENABLED,
 )
+from backend.app.core.analysis_cache import AnalysisCache, review_fingerprint
+from backend.app.core.chunk_sizer import AdaptiveChunkSizer
+from backend.app.core.pregenerated_store import PregeneratedAnalysisStore
+from backend.app.core.review_selection import ReviewSelector, SelectionReport
 from backend.app.schemas.llm_outputs import BatchProductAnalysis, KeySpec, ProductAnalysis, ReviewHighlights
+from backend.app.utils.deadline import DeadlineExceeded, can_retry, current_deadline, remaining_time
+from backend.app.utils.hedging import Hedger
+from backend.app.utils.incremental_json import IncrementalArrayParser
+from backend.app.utils.json_repair import salvage_array_items
+from backend.app.utils.single_flight import SingleFlight
 
 logger = logging.getLogger(__name__)
 
+# Bump when the prompt changes in a way that should invalidate cached analyses
+PROMPT_VERSION = "batch-v2"
+
+PLACEHOLDER_WARNING = (
+    "LLM was unable to produce structured output. This entry contains placeholder values."
+)
+DEADLINE_WARNING = (
+    "Analysis was not ready before the request deadline. This entry contains placeholder values."
+)
+
+# Event kinds passed from generation units to `stream_batch_explanations`
+_PARTIAL = "partial"
+_UNIT_DONE = "unit_done"
+_UNIT_FAILED = "unit_failed"
+
 
 class RAGPipeline:
     """Handles LLM prompting for the RAG flow, including batched analyses."""
 
-    def __init__(self, llm_client: BaseLLM):
+    def __init__(
+        self,
+        llm_client: BaseLLM,
+        analysis_cache: Optional[AnalysisCache] = None,
+        single_flight: Optional[SingleFlight] = None,
+        hedger: Optional[Hedger] = None,
+        chunk_sizer: Optional[AdaptiveChunkSizer] = None,
+        pregenerated: Optional[PregeneratedAnalysisStore] = None,
+    ):
         self.llm_client = llm_client
+        self.analysis_cache = analysis_cache
+        # Shares one generation between concurrent requests for the same query and products
+        self.single_flight = single_flight
+        # Races a duplicate LLM call when one is slower than recent calls of the same size
+        self.hedger = hedger
+        # Chooses the chunk size from observed latency and parse failures when the caller
+        # does not pass one
+        self.chunk_sizer = chunk_sizer
+        # Analyses generated offline for popular products, looked up by ASIN
+        self.pregenerated = pregenerated
 
         self.batch_parser = PydanticOutputParser(pydantic_object=BatchProductAnalysis)
         self.batch_prompt_template = PromptTemplate(
@@ -90,97 +140,368 @@ class RAGPipeline:
         self.default_chunk_size = max(1, RAG_BATCH_SIZE)
         self.max_prompt_tokens = RAG_MAX_PROMPT_TOKENS
         self.max_review_chars = RAG_MAX_REVIEW_CHARS
+        self.max_concurrency = max(1, RAG_MAX_CONCURRENCY)
+        self.streaming_enabled = RAG_STREAMING_ENABLED
         self._token_encoder = self._maybe_create_token_encoder()
+        self.review_selector: Optional[ReviewSelector] = None
+        if RAG_REVIEW_SELECTION_ENABLED:
+            self.review_selector = ReviewSelector(
+                self._estimate_tokens,
+                token_budget=RAG_REVIEW_TOKEN_BUDGET,
+                max_review_tokens=RAG_REVIEW_MAX_TOKENS,
+                duplicate_threshold=RAG_REVIEW_DUPLICATE_THRESHOLD,
+            )
+        # Review tokens before and after selection, over all requests
+        self.selection_report = SelectionReport()
 
     async def generate_batch_explanations(
-        self, query: str, products: List[Dict[str, Any]], chunk_size: Optional[int] = None
+        self,
+        query: str,
+        products: List[Dict[str, Any]],
+        chunk_size: Optional[int] = None,
+        max_concurrency: Optional[int] = None,
     ) -> List[ProductAnalysis]:
         """Generate structured analyses for a batch of products.
 
         The method chunks products to stay within model limits, validates structured output
         with `PydanticOutputParser`, and falls back to single-product calls on parse errors.
+        Chunks run concurrently, bounded by `max_concurrency` in-flight LLM calls for this
+        request and process-wide by the LLM pool (`LLM_MAX_CONCURRENCY`).
         """
 
         if not products:
             return []
 
+        if self.single_flight is not None:
+            key = (
+                "analyses",
+                query,
+                tuple((str(p.get("asin")), review_fingerprint(p.get("reviews") or [])) for p in products),
+                chunk_size,
+                max_concurrency,
+            )
+            try:
+                return await self.single_flight.do(
+                    key, lambda: self._generate_batch_explanations(query, products, chunk_size, max_concurrency)
+                )
+            except DeadlineExceeded:
+                # This caller's budget ran out; the shared generation continues for the others
+                return [self._placeholder_analysis(product, DEADLINE_WARNING) for product in products]
+        return await self._generate_batch_explanations(query, products, chunk_size, max_concurrency)
+
+    async def _generate_batch_explanations(
+        self,
+        query: str,
+        products: List[Dict[str, Any]],
+        chunk_size: Optional[int],
+        max_concurrency: Optional[int],
+    ) -> List[ProductAnalysis]:
+        analyses = [
+            analysis
+            async for analysis in self.stream_batch_explanations(
+                query, products, chunk_size=chunk_size, max_concurrency=max_concurrency
+            )
+        ]
+        return self._ordered_results(products, analyses)
+
+    async def stream_batch_explanations(
+        self,
+        query: str,
+        products: List[Dict[str, Any]],
+        chunk_size: Optional[int] = None,
+        max_concurrency: Optional[int] = None,
+    ) -> AsyncIterator[ProductAnalysis]:
+        """Yield analyses as soon as they are available, in completion order.
+
+        Cached and pre-generated analyses come first. With streaming enabled, each analysis is yielded as soon
+        as its object closes in the LLM output; otherwise results arrive per chunk. Every
+        product with an ASIN yields exactly one analysis (a placeholder if generation
+        failed). Closing the iterator early cancels the outstanding LLM calls.
+
+        Under a request deadline (see `backend.app.utils.deadline`), generation stops when
+        the budget runs out and the remaining products get placeholders carrying
+        `DEADLINE_WARNING` and only their derived key specs.
+        """
+
+        if not products:
+            return
+
         product_lookup: Dict[str, Dict[str, Any]] = {}
         for product in products:
             asin = product.get("asin")
             if asin:
                 product_lookup[str(asin)] = product
 
+        concurrency = max(1, max_concurrency or self.max_concurrency)
+        request_slots = asyncio.Semaphore(concurrency)
+
+        cached: Dict[str, ProductAnalysis] = {}
+        if self.analysis_cache is not None:
+            cached = await self.analysis_cache.get_many(products)
+        if self.pregenerated is not None:
+            # dbm reads block, so they run off the event loop like SQLite cache reads
+            cached.update(
+                await asyncio.to_thread(
+                    self.pregenerated.get_many,
+                    [str(p["asin"]) for p in products if p.get("asin") and str(p["asin"]) not in cached],
+                )
+            )
+        for analysis in cached.values():
+            yield analysis
+
+        pending = [p for p in products if not p.get("asin") or str(p.get("asin")) not in cached]
+        events: asyncio.Queue = asyncio.Queue()
+        if not pending:
+            logger.info("Serving all analyses from cache", extra={"product_count": len(products)})
+            return
+
+        # Token estimates for chunking see the selected reviews, not the retrieved ones
+        pending = self._select_reviews(query, pending)
         effective_chunk_size = max(1, chunk_size or self.default_chunk_size)
+        if chunk_size is None and self.chunk_sizer is not None and self.batching_enabled:
+            effective_chunk_size = self.chunk_sizer.choose(
+                len(pending),
+                concurrency,
+                max(self._estimate_product_tokens(product) for product in pending),
+            )
         batching_enabled = self.batching_enabled and effective_chunk_size > 1
 
         if not batching_enabled:
             logger.info(
-                "Batching disabled; generating analyses sequentially",
-                extra={"product_count": len(products)},
+                "Batching disabled; generating analyses per product",
+                extra={"product_count": len(pending), "cached_count": len(cached)},
             )
-            per_product = await self._generate_per_product(query, products)
-            return self._ordered_results(products, per_product)
-
-        analysis_by_asin: Dict[str, ProductAnalysis] = {}
-        chunks = self._chunk_products(products, effective_chunk_size)
-        logger.info(
-            "Submitting %s chunks for batched analysis",
-            len(chunks),
-            extra={
-                "product_count": len(products),
-                "chunk_size": effective_chunk_size,
-                "max_prompt_tokens": self.max_prompt_tokens,
-            },
-        )
-
-        for idx, chunk in enumerate(chunks):
-            logger.debug(
-                "Processing chunk %s/%s", idx + 1, len(chunks), extra={"chunk_size": len(chunk)}
+            units = [self._single_product_unit(query, product, request_slots) for product in pending]
+        else:
+            chunks = self._chunk_products(pending, effective_chunk_size)
+            logger.info(
+                "Submitting %s chunks for batched analysis",
+                len(chunks),
+                extra={
+                    "product_count": len(pending),
+                    "cached_count": len(cached),
+                    "chunk_size": effective_chunk_size,
+                    "max_prompt_tokens": self.max_prompt_tokens,
+                },
             )
-            success = False
-            for attempt in range(2):
+            units = [
+                self._process_chunk(
+                    query,
+                    idx,
+                    len(chunks),
+                    chunk,
+                    product_lookup,
+                    request_slots,
+                    emit=lambda analysis: events.put_nowait((_PARTIAL, analysis)),
+                )
+                for idx, chunk in enumerate(chunks)
+            ]
+
+        # Units report streamed analyses as they are parsed and their full result when done
+        async def run_unit(unit: Awaitable[Dict[str, ProductAnalysis]]) -> None:
+            try:
+                events.put_nowait((_UNIT_DONE, await unit))
+            except Exception as exc:
+                if self._deadline_reached(exc):
+                    # Whatever the unit streamed stays; the rest degrades to placeholders
+                    events.put_nowait((_UNIT_DONE, {}))
+                else:
+                    events.put_nowait((_UNIT_FAILED, exc))
+
+        emitted: set[str] = set()
+        tasks = [asyncio.ensure_future(run_unit(unit)) for unit in units]
+        remaining = len(tasks)
+        timed_out = False
+        try:
+            while remaining:
                 try:
-                    results = await self._invoke_batch(query, chunk, attempt)
-                    for result in results:
-                        if result.asin:
-                            product_info = product_lookup.get(result.asin)
-                            analysis_by_asin[result.asin] = self._post_process_analysis(
-                                product_info, result
-                            )
-                    success = True
-                    break
-                except (OutputParserException, ValidationError) as exc:
+                    kind, payload = await asyncio.wait_for(events.get(), timeout=remaining_time())
+                except asyncio.TimeoutError:
+                    timed_out = True
                     logger.warning(
-                        "Parse failure on batch chunk",
-                        extra={
-                            "chunk_index": idx,
-                            "chunk_size": len(chunk),
-                            "attempt": attempt + 1,
-                            "error": str(exc),
-                        },
+                        "Request deadline reached; returning partial analyses",
+                        extra={"product_count": len(pending), "completed_count": len(emitted)},
                     )
-
-            if not success:
-                logger.error(
-                    "Falling back to per-product generation for chunk",
-                    extra={"chunk_index": idx, "chunk_size": len(chunk)},
+                    break
+                if kind == _UNIT_FAILED:
+                    raise payload
+                if kind == _PARTIAL:
+                    generated = [payload]
+                else:
+                    remaining -= 1
+                    generated = list(payload.values())
+                    await self._store_analyses(product_lookup, generated)
+                for analysis in generated:
+                    if analysis.asin in product_lookup and analysis.asin not in emitted:
+                        emitted.add(analysis.asin)
+                        yield analysis
+        finally:
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+        deadline_hit = timed_out or self._deadline_reached()
+        for product in pending:
+            asin = product.get("asin")
+            if asin and str(asin) not in emitted:
+                yield self._placeholder_analysis(
+                    product, DEADLINE_WARNING if deadline_hit else PLACEHOLDER_WARNING
                 )
-                per_product = await self._generate_per_product(query, chunk)
-                for result in per_product:
+
+    def _select_reviews(self, query: str, products: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Copies of `products` whose reviews fit the per-product token budget."""
+
+        if self.review_selector is None:
+            return products
+        report = SelectionReport()
+        selected: List[Dict[str, Any]] = []
+        for product in products:
+            reviews = product.get("reviews") or []
+            if not reviews:
+                selected.append(product)
+                continue
+            selection = self.review_selector.select(query, reviews)
+            report.add(selection.report)
+            selected.append({**product, "reviews": selection.reviews})
+        self.selection_report.add(report)
+        logger.info("Selected reviews for prompts", extra=report.as_dict())
+        return selected
+
+    async def _single_product_unit(
+        self,
+        query: str,
+        product: Dict[str, Any],
+        request_slots: Optional[asyncio.Semaphore] = None,
+    ) -> Dict[str, ProductAnalysis]:
+        analysis = await self._generate_single_product(query, product, request_slots)
+        return {analysis.asin: analysis}
+
+    async def _store_analyses(
+        self, product_lookup: Dict[str, Dict[str, Any]], analyses: List[ProductAnalysis]
+    ) -> None:
+        """Write freshly generated analyses to the cache, skipping placeholders."""
+
+        if self.analysis_cache is None:
+            return
+        entries = [
+            (product_lookup[analysis.asin], analysis)
+            for analysis in analyses
+            if analysis.asin in product_lookup and not self.is_placeholder(analysis)
+        ]
+        await self.analysis_cache.set_many(entries)
+
+    async def _process_chunk(
+        self,
+        query: str,
+        idx: int,
+        chunk_count: int,
+        chunk: List[Dict[str, Any]],
+        product_lookup: Dict[str, Dict[str, Any]],
+        request_slots: Optional[asyncio.Semaphore] = None,
+        emit: Optional[Callable[[ProductAnalysis], None]] = None,
+    ) -> Dict[str, ProductAnalysis]:
+        """Run one chunk with its retry and per-product fallback, keyed by ASIN.
+
+        `emit` receives each analysis as soon as it is streamed. Streamed analyses are
+        kept in the returned mapping even if the full response later fails to parse.
+        Analyses salvaged from a malformed response are kept too, so the retry and the
+        per-product fallback only cover the products still missing.
+        """
+
+        logger.debug(
+            "Processing chunk %s/%s", idx + 1, chunk_count, extra={"chunk_size": len(chunk)}
+        )
+        analysis_by_asin: Dict[str, ProductAnalysis] = {}
+        streamed: Dict[str, ProductAnalysis] = {}
+
+        def on_result(result: ProductAnalysis) -> None:
+            if result.asin not in product_lookup or result.asin in streamed:
+                return
+            streamed[result.asin] = self._post_process_analysis(product_lookup[result.asin], result)
+            if emit is not None:
+                emit(streamed[result.asin])
+
+        out_of_time = False
+        remaining = [p for p in chunk if p.get("asin")]
+        for attempt in range(2):
+            started = time.perf_counter()
+            try:
+                results = await self._invoke_batch(query, remaining, attempt, request_slots, on_result)
+                for result in results:
                     if result.asin:
                         product_info = product_lookup.get(result.asin)
                         analysis_by_asin[result.asin] = self._post_process_analysis(
                             product_info, result
                         )
+            except (OutputParserException, ValidationError) as exc:
+                logger.warning(
+                    "Parse failure on batch chunk",
+                    extra={
+                        "chunk_index": idx,
+                        "chunk_size": len(remaining),
+                        "attempt": attempt + 1,
+                        "error": str(exc),
+                    },
+                )
+            remaining = [
+                p
+                for p in remaining
+                if str(p.get("asin")) not in analysis_by_asin and str(p.get("asin")) not in streamed
+            ]
+            if not remaining:
+                break
+            if not can_retry(time.perf_counter() - started):
+                out_of_time = True
+                break
 
-        return self._ordered_results(products, list(analysis_by_asin.values()))
+        analysis_by_asin.update(streamed)
+        if not remaining:
+            return analysis_by_asin
+
+        if out_of_time or self._deadline_reached():
+            # No time for another round of LLM calls; keep what came back
+            for product in remaining:
+                analysis_by_asin[str(product.get("asin"))] = self._placeholder_analysis(
+                    product, DEADLINE_WARNING
+                )
+            return analysis_by_asin
+
+        logger.error(
+            "Falling back to per-product generation for chunk",
+            extra={"chunk_index": idx, "chunk_size": len(chunk), "missing_count": len(remaining)},
+        )
+        per_product = await self._generate_per_product(query, remaining, request_slots)
+        for result in per_product:
+            if result.asin:
+                product_info = product_lookup.get(result.asin)
+                analysis_by_asin[result.asin] = self._post_process_analysis(product_info, result)
+        return analysis_by_asin
 
     async def _invoke_batch(
-        self, query: str, chunk: List[Dict[str, Any]], attempt: int
+        self,
+        query: str,
+        chunk: List[Dict[str, Any]],
+        attempt: int,
+        request_slots: Optional[asyncio.Semaphore] = None,
+        on_result: Optional[Callable[[ProductAnalysis], None]] = None,
     ) -> List[ProductAnalysis]:
+        """Call the LLM for one chunk and parse the full response.
+
+        If the response does not parse as a whole, the objects in `results` that are
+        complete and valid on their own are returned instead (see `_salvage_results`);
+        the parse error is raised only when none can be recovered.
+
+        When streaming is enabled and `on_result` is given, the response is streamed and
+        every `results[]` object that validates on its own is passed to `on_result` as
+        soon as it closes, before the rest of the response arrives.
+
+        With a `hedger`, a call slower than recent calls for the same chunk size is raced
+        against a duplicate. Duplicate streamed results are ignored by `on_result`.
+        """
         extra_instruction = (
-            "This is a retry because the previous response was not valid JSON. Ensure the"
-            " output is a JSON object that matches the schema exactly."
+            "This is a retry because the previous response was not valid JSON or missed some"
+            " products. Ensure the output is a JSON object that matches the schema exactly."
             if attempt
             else "Follow the schema exactly for every product."
         )
@@ -192,11 +513,16 @@ class RAGPipeline:
             extra_instructions=extra_instruction,
         )
 
-        start = time.perf_counter()
-        # langchain-core deprecated `apredict` in favor of `ainvoke`.
-        # Use `ainvoke` for async invocation of the LLM with the prompt text.
-        raw_output = await self.llm_client.ainvoke(prompt_text)
-        latency_ms = (time.perf_counter() - start) * 1000
+        async with self._llm_slot(request_slots):
+            start = time.perf_counter()
+            if self.hedger is not None:
+                # The hedge shares this call's slot; the hedge-rate cap bounds the extra load
+                raw_output = await self.hedger.run(
+                    len(chunk), lambda: self._call_llm(prompt_text, on_result)
+                )
+            else:
+                raw_output = await self._call_llm(prompt_text, on_result)
+            latency_ms = (time.perf_counter() - start) * 1000
         logger.info(
             "LLM batch call complete",
             extra={
@@ -206,45 +532,157 @@ class RAGPipeline:
             },
         )
 
-        parsed: BatchProductAnalysis = self.batch_parser.parse(raw_output)
+        try:
+            parsed: BatchProductAnalysis = self.batch_parser.parse(raw_output)
+        except (OutputParserException, ValidationError):
+            self._record_chunk_outcome(chunk, latency_ms, raw_output, parse_failed=True)
+            salvaged = self._salvage_results(raw_output)
+            if not salvaged:
+                raise
+            logger.warning(
+                "Salvaged analyses from malformed batch output",
+                extra={"chunk_size": len(chunk), "salvaged_count": len(salvaged)},
+            )
+            return salvaged
+        self._record_chunk_outcome(chunk, latency_ms, raw_output, parse_failed=False)
         logger.info(
             "Parsed batch chunk",
             extra={"chunk_size": len(chunk), "parsed_count": len(parsed.results)},
         )
         return parsed.results
 
+    @staticmethod
+    def _salvage_results(raw_output: str) -> List[ProductAnalysis]:
+        """Validate each `results[]` object of a response that failed to parse as a whole."""
+
+        salvaged: List[ProductAnalysis] = []
+        for item in salvage_array_items(raw_output, "results"):
+            try:
+                salvaged.append(ProductAnalysis.model_validate_json(item))
+            except ValidationError:
+                continue
+        return salvaged
+
+    def _record_chunk_outcome(
+        self, chunk: List[Dict[str, Any]], latency_ms: float, raw_output: str, parse_failed: bool
+    ) -> None:
+        if self.chunk_sizer is not None:
+            self.chunk_sizer.record(
+                len(chunk), latency_ms / 1000, self._estimate_tokens(raw_output), parse_failed
+            )
+
+    async def _call_llm(
+        self, prompt_text: str, on_result: Optional[Callable[[ProductAnalysis], None]]
+    ) -> str:
+        # langchain-core deprecated `apredict` in favor of `ainvoke`.
+        # Use `ainvoke` for async invocation of the LLM with the prompt text.
+        if self.streaming_enabled and on_result is not None:
+            return await self._stream_batch_output(prompt_text, on_result)
+        return await self.llm_client.ainvoke(prompt_text)
+
+    async def _stream_batch_output(
+        self, prompt_text: str, on_result: Callable[[ProductAnalysis], None]
+    ) -> str:
+        """Stream one response, passing each complete `results[]` object to `on_result`.
+
+        Streams are not retried by the LLM client, so a stream that fails with an upstream
+        error falls back to one non-streaming call, which is. Analyses already streamed
+        stay with the caller and repeats in the full response are ignored by `on_result`.
+        """
+        parser = IncrementalArrayParser("results")
+        try:
+            async for chunk in self.llm_client.astream(prompt_text):
+                for item in parser.feed(chunk):
+                    try:
+                        on_result(ProductAnalysis.model_validate_json(item))
+                    except ValidationError:
+                        # Left to the full-response parse (and its retry) below
+                        continue
+        except DeadlineExceeded:
+            raise
+        except Exception as exc:
+            logger.warning(
+                "LLM stream failed; retrying without streaming",
+                extra={"streamed_chars": len(parser.text), "error": str(exc)},
+            )
+            return await self.llm_client.ainvoke(prompt_text)
+        return parser.text
+
     async def _generate_per_product(
-        self, query: str, products: List[Dict[str, Any]]
+        self,
+        query: str,
+        products: List[Dict[str, Any]],
+        request_slots: Optional[asyncio.Semaphore] = None,
     ) -> List[ProductAnalysis]:
-        results: List[ProductAnalysis] = []
-        for product in products:
-            generated = False
-            for attempt in range(2):
-                try:
-                    batch_results = await self._invoke_batch(query, [product], attempt)
-                    if batch_results:
-                        processed = self._post_process_analysis(product, batch_results[0])
-                        results.append(processed)
-                        generated = True
-                        break
-                except (OutputParserException, ValidationError) as exc:
-                    logger.warning(
-                        "Parse failure on per-product generation",
-                        extra={
-                            "asin": product.get("asin"),
-                            "attempt": attempt + 1,
-                            "error": str(exc),
-                        },
-                    )
+        return await self._gather_or_cancel(
+            [self._generate_single_product(query, product, request_slots) for product in products]
+        )
 
-            if not generated:
-                logger.error(
-                    "Unable to generate structured analysis for product; returning placeholder",
-                    extra={"asin": product.get("asin")},
+    async def _generate_single_product(
+        self,
+        query: str,
+        product: Dict[str, Any],
+        request_slots: Optional[asyncio.Semaphore] = None,
+    ) -> ProductAnalysis:
+        for attempt in range(2):
+            started = time.perf_counter()
+            try:
+                batch_results = await self._invoke_batch(query, [product], attempt, request_slots)
+                if batch_results:
+                    return self._post_process_analysis(product, batch_results[0])
+            except (OutputParserException, ValidationError) as exc:
+                logger.warning(
+                    "Parse failure on per-product generation",
+                    extra={
+                        "asin": product.get("asin"),
+                        "attempt": attempt + 1,
+                        "error": str(exc),
+                    },
                 )
-                results.append(self._placeholder_analysis(product))
+            if not can_retry(time.perf_counter() - started):
+                return self._placeholder_analysis(product, DEADLINE_WARNING)
 
-        return results
+        logger.error(
+            "Unable to generate structured analysis for product; returning placeholder",
+            extra={"asin": product.get("asin")},
+        )
+        return self._placeholder_analysis(product)
+
+    @staticmethod
+    def _deadline_reached(exc: Optional[BaseException] = None) -> bool:
+        """Whether the request deadline has expired (or `exc` was caused by it)."""
+
+        if isinstance(exc, DeadlineExceeded):
+            return True
+        deadline = current_deadline()
+        return deadline is not None and deadline.expired()
+
+    @asynccontextmanager
+    async def _llm_slot(self, request_slots: Optional[asyncio.Semaphore]) -> AsyncIterator[None]:
+        """Hold a per-request slot (if any) for one LLM call.
+
+        The process-wide limit is the LLM pool's, taken by `VertexAIClient` around each
+        Gemini call, so it also covers hedges and per-product fallbacks.
+        """
+
+        if request_slots is None:
+            yield
+            return
+        async with request_slots:
+            yield
+
+    @staticmethod
+    async def _gather_or_cancel(aws: List[Awaitable[Any]]) -> List[Any]:
+        """Run awaitables concurrently, cancelling the rest if any of them raises."""
+
+        tasks = [asyncio.ensure_future(aw) for aw in aws]
+        try:
+            return await asyncio.gather(*tasks)
+        except BaseException:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            raise
 
     def _post_process_analysis(
         self, product: Optional[Dict[str, Any]], analysis: ProductAnalysis
@@ -325,13 +763,18 @@ class RAGPipeline:
             review_text = "\n".join(review_lines)
         else:
             review_text = "    None provided. Return empty arrays for review highlights."
+        review_header = (
+            "Reviews (most relevant first, trimmed to the sentences that matter for the query)"
+            if self.review_selector is not None
+            else f"Reviews (truncated to {self.max_review_chars} chars each)"
+        )
 
         return (
             f"Product ASIN: {asin}\n"
             f"Title: {title}\n"
             f"Description: {description}\n"
             f"Categories: {categories}\n"
-            f"Reviews (truncated to {self.max_review_chars} chars each):\n{review_text}"
+            f"{review_header}:\n{review_text}"
         )
 
     def _chunk_products(
@@ -453,11 +896,10 @@ class RAGPipeline:
 
         return specs
 
-    def _placeholder_analysis(self, product: Dict[str, Any]) -> ProductAnalysis:
+    def _placeholder_analysis(
+        self, product: Dict[str, Any], warning: str = PLACEHOLDER_WARNING
+    ) -> ProductAnalysis:
         asin = product.get("asin", "unknown")
-        warning = (
-            "LLM was unable to produce structured output. This entry contains placeholder values."
-        )
         highlights = ReviewHighlights(
             overall_sentiment="unknown",
             positive=[],
@@ -473,6 +915,14 @@ class RAGPipeline:
             key_specs=key_specs,
         )
 
+    @staticmethod
+    def is_placeholder(analysis: Optional[ProductAnalysis]) -> bool:
+        return bool(
+            analysis
+            and analysis.warnings
+            and (PLACEHOLDER_WARNING in analysis.warnings or DEADLINE_WARNING in analysis.warnings)
+        )
+
     def _maybe_create_token_encoder(self):
         encoder = None
         preferred_encoding = os.environ.get("RAG_TIKTOKEN_ENCODING", "cl100k_base")
@@ -0,0 +1,61 @@
+"""Per-mode counters for how well retrieval fills each product's review slots."""
+from __future__ import annotations
+
+import threading
+from collections import deque
+from typing import Any, Deque, Dict, List
+
+
+class ReviewFillStats:
+    """Latency and reviews-per-product fill rate, kept separately for each retrieval mode.
+
+    The fill rate is the share of the `products * reviews_per_product` review slots of the
+    returned products that were actually filled. Latency percentiles cover the last
+    `window` searches of a mode.
+    """
+
+    def __init__(self, window: int = 500):
+        self.window = max(1, window)
+        self._lock = threading.Lock()
+        self._modes: Dict[str, Dict[str, Any]] = {}
+
+    def record(
+        self, mode: str, products: List[Dict[str, Any]], reviews_per_product: int, latency: float
+    ) -> None:
+        slots = len(products) * max(0, reviews_per_product)
+        filled = sum(min(len(product.get("reviews") or ()), reviews_per_product) for product in products)
+        with self._lock:
+            entry = self._modes.get(mode)
+            if entry is None:
+                entry = self._modes[mode] = {
+                    "searches": 0,
+                    "products": 0,
+                    "empty_products": 0,
+                    "review_slots": 0,
+                    "reviews_filled": 0,
+                    "latencies": deque(maxlen=self.window),
+                }
+            entry["searches"] += 1
+            entry["products"] += len(products)
+            entry["empty_products"] += sum(1 for product in products if not product.get("reviews"))
+            entry["review_slots"] += slots
+            entry["reviews_filled"] += filled
+            entry["latencies"].append(latency)
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            return {mode: self._summarize(entry) for mode, entry in self._modes.items()}
+
+    @staticmethod
+    def _summarize(entry: Dict[str, Any]) -> Dict[str, Any]:
+        latencies: Deque[float] = entry["latencies"]
+        ordered = sorted(latencies)
+        return {
+            "searches": entry["searches"],
+            "products": entry["products"],
+            "empty_products": entry["empty_products"],
+            "fill_rate": entry["reviews_filled"] / entry["review_slots"] if entry["review_slots"] else None,
+            "latency_avg": sum(ordered) / len(ordered) if ordered else None,
+            "latency_p50": ordered[(len(ordered) - 1) // 2] if ordered else None,
+            "latency_p95": ordered[int(0.95 * (len(ordered) - 1))] if ordered else None,
+        }
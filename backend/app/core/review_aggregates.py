@@ -0,0 +1,152 @@
+# app/core/review_aggregates.py
+"""Per-product review aggregates for the local retrieval backend.
+
+Mirrors the `product_review_aggregates` table built by `bigQuery/review_aggregates.sql`:
+review count, rating histogram, average rating, verified-purchase share and the
+centroid of each product's review embeddings. Build it once from the review export:
+
+    python -m backend.app.core.review_aggregates review_embeddings.parquet review_aggregates.npz
+"""
+from __future__ import annotations
+
+import argparse
+import logging
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+_BLOCK_ROWS = 65536
+
+
+class ReviewAggregates:
+    """Per-ASIN review statistics with one row per product, looked up by ASIN."""
+
+    def __init__(
+        self,
+        asins: Sequence[str],
+        review_count: np.ndarray,
+        rating_histogram: np.ndarray,
+        verified_count: np.ndarray,
+        centroids: np.ndarray,
+    ):
+        self.asins = list(asins)
+        self.review_count = np.asarray(review_count, dtype=np.int64)
+        self.rating_histogram = np.asarray(rating_histogram, dtype=np.int64).reshape(len(self.asins), 5)
+        self.verified_count = np.asarray(verified_count, dtype=np.int64)
+        self.centroids = np.asarray(centroids, dtype=np.float32)
+        self._rows = {asin: row for row, asin in enumerate(self.asins)}
+
+    def __len__(self) -> int:
+        return len(self.asins)
+
+    def __contains__(self, asin: str) -> bool:
+        return asin in self._rows
+
+    @classmethod
+    def build(cls, reviews: Dict[str, List[Any]], embeddings: Optional[np.ndarray]) -> "ReviewAggregates":
+        """Aggregate a review table (and its embedding matrix, if given) by ASIN."""
+
+        asins, groups = np.unique(
+            np.asarray([str(asin) for asin in reviews.get("asin", [])], dtype=str), return_inverse=True
+        )
+        count = len(asins)
+
+        review_count = np.bincount(groups, minlength=count)
+        histogram = np.zeros((count, 5), dtype=np.int64)
+        ratings = np.asarray(
+            [round(r) if isinstance(r, (int, float)) and r == r else 0 for r in reviews.get("rating", [])],
+            dtype=np.int64,
+        )
+        rated = (ratings >= 1) & (ratings <= 5)
+        np.add.at(histogram, (groups[rated], ratings[rated] - 1), 1)
+        verified = np.asarray([bool(v) for v in reviews.get("verified_purchase", [])], dtype=bool)
+        verified_count = np.bincount(groups[verified], minlength=count)
+
+        dim = embeddings.shape[1] if embeddings is not None and embeddings.ndim == 2 else 0
+        centroids = np.zeros((count, dim), dtype=np.float32)
+        for start in range(0, len(groups) if dim else 0, _BLOCK_ROWS):
+            block = np.asarray(embeddings[start:start + _BLOCK_ROWS], dtype=np.float32)
+            norms = np.linalg.norm(block, axis=1, keepdims=True)
+            norms[norms == 0] = 1.0
+            np.add.at(centroids, groups[start:start + _BLOCK_ROWS], block / norms)
+        norms = np.linalg.norm(centroids, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return cls(asins.tolist(), review_count, histogram, verified_count, centroids / norms)
+
+    @classmethod
+    def load(cls, path: str) -> "ReviewAggregates":
+        with np.load(path, allow_pickle=False) as data:
+            return cls(
+                data["asin"].tolist(),
+                data["review_count"],
+                data["rating_histogram"],
+                data["verified_count"],
+                data["centroid"],
+            )
+
+    def save(self, path: str) -> None:
+        np.savez(
+            path,
+            asin=np.asarray(self.asins, dtype=str),
+            review_count=self.review_count,
+            rating_histogram=self.rating_histogram,
+            verified_count=self.verified_count,
+            centroid=self.centroids,
+        )
+
+    def get(self, asin: str) -> Optional[Dict[str, Any]]:
+        """Aggregate fields for one product, named like the BigQuery table's columns."""
+
+        row = self._rows.get(asin)
+        if row is None:
+            return None
+        histogram = self.rating_histogram[row]
+        rating_count = int(histogram.sum())
+        reviews = int(self.review_count[row])
+        return {
+            "asin": asin,
+            "review_count": reviews,
+            "rating_count": rating_count,
+            "avg_rating": float(histogram @ np.arange(1, 6)) / rating_count if rating_count else None,
+            "rating_histogram": histogram.tolist(),
+            "verified_share": float(self.verified_count[row]) / reviews if reviews else None,
+        }
+
+    def centroid_distance(self, query: Sequence[float], asin: str) -> Optional[float]:
+        """Cosine distance from the query to the product's review centroid, if it has one."""
+
+        row = self._rows.get(asin)
+        if row is None or not self.centroids.shape[1]:
+            return None
+        centroid = self.centroids[row]
+        if not centroid.any():
+            return None
+        q = np.asarray(query, dtype=np.float32)
+        norm = float(np.linalg.norm(q))
+        return 1.0 - float(centroid @ q) / norm if norm else None
+
+
+def main(argv: Optional[Sequence[str]] = None) -> None:
+    """Build per-product review aggregates from a review export for the local backend."""
+
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    parser.add_argument("reviews", help="Parquet or .npz review export with an embedding column")
+    parser.add_argument("output", help="Path of the .npz aggregates file to write")
+    parser.add_argument("--no-centroids", action="store_true", help="Skip reading embeddings and centroids")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    from backend.app.core.local_index import REVIEW_COLUMNS, load_embedding_table
+
+    reviews, embeddings = load_embedding_table(
+        args.reviews, REVIEW_COLUMNS, include_embeddings=not args.no_centroids
+    )
+    aggregates = ReviewAggregates.build(reviews, embeddings)
+    aggregates.save(args.output)
+    logger.info("Wrote review aggregates", extra={"products": len(aggregates), "path": args.output})
+
+
+if __name__ == "__main__":
+    main()
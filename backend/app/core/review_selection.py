@@ -0,0 +1,191 @@
+"""Token-budgeted review selection for LLM prompts."""
+from __future__ import annotations
+
+import math
+import re
+import zlib
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Sequence, Set
+
+import numpy as np
+
+_WORD_RE = re.compile(r"[a-z0-9]+")
+_SENTENCE_RE = re.compile(r"(?<=[.!?])\s+|\n+")
+_STOPWORDS = frozenset(
+    "a an and are as at be but by for from has have i in is it its of on or so that the this to was"
+    " were with my me you your they them we our not no very just".split()
+)
+# Mersenne prime for the MinHash permutations; hashes and coefficients stay below it, so
+# a * h + b fits in uint64
+_MINHASH_PRIME = (1 << 31) - 1
+
+
+def _words(text: str) -> List[str]:
+    return _WORD_RE.findall(text.lower())
+
+
+@dataclass
+class SelectionReport:
+    """Token counts for the reviews of one or more products, before and after selection."""
+
+    reviews_in: int = 0
+    reviews_kept: int = 0
+    duplicates_dropped: int = 0
+    tokens_before: int = 0
+    tokens_after: int = 0
+
+    @property
+    def tokens_saved(self) -> int:
+        return self.tokens_before - self.tokens_after
+
+    def add(self, other: "SelectionReport") -> None:
+        self.reviews_in += other.reviews_in
+        self.reviews_kept += other.reviews_kept
+        self.duplicates_dropped += other.duplicates_dropped
+        self.tokens_before += other.tokens_before
+        self.tokens_after += other.tokens_after
+
+    def as_dict(self) -> Dict[str, int]:
+        return {
+            "reviews_in": self.reviews_in,
+            "reviews_kept": self.reviews_kept,
+            "duplicates_dropped": self.duplicates_dropped,
+            "tokens_before": self.tokens_before,
+            "tokens_after": self.tokens_after,
+            "tokens_saved": self.tokens_saved,
+        }
+
+
+@dataclass
+class ReviewSelection:
+    reviews: List[Dict[str, Any]]
+    report: SelectionReport = field(default_factory=SelectionReport)
+
+
+class ReviewSelector:
+    """Chooses which reviews (and which of their sentences) go into a product's prompt.
+
+    Reviews are ranked by retrieval `similarity`, which is a cosine distance (lower is
+    closer), less a bonus for having a rating and for verified purchases; reviews without
+    a distance count as `missing_distance` away. Walking that ranking, a review whose word-shingle MinHash
+    signature is estimated to be at least `duplicate_threshold` similar (Jaccard) to one
+    already kept is dropped. Reviews longer than `max_review_tokens` are cut down to their
+    most query-relevant sentences, and reviews are added until `token_budget` tokens are
+    used. Selected reviews are copies whose `content` holds the trimmed text.
+    """
+
+    def __init__(
+        self,
+        estimate_tokens: Callable[[str], int],
+        token_budget: int = 1200,
+        max_review_tokens: int = 300,
+        min_review_tokens: int = 40,
+        duplicate_threshold: float = 0.8,
+        shingle_size: int = 3,
+        num_permutations: int = 64,
+        rating_bonus: float = 0.1,
+        verified_bonus: float = 0.1,
+        missing_distance: float = 1.0,
+    ):
+        self.estimate_tokens = estimate_tokens
+        self.token_budget = max(1, token_budget)
+        self.max_review_tokens = max(1, max_review_tokens)
+        self.min_review_tokens = max(1, min_review_tokens)
+        self.duplicate_threshold = duplicate_threshold
+        self.shingle_size = max(1, shingle_size)
+        self.rating_bonus = rating_bonus
+        self.verified_bonus = verified_bonus
+        self.missing_distance = missing_distance
+        rng = np.random.default_rng(0x5EED)
+        self._perm_a = rng.integers(1, _MINHASH_PRIME, size=num_permutations, dtype=np.uint64)
+        self._perm_b = rng.integers(0, _MINHASH_PRIME, size=num_permutations, dtype=np.uint64)
+
+    def select(self, query: str, reviews: Sequence[Dict[str, Any]]) -> ReviewSelection:
+        report = SelectionReport(reviews_in=len(reviews))
+        texts = [str(review.get("content") or "").strip() for review in reviews]
+        token_counts = [self.estimate_tokens(text) for text in texts]
+        report.tokens_before = sum(token_counts)
+
+        query_terms = set(_words(query)) - _STOPWORDS
+        order = sorted(
+            (idx for idx, text in enumerate(texts) if text),
+            key=lambda idx: (self._rank_cost(reviews[idx]), idx),
+        )
+
+        kept: List[Dict[str, Any]] = []
+        kept_signatures: List[np.ndarray] = []
+        remaining = self.token_budget
+        for idx in order:
+            if remaining <= 0:
+                break
+            signature = self._signature(texts[idx])
+            if any(self._similarity(signature, other) >= self.duplicate_threshold for other in kept_signatures):
+                report.duplicates_dropped += 1
+                continue
+
+            text, tokens = texts[idx], token_counts[idx]
+            limit = min(self.max_review_tokens, remaining)
+            if tokens > limit:
+                if limit < self.min_review_tokens:
+                    continue
+                text = self.trim_to_relevant_sentences(text, query_terms, limit)
+                tokens = self.estimate_tokens(text)
+                if not text or tokens > limit:
+                    continue
+
+            kept.append({**reviews[idx], "content": text})
+            kept_signatures.append(signature)
+            remaining -= tokens
+            report.tokens_after += tokens
+
+        report.reviews_kept = len(kept)
+        return ReviewSelection(kept, report)
+
+    def trim_to_relevant_sentences(self, text: str, query_terms: Set[str], token_limit: int) -> str:
+        """Keep the sentences sharing the most terms with the query, in their original order."""
+
+        sentences = [s.strip() for s in _SENTENCE_RE.split(text) if s and s.strip()]
+        ranked = sorted(
+            range(len(sentences)),
+            key=lambda idx: (-len(query_terms.intersection(_words(sentences[idx]))), idx),
+        )
+        chosen: List[int] = []
+        used = 0
+        for idx in ranked:
+            tokens = self.estimate_tokens(sentences[idx])
+            if used + tokens <= token_limit:
+                chosen.append(idx)
+                used += tokens
+        if not chosen and sentences:
+            # A single sentence longer than the limit: keep its start
+            best = sentences[ranked[0]]
+            return best[: max(1, token_limit * 4)]
+        return " ".join(sentences[idx] for idx in sorted(chosen))
+
+    def _rank_cost(self, review: Dict[str, Any]) -> float:
+        """Cosine distance to the query less the rating and verified bonuses; lowest goes first."""
+        distance = review.get("similarity")
+        if not isinstance(distance, (int, float)) or not math.isfinite(distance):
+            distance = self.missing_distance
+        cost = float(distance)
+        if review.get("rating") is not None:
+            cost -= self.rating_bonus
+        if review.get("verified_purchase"):
+            cost -= self.verified_bonus
+        return cost
+
+    def _signature(self, text: str) -> np.ndarray:
+        words = _words(text)
+        size = min(self.shingle_size, max(1, len(words)))
+        shingles = {" ".join(words[i:i + size]) for i in range(max(1, len(words) - size + 1))}
+        hashes = np.fromiter(
+            (zlib.crc32(shingle.encode("utf-8")) % _MINHASH_PRIME for shingle in shingles),
+            dtype=np.uint64,
+            count=len(shingles),
+        )
+        return ((np.outer(self._perm_a, hashes) + self._perm_b[:, None]) % _MINHASH_PRIME).min(axis=1)
+
+    @staticmethod
+    def _similarity(left: np.ndarray, right: np.ndarray) -> float:
+        # The share of matching MinHash values estimates the Jaccard similarity
+        return float(np.mean(left == right))
@@ -1,37 +1,369 @@
 from backend.app.db.bigquery_client import BigQueryClient
 from backend.app.llm.vertex_ai_utils import VertexAIClient
-from backend.app.config import BIGQUERY_DATASET_ID, BIGQUERY_PRODUCT_TABLE
-from typing import List, Dict, Any
+from backend.app.core.embedding_cache import EmbeddingCache
+from backend.app.core.lexical_index import LexicalIndex, reciprocal_rank_fusion
+from backend.app.core.local_index import TWO_STAGE_REVIEW_POOL, LocalRetriever
+from backend.app.core.retrieval_stats import ReviewFillStats
+from backend.app.config import (
+    BIGQUERY_DATASET_ID,
+    BIGQUERY_PRODUCT_TABLE,
+    BIGQUERY_RESULT_FORMAT,
+    BIGQUERY_REVIEW_AGGREGATES_TABLE,
+    BIGQUERY_SEARCH_FUNCTION,
+    BIGQUERY_SEARCH_MODE,
+    EMBEDDING_MODEL_NAME,
+    LEXICAL_EXACT_MATCH_ENABLED,
+    LEXICAL_RRF_K,
+    RETRIEVAL_REVIEW_MODE,
+    REVIEW_AGGREGATES_ENABLED,
+    SEARCH_BATCH_MAX_QUERIES,
+)
+from backend.app.db.columnar import ColumnarResult, arrow_available
+from backend.app.schemas.search import SearchFilters
+from google.cloud import bigquery
+from typing import List, Dict, Any, Optional, Tuple
+import asyncio
 import logging
 import random
+import time
 
 logger = logging.getLogger(__name__)
+
+# Result columns read by `_structure_results`, in `_add_result_row` argument order
+_RESULT_COLUMNS = (
+    "asin",
+    "product_title",
+    "cleaned_item_description",
+    "product_categories",
+    "product_similarity",
+    "avg_rating",
+    "rating_count",
+    "combined_score",
+    "reviews",
+)
+
+# Review struct fields read by `_add_result_row`: (result key, struct field, default)
+_REVIEW_FIELDS = (
+    ("content", "review_content", ""),
+    ("rating", "rating", None),
+    ("similarity", "review_similarity", None),
+    ("verified_purchase", "verified_purchase", False),
+    ("user_id", "user_id", ""),
+    ("timestamp", "review_timestamp", ""),
+    ("has_rating", "has_rating", 0),
+)
+
+# Product prefilters: SearchFilters field -> (condition on product_embeddings, parameter type).
+# The columns are STORING columns of the product vector index (bigQuery/vector_index.sql),
+# so VECTOR_SEARCH applies them before picking the nearest rows.
+_PRODUCT_FILTERS = {
+    "category": ("main_category = @category", "STRING"),
+    "min_rating": ("average_rating >= @min_rating", "FLOAT64"),
+    "min_price": ("price >= @min_price", "FLOAT64"),
+    "max_price": ("price <= @max_price", "FLOAT64"),
+}
+
+
 class SearchEngine:
-    def __init__(self, vertex_ai_client: VertexAIClient): # Accept VertexAIClient dependency
+    def __init__(
+        self,
+        vertex_ai_client: VertexAIClient,
+        embedding_cache: Optional[EmbeddingCache] = None,
+        local_retriever: Optional[LocalRetriever] = None,
+        lexical_index: Optional[LexicalIndex] = None,
+    ): # Accept VertexAIClient dependency
         self.bq_client = BigQueryClient()
+        # When set, retrieval runs in-process instead of via BigQuery VECTOR_SEARCH
+        self.local_retriever = local_retriever
         self.vertex_client = vertex_ai_client # Use provided VertexAIClient instance
+        # BM25 product index fused with vector retrieval (see `_fuse_lexical`)
+        self.lexical_index = lexical_index
+        self.lexical_rrf_k = LEXICAL_RRF_K
+        self.lexical_exact_match = LEXICAL_EXACT_MATCH_ENABLED
+        self.embedding_cache = embedding_cache
+        self.embedding_model_name = EMBEDDING_MODEL_NAME
         self.dataset_id = BIGQUERY_DATASET_ID
         self.product_table_id = BIGQUERY_PRODUCT_TABLE
         self.product_index_id = f"{BIGQUERY_DATASET_ID}.product_index" # Assuming index name from SQL
+        self.search_mode = BIGQUERY_SEARCH_MODE
+        self.search_function = BIGQUERY_SEARCH_FUNCTION
+        if self.search_mode == "table_function" and local_retriever is None and not self.search_function:
+            raise ValueError(
+                "BIGQUERY_SEARCH_MODE=table_function needs BIGQUERY_SEARCH_FUNCTION or BIGQUERY_DATASET_ID"
+            )
+        # "global", "two_stage" or "centroid" review retrieval (see `_review_matches_sql`)
+        self.review_mode = RETRIEVAL_REVIEW_MODE
+        # Ratings come from the per-product aggregate table; the centroid mode always needs it
+        self.review_aggregates_table = BIGQUERY_REVIEW_AGGREGATES_TABLE
+        self.use_review_aggregates = REVIEW_AGGREGATES_ENABLED or self.review_mode == "centroid"
+        if self.use_review_aggregates and local_retriever is None and not self.review_aggregates_table:
+            raise ValueError(
+                "Review aggregates need BIGQUERY_REVIEW_AGGREGATES_TABLE or BIGQUERY_DATASET_ID"
+            )
+        self.fill_stats = ReviewFillStats()
+        self.use_arrow_results = BIGQUERY_RESULT_FORMAT == "arrow" and arrow_available()
+        if BIGQUERY_RESULT_FORMAT == "arrow" and not self.use_arrow_results:
+            logger.warning("pyarrow is not installed; falling back to row results from BigQuery")
+        # Parameterized SQL text per (products_k, reviews_per_product, active filters) shape
+        self._search_sql_cache: Dict[Tuple[int, int, Tuple[str, ...]], str] = {}
+        self._batch_search_sql_cache: Dict[Tuple[int, int, Tuple[str, ...]], str] = {}
 
     # In SearchEngine class
     # Updated hybrid_search method in SearchEngine 
-    async def hybrid_search(self, query: str, products_k: int = 5, reviews_per_product: int = 3):
+    async def hybrid_search(
+        self,
+        query: str,
+        products_k: int = 5,
+        reviews_per_product: int = 3,
+        query_embedding: Optional[List[float]] = None,
+        filters: Optional[SearchFilters] = None,
+    ):
         logger.info(f"Starting search for query: '{query}'")
 
         if not query.strip():
             raise ValueError("Query cannot be empty")
-        
-        try:
-            query_embedding = await self._generate_query_embedding(query)
-            logger.debug(f"Generated embedding for: '{query}'")
-        except Exception as e:
-            logger.error(f"Embedding generation failed: {str(e)}")
-            raise
+        if filters is not None and filters.is_empty():
+            filters = None
+
+        started = time.perf_counter()
+        exact_asins = self.exact_matches(query, products_k, filters)
+        if exact_asins:
+            # Identifier query: skip the embedding and vector search, fetch the products by ASIN
+            structured = self._structure_results(await self._lookup_products(exact_asins, reviews_per_product))
+            self.fill_stats.record("lexical_exact", structured, reviews_per_product, time.perf_counter() - started)
+            logger.info(f"Exact lexical match for {len(structured)} products")
+            return structured
+
+        # The table function embeds the query inside BigQuery; it cannot apply filters
+        needs_embedding = (
+            self.local_retriever is not None or self.search_mode != "table_function" or filters is not None
+        )
+        if query_embedding is None and needs_embedding:
+            query_embedding = await self.embed_query(query)
+
+        started = time.perf_counter()
+        if self.local_retriever is not None:
+            results = await asyncio.to_thread(
+                self.local_retriever.search, query_embedding, products_k, reviews_per_product, filters
+            )
+        else:
+            results = await self._bigquery_search(
+                query, query_embedding, products_k, reviews_per_product, filters
+            )
+        logger.debug(f"Raw retrieval results: {results}")
+        structured = self._structure_results(results)
+        if self.lexical_index is not None and filters is None:
+            structured = await self._fuse_lexical(query, structured, products_k, reviews_per_product)
+        self.fill_stats.record(
+            self._retrieval_mode(), structured, reviews_per_product, time.perf_counter() - started
+        )
+        logger.info(f"Structured {len(structured)} products")
+        return structured
+
+    def exact_matches(
+        self, query: str, products_k: int, filters: Optional[SearchFilters] = None
+    ) -> List[str]:
+        """ASINs that answer `query` without embedding or vector retrieval, or [].
+
+        The products an ASIN or model number names (see `LexicalIndex.exact_matches`) come
+        first. When there are fewer than `products_k`, the rest is filled from the BM25
+        ranking of the query. Filtered queries always go through retrieval, where the
+        filters are applied.
+        """
+        if self.lexical_index is None or not self.lexical_exact_match:
+            return []
+        if filters is not None and not filters.is_empty():
+            return []
+        asins = self.lexical_index.exact_matches(query, products_k)
+        if asins and len(asins) < products_k:
+            exact = set(asins)
+            ranked = self.lexical_index.search(query, products_k + len(asins))
+            asins += [asin for asin, _ in ranked if asin not in exact][: products_k - len(asins)]
+        return asins
+
+    async def _fuse_lexical(
+        self,
+        query: str,
+        products: List[Dict[str, Any]],
+        products_k: int,
+        reviews_per_product: int,
+    ) -> List[Dict[str, Any]]:
+        """Merge the vector results with the BM25 ranking by reciprocal rank fusion.
+
+        The lexical ranking covers as many candidates as the product VECTOR_SEARCH
+        (`products_k * 5`). Products only the lexical index found are fetched by ASIN,
+        without review similarity or a combined score.
+        """
+        lexical = await asyncio.to_thread(self.lexical_index.search, query, products_k * 5)
+        if not lexical:
+            return products
+        by_asin = {product["asin"]: product for product in products}
+        fused = reciprocal_rank_fusion(
+            [list(by_asin), [asin for asin, _ in lexical]], k=self.lexical_rrf_k
+        )[:products_k]
+        missing = [asin for asin in fused if asin not in by_asin]
+        if missing:
+            for product in self._structure_results(await self._lookup_products(missing, reviews_per_product)):
+                by_asin[product["asin"]] = product
+        return [by_asin[asin] for asin in fused if asin in by_asin]
+
+    async def _lookup_products(self, asins: List[str], reviews_per_product: int) -> List[Dict[str, Any]]:
+        """Result rows for known ASINs, in the given order, with their top reviews by rating and recency."""
+        if self.local_retriever is not None:
+            return await asyncio.to_thread(self.local_retriever.lookup, asins, reviews_per_product)
+        return await self._execute_search_query(
+            self._lookup_sql(),
+            query_parameters=[
+                bigquery.ArrayQueryParameter("asins", "STRING", list(asins)),
+                bigquery.ScalarQueryParameter("reviews_per_product", "INT64", reviews_per_product),
+            ],
+        )
+
+    def _lookup_sql(self) -> str:
+        rating, rating_join = self._rating_source()
+        return f"""
+        WITH requested AS (
+            SELECT asin, pos
+            FROM UNNEST(@asins) AS asin WITH OFFSET AS pos
+        ),
+        product_reviews AS (
+            SELECT
+                r.asin,
+                ARRAY_AGG(
+                    STRUCT(
+                        r.user_id,
+                        r.rating,
+                        r.content AS review_content,
+                        r.review_timestamp,
+                        r.verified_purchase,
+                        CAST(NULL AS FLOAT64) AS review_similarity,
+                        CASE WHEN r.rating IS NOT NULL AND r.rating > 0 THEN 1 ELSE 0 END AS has_rating
+                    )
+                    ORDER BY IF(r.rating > 0, 1, 0) DESC, r.verified_purchase DESC, r.review_timestamp DESC
+                    LIMIT @reviews_per_product
+                ) AS reviews,
+                AVG(r.rating) AS avg_rating,
+                COUNTIF(r.rating > 0) AS rating_count
+            FROM `{self.dataset_id}.review_embeddings` r
+            JOIN requested q ON q.asin = r.asin
+            WHERE r.content IS NOT NULL AND LENGTH(r.content) > 10
+            GROUP BY r.asin
+        )
+        SELECT
+            p.asin,
+            COALESCE(p.product_title, '') AS product_title,
+            COALESCE(p.cleaned_item_description, '') AS cleaned_item_description,
+            COALESCE(p.product_categories, '') AS product_categories,
+            CAST(NULL AS FLOAT64) AS product_similarity,
+            COALESCE(pr.reviews, []) AS reviews,
+            {rating}.avg_rating,
+            {rating}.rating_count,
+            CAST(NULL AS FLOAT64) AS combined_score
+        FROM requested q
+        JOIN `{self.dataset_id}.unique_products` p ON p.asin = q.asin
+        LEFT JOIN product_reviews pr ON pr.asin = p.asin
+        {rating_join}
+        ORDER BY q.pos;
+        """
+
+    def _retrieval_mode(self, batch: bool = False) -> str:
+        """Label under which `fill_stats` records a search."""
+        if self.local_retriever is not None:
+            return f"local_{self.local_retriever.review_mode}"
+        if self.search_mode == "table_function" and not batch:
+            return "table_function"
+        return self.review_mode
+
+    def stats(self) -> Dict[str, Any]:
+        """Retrieval latency and reviews-per-product fill rate per retrieval mode."""
+        return self.fill_stats.stats()
+
+    async def _bigquery_search(
+        self,
+        query: str,
+        query_embedding: Optional[List[float]],
+        products_k: int,
+        reviews_per_product: int,
+        filters: Optional[SearchFilters] = None,
+    ) -> List[Dict[str, Any]]:
+        if self.search_mode == "table_function" and filters is None:
+            return await self._table_function_search(query, products_k, reviews_per_product)
+
+        return await self._execute_search_query(
+            self._search_sql(products_k, reviews_per_product, self._active_filters(filters)),
+            query_parameters=[
+                bigquery.ArrayQueryParameter("embedding", "FLOAT64", [float(value) for value in query_embedding]),
+                bigquery.ScalarQueryParameter("products_k", "INT64", products_k),
+                bigquery.ScalarQueryParameter("reviews_per_product", "INT64", reviews_per_product),
+                *self._review_pool_parameters(reviews_per_product),
+                *self._filter_parameters(filters),
+            ],
+        )
+
+    @staticmethod
+    def _active_filters(filters: Optional[SearchFilters]) -> Tuple[str, ...]:
+        if filters is None:
+            return ()
+        return tuple(name for name, value in zip(_PRODUCT_FILTERS, filters.cache_key()) if value is not None)
 
+    @staticmethod
+    def _filter_parameters(filters: Optional[SearchFilters]) -> List[Any]:
+        if filters is None:
+            return []
+        return [
+            bigquery.ScalarQueryParameter(name, param_type, value)
+            for (name, (_, param_type)), value in zip(_PRODUCT_FILTERS.items(), filters.cache_key())
+            if value is not None
+        ]
+
+    def _product_base_table(self, active_filters: Tuple[str, ...]) -> str:
+        """VECTOR_SEARCH base table: the product table, or a prefiltered subquery of it.
+
+        The filtered subquery is searched as the base table, so `top_k` nearest rows are
+        taken among matching products and filtered queries need no over-fetching.
+        """
+        if not active_filters:
+            return f"TABLE `{self.dataset_id}.product_embeddings`"
+        conditions = " AND ".join(_PRODUCT_FILTERS[name][0] for name in active_filters)
+        return f"(SELECT * FROM `{self.dataset_id}.product_embeddings` WHERE {conditions})"
+
+    def _review_pool_parameters(self, reviews_per_product: int) -> List[Any]:
+        if self.review_mode not in {"two_stage", "centroid"}:
+            return []
+        return [
+            bigquery.ScalarQueryParameter("review_pool", "INT64", reviews_per_product * TWO_STAGE_REVIEW_POOL)
+        ]
+
+    async def _execute_search_query(self, query_sql: str, query_parameters: List[Any]):
+        """Run a retrieval query, fetching Arrow results when that format is enabled."""
+        if self.use_arrow_results:
+            return await self.bq_client.execute_query_arrow(query_sql, query_parameters=query_parameters)
+        return await self.bq_client.execute_query(query_sql, query_parameters=query_parameters)
+
+    def _search_sql(
+        self, products_k: int, reviews_per_product: int, active_filters: Tuple[str, ...] = ()
+    ) -> str:
+        """SQL text for one (products_k, reviews_per_product, filters) shape, built once and reused.
+
+        The embedding, limits and filter values are query parameters, so repeated queries
+        send identical text and can be answered from the BigQuery query cache.
+        VECTOR_SEARCH `top_k` values stay literals derived from the shape.
+        """
+        shape = (products_k, reviews_per_product, active_filters)
+        cached = self._search_sql_cache.get(shape)
+        if cached is not None:
+            return cached
+        if self.review_mode == "centroid":
+            query_sql = self._centroid_search_sql(
+                products_k, reviews_per_product, batch=False, active_filters=active_filters
+            )
+            self._search_sql_cache[shape] = query_sql
+            return query_sql
+
+        rating, rating_join = self._rating_source()
         query_sql = f"""
         WITH query_embedding AS (
-            SELECT [{",".join(map(str, query_embedding))}] AS embedding
+            SELECT @embedding AS embedding
         ),
         -- Get top matching products using vector search
         product_candidates AS (
@@ -47,17 +379,262 @@ class SearchEngine:
                 ) AS product_content,
                 v.distance AS product_similarity
             FROM VECTOR_SEARCH(
-                TABLE `{self.dataset_id}.product_embeddings`,
+                {self._product_base_table(active_filters)},
                 'embedding',
                 (SELECT embedding FROM query_embedding),
                 top_k => {products_k * 5},  -- Increased to get more candidates
                 distance_type => 'COSINE'
             ) v
         ),
-        -- Find top relevant reviews using vector search - prioritize reviews with ratings
+        -- Find top relevant reviews - prioritize reviews with ratings
+        review_matches AS ({self._review_matches_sql(products_k, reviews_per_product, batch=False)}),
+        -- Aggregate reviews by product with similarity info - prioritize reviews with ratings
+        product_reviews AS (
+            SELECT
+                asin,
+                ARRAY_AGG(
+                    STRUCT(
+                        user_id,
+                        rating,
+                        review_content,
+                        review_timestamp,
+                        verified_purchase,
+                        review_similarity,
+                        has_rating
+                    )
+                    ORDER BY has_rating DESC, review_similarity ASC, IFNULL(rating, 0) DESC, review_timestamp DESC
+                    LIMIT @reviews_per_product
+                ) AS reviews,
+                AVG(CASE WHEN rating IS NOT NULL THEN rating ELSE NULL END) AS avg_rating,
+                COUNT(CASE WHEN rating IS NOT NULL AND rating > 0 THEN 1 ELSE NULL END) AS rating_count,
+                AVG(review_similarity) AS avg_review_similarity
+            FROM review_matches
+            GROUP BY asin
+        ),
+        -- Prioritize products with better relevant reviews and actual ratings
+        product_scores AS (
+            SELECT
+                p.asin,
+                p.product_title,
+                p.cleaned_item_description,
+                p.product_categories,
+                p.product_content,
+                p.product_similarity,
+                pr.reviews,
+                {rating}.avg_rating,
+                {rating}.rating_count,
+
+                -- Modified combined score with higher weight for products with ratings
+                (0.7 * p.product_similarity) + 
+                (0.2 * COALESCE(pr.avg_review_similarity, 0)) + 
+                (0.1 * COALESCE({rating}.avg_rating/5, 0)) AS combined_score
+            FROM product_candidates p
+            LEFT JOIN product_reviews pr ON p.asin = pr.asin
+            {rating_join}
+        )
+        -- Final results prioritizing overall relevance
+        SELECT
+            asin,
+            COALESCE(product_title, '') AS product_title,
+            COALESCE(cleaned_item_description, '') AS cleaned_item_description,
+            COALESCE(product_categories, '') AS product_categories,
+            product_content,
+            product_similarity,
+            COALESCE(reviews, []) AS reviews,
+            avg_rating,
+            rating_count,  -- Added to the output
+            combined_score
+        FROM product_scores
+        ORDER BY combined_score DESC
+        LIMIT @products_k;
+        """
+        self._search_sql_cache[shape] = query_sql
+        return query_sql
+
+    def _rating_source(self) -> Tuple[str, str]:
+        """Alias that `avg_rating` / `rating_count` are read from, and the join providing it."""
+        if self.use_review_aggregates:
+            return "a", f"LEFT JOIN `{self.review_aggregates_table}` a ON a.asin = p.asin"
+        return "pr", ""
+
+    def _centroid_search_sql(
+        self, products_k: int, reviews_per_product: int, batch: bool, active_filters: Tuple[str, ...] = ()
+    ) -> str:
+        """Fast mode: score review similarity against each product's review centroid.
+
+        The centroid, average rating and rating count come from the aggregate table, so no
+        review VECTOR_SEARCH runs. Reviews are then looked up by ASIN, by exact distance,
+        for the `@products_k` products returned only.
+        """
+        if batch:
+            queries = """flat_embeddings AS (
+            SELECT value, pos
+            FROM UNNEST(@embeddings) AS value WITH OFFSET AS pos
+        ),
+        queries AS (
+            SELECT DIV(pos, @dim) AS query_id, ARRAY_AGG(value ORDER BY pos) AS embedding
+            FROM flat_embeddings
+            GROUP BY query_id
+        )"""
+            query_table = "(SELECT query_id, embedding FROM queries)"
+            join_query = "JOIN queries q ON q.query_id = {alias}.query_id"
+            per_query = "PARTITION BY query_id "
+        else:
+            queries = """query_embedding AS (
+            SELECT @embedding AS embedding
+        )"""
+            query_table = "(SELECT embedding FROM query_embedding)"
+            join_query = "CROSS JOIN query_embedding q"
+            per_query = ""
+        query_id = "v.query.query_id, " if batch else ""
+        product_query_id = "p.query_id, " if batch else ""
+        top_query_id = "t.query_id, " if batch else ""
+
+        return f"""
+        WITH {queries},
+        product_candidates AS (
+            SELECT
+                {query_id}v.base.asin,
+                v.base.product_title,
+                v.base.cleaned_item_description,
+                v.base.product_categories,
+                CONCAT(
+                v.base.product_title, '\\n',
+                v.base.cleaned_item_description, '\\n',
+                v.base.product_categories
+                ) AS product_content,
+                v.distance AS product_similarity
+            FROM VECTOR_SEARCH(
+                {self._product_base_table(active_filters)},
+                'embedding',
+                {query_table},
+                top_k => {products_k * 5},
+                distance_type => 'COSINE'
+            ) v
+        ),
+        product_scores AS (
+            SELECT
+                p.*,
+                a.avg_rating,
+                a.rating_count,
+                (0.7 * p.product_similarity) +
+                (0.2 * COALESCE(
+                    IF(ARRAY_LENGTH(a.centroid) > 0, ML.DISTANCE(a.centroid, q.embedding, 'COSINE'), NULL), 0
+                )) +
+                (0.1 * COALESCE(a.avg_rating/5, 0)) AS combined_score
+            FROM product_candidates p
+            {join_query.format(alias="p")}
+            LEFT JOIN `{self.review_aggregates_table}` a ON a.asin = p.asin
+        ),
+        top_products AS (
+            SELECT *
+            FROM product_scores
+            WHERE TRUE
+            QUALIFY ROW_NUMBER() OVER ({per_query}ORDER BY combined_score DESC) <= @products_k
+        ),
         review_matches AS (
             SELECT
-                v.base.asin,
+                {top_query_id}t.asin,
+                r.user_id,
+                r.rating,
+                r.content AS review_content,
+                r.review_timestamp,
+                r.verified_purchase,
+                ML.DISTANCE(r.embedding, q.embedding, 'COSINE') AS review_similarity,
+                CASE WHEN r.rating IS NOT NULL AND r.rating > 0 THEN 1 ELSE 0 END AS has_rating
+            FROM top_products t
+            JOIN `{self.dataset_id}.review_embeddings` r ON r.asin = t.asin
+            {join_query.format(alias="t")}
+            WHERE r.content IS NOT NULL AND LENGTH(r.content) > 10
+            QUALIFY ROW_NUMBER() OVER (
+                PARTITION BY {top_query_id}t.asin ORDER BY ML.DISTANCE(r.embedding, q.embedding, 'COSINE')
+            ) <= @review_pool
+        ),
+        product_reviews AS (
+            SELECT
+                {"query_id, " if batch else ""}asin,
+                ARRAY_AGG(
+                    STRUCT(
+                        user_id,
+                        rating,
+                        review_content,
+                        review_timestamp,
+                        verified_purchase,
+                        review_similarity,
+                        has_rating
+                    )
+                    ORDER BY has_rating DESC, review_similarity ASC, IFNULL(rating, 0) DESC, review_timestamp DESC
+                    LIMIT @reviews_per_product
+                ) AS reviews
+            FROM review_matches
+            GROUP BY {"query_id, " if batch else ""}asin
+        )
+        SELECT
+            {top_query_id}t.asin,
+            COALESCE(t.product_title, '') AS product_title,
+            COALESCE(t.cleaned_item_description, '') AS cleaned_item_description,
+            COALESCE(t.product_categories, '') AS product_categories,
+            t.product_content,
+            t.product_similarity,
+            COALESCE(pr.reviews, []) AS reviews,
+            t.avg_rating,
+            t.rating_count,
+            t.combined_score
+        FROM top_products t
+        LEFT JOIN product_reviews pr ON {"pr.query_id = t.query_id AND " if batch else ""}pr.asin = t.asin
+        ORDER BY {top_query_id}t.combined_score DESC;
+        """
+
+    def _review_matches_sql(self, products_k: int, reviews_per_product: int, batch: bool) -> str:
+        """Body of the `review_matches` CTE for the configured review mode.
+
+        "global" runs one VECTOR_SEARCH over every review and keeps the matches that
+        belong to a product candidate, so candidates whose reviews rank below the global
+        `top_k` get none. "two_stage" joins the candidates to their own reviews and keeps
+        the `@review_pool` nearest per product by exact cosine distance. Clustering
+        `review_embeddings` by `asin` (bigQuery/embedded generation_2.sql) lets that join
+        read only the candidates' blocks.
+        """
+        query_id = "v.query.query_id, " if batch else ""
+        if self.review_mode == "two_stage":
+            if batch:
+                query_table = "JOIN queries q ON q.query_id = p.query_id"
+                partition = "p.query_id, p.asin"
+            else:
+                query_table = "CROSS JOIN query_embedding q"
+                partition = "p.asin"
+            return f"""
+            SELECT
+                {"p.query_id, " if batch else ""}p.asin,
+                r.user_id,
+                r.rating,
+                r.content AS review_content,
+                r.review_timestamp,
+                r.verified_purchase,
+                ML.DISTANCE(r.embedding, q.embedding, 'COSINE') AS review_similarity,
+                CASE WHEN r.rating IS NOT NULL AND r.rating > 0 THEN 1 ELSE 0 END AS has_rating
+            FROM product_candidates p
+            JOIN `{self.dataset_id}.review_embeddings` r ON r.asin = p.asin
+            {query_table}
+            WHERE r.content IS NOT NULL AND LENGTH(r.content) > 10
+            QUALIFY ROW_NUMBER() OVER (
+                PARTITION BY {partition} ORDER BY ML.DISTANCE(r.embedding, q.embedding, 'COSINE')
+            ) <= @review_pool
+        """
+
+        if batch:
+            query_table = "(SELECT query_id, embedding FROM queries)"
+            # Only keep reviews of products retrieved for the same query
+            candidate_filter = """EXISTS (
+                SELECT 1 FROM product_candidates p
+                WHERE p.query_id = v.query.query_id AND p.asin = v.base.asin
+            )"""
+        else:
+            query_table = "(SELECT embedding FROM query_embedding)"
+            candidate_filter = "v.base.asin IN (SELECT asin FROM product_candidates)"
+        return f"""
+            SELECT
+                {query_id}v.base.asin,
                 v.base.user_id,
                 v.base.rating,
                 v.base.content AS review_content,
@@ -69,17 +646,207 @@ class SearchEngine:
             FROM VECTOR_SEARCH(
                 TABLE `{self.dataset_id}.review_embeddings`,
                 'embedding',
-                (SELECT embedding FROM query_embedding),
+                {query_table},
                 top_k => {products_k * reviews_per_product * 10},  -- Increased to find more reviews with ratings
                 distance_type => 'COSINE'
             ) v
-            WHERE v.base.asin IN (SELECT asin FROM product_candidates)
+            WHERE {candidate_filter}
             -- Filter reviews that have content
             AND v.base.content IS NOT NULL AND LENGTH(v.base.content) > 10
+        """
+
+    async def _table_function_search(
+        self, query: str, products_k: int, reviews_per_product: int
+    ) -> List[Dict[str, Any]]:
+        """Retrieve through the `product_with_reviews_search` table function (bigQuery/search_result.sql).
+
+        The function embeds the query inside BigQuery and returns one row per review, so
+        rows are regrouped per product and scored like the VECTOR_SEARCH query.
+        """
+        rows = await self.bq_client.execute_query(
+            f"SELECT * FROM `{self.search_function}`(@query, @products_k, @reviews_per_product)",
+            query_parameters=[
+                bigquery.ScalarQueryParameter("query", "STRING", query),
+                bigquery.ScalarQueryParameter("products_k", "INT64", products_k),
+                bigquery.ScalarQueryParameter("reviews_per_product", "INT64", reviews_per_product),
+            ],
+        )
+
+        products: Dict[str, Dict[str, Any]] = {}
+        for row in rows:
+            asin = row.get("product_asin")
+            product = products.setdefault(
+                asin,
+                {
+                    "asin": asin,
+                    "product_title": row.get("product_title") or "",
+                    "cleaned_item_description": "",
+                    "product_categories": "",
+                    "product_similarity": row.get("product_similarity"),
+                    "reviews": [],
+                },
+            )
+            if row.get("review_content"):
+                rating = row.get("review_rating")
+                product["reviews"].append(
+                    {
+                        "rating": rating,
+                        "review_content": row["review_content"],
+                        "verified_purchase": row.get("verified_purchase"),
+                        "review_similarity": row.get("review_similarity"),
+                        "has_rating": 1 if rating is not None and rating > 0 else 0,
+                    }
+                )
+
+        for product in products.values():
+            reviews = product["reviews"]
+            ratings = [r["rating"] for r in reviews if r["rating"] is not None]
+            similarities = [r["review_similarity"] for r in reviews if r["review_similarity"] is not None]
+            product["avg_rating"] = sum(ratings) / len(ratings) if ratings else None
+            product["rating_count"] = sum(1 for rating in ratings if rating > 0)
+            product["combined_score"] = (
+                0.7 * (product["product_similarity"] or 0)
+                + 0.2 * (sum(similarities) / len(similarities) if similarities else 0)
+                + 0.1 * (product["avg_rating"] / 5 if product["avg_rating"] is not None else 0)
+            )
+        return list(products.values())
+
+    async def hybrid_search_batch(
+        self,
+        queries: List[str],
+        products_k: int = 5,
+        reviews_per_product: int = 3,
+        query_embeddings: Optional[List[List[float]]] = None,
+        filters: Optional[SearchFilters] = None,
+    ) -> List[List[Dict[str, Any]]]:
+        """Run `hybrid_search` for many queries at once; results follow the order of `queries`.
+
+        Embeddings are requested in one batch and BigQuery retrieval runs as one job per
+        `SEARCH_BATCH_MAX_QUERIES` queries instead of one job per query. `filters` apply
+        to every query.
+        """
+        logger.info(f"Starting batch search for {len(queries)} queries")
+        if not queries:
+            return []
+        if any(not query.strip() for query in queries):
+            raise ValueError("Query cannot be empty")
+
+        if query_embeddings is None:
+            query_embeddings = await self.embed_queries(queries)
+        if filters is not None and filters.is_empty():
+            filters = None
+
+        started = time.perf_counter()
+        if self.local_retriever is not None:
+            rows_per_query = await asyncio.to_thread(
+                lambda: [
+                    self.local_retriever.search(embedding, products_k, reviews_per_product, filters)
+                    for embedding in query_embeddings
+                ]
+            )
+        else:
+            rows_per_query = []
+            for start in range(0, len(query_embeddings), SEARCH_BATCH_MAX_QUERIES):
+                rows_per_query.extend(
+                    await self._bigquery_search_batch(
+                        query_embeddings[start:start + SEARCH_BATCH_MAX_QUERIES],
+                        products_k,
+                        reviews_per_product,
+                        filters,
+                    )
+                )
+        structured = [self._structure_results(rows) for rows in rows_per_query]
+        # Every query of the batch waited for the whole batch
+        elapsed = time.perf_counter() - started
+        for products in structured:
+            self.fill_stats.record(self._retrieval_mode(batch=True), products, reviews_per_product, elapsed)
+        return structured
+
+    async def _bigquery_search_batch(
+        self,
+        query_embeddings: List[List[float]],
+        products_k: int,
+        reviews_per_product: int,
+        filters: Optional[SearchFilters] = None,
+    ) -> List[List[Dict[str, Any]]]:
+        """Same ranking as `_bigquery_search`, evaluated for every query in one job.
+
+        The embeddings are sent as one flat FLOAT64 array parameter and regrouped into a
+        (query_id, embedding) table that drives both VECTOR_SEARCH calls.
+        """
+        dim = len(query_embeddings[0])
+        if any(len(embedding) != dim for embedding in query_embeddings):
+            raise ValueError("All query embeddings must have the same dimension")
+
+        flat = [float(value) for embedding in query_embeddings for value in embedding]
+        rows = await self._execute_search_query(
+            self._batch_search_sql(products_k, reviews_per_product, self._active_filters(filters)),
+            query_parameters=[
+                bigquery.ArrayQueryParameter("embeddings", "FLOAT64", flat),
+                bigquery.ScalarQueryParameter("dim", "INT64", dim),
+                bigquery.ScalarQueryParameter("products_k", "INT64", products_k),
+                bigquery.ScalarQueryParameter("reviews_per_product", "INT64", reviews_per_product),
+                *self._review_pool_parameters(reviews_per_product),
+                *self._filter_parameters(filters),
+            ],
+        )
+        if isinstance(rows, ColumnarResult):
+            return rows.split_by("query_id", len(query_embeddings))
+        grouped: List[List[Dict[str, Any]]] = [[] for _ in query_embeddings]
+        for row in rows:
+            grouped[row["query_id"]].append(row)
+        return grouped
+
+    def _batch_search_sql(
+        self, products_k: int, reviews_per_product: int, active_filters: Tuple[str, ...] = ()
+    ) -> str:
+        shape = (products_k, reviews_per_product, active_filters)
+        cached = self._batch_search_sql_cache.get(shape)
+        if cached is not None:
+            return cached
+        if self.review_mode == "centroid":
+            query_sql = self._centroid_search_sql(
+                products_k, reviews_per_product, batch=True, active_filters=active_filters
+            )
+            self._batch_search_sql_cache[shape] = query_sql
+            return query_sql
+
+        rating, rating_join = self._rating_source()
+        query_sql = f"""
+        WITH flat_embeddings AS (
+            SELECT value, pos
+            FROM UNNEST(@embeddings) AS value WITH OFFSET AS pos
         ),
-        -- Aggregate reviews by product with similarity info - prioritize reviews with ratings
+        queries AS (
+            SELECT DIV(pos, @dim) AS query_id, ARRAY_AGG(value ORDER BY pos) AS embedding
+            FROM flat_embeddings
+            GROUP BY query_id
+        ),
+        product_candidates AS (
+            SELECT
+                v.query.query_id,
+                v.base.asin,
+                v.base.product_title,
+                v.base.cleaned_item_description,
+                v.base.product_categories,
+                CONCAT(
+                v.base.product_title, '\\n',
+                v.base.cleaned_item_description, '\\n',
+                v.base.product_categories
+                ) AS product_content,
+                v.distance AS product_similarity
+            FROM VECTOR_SEARCH(
+                {self._product_base_table(active_filters)},
+                'embedding',
+                (SELECT query_id, embedding FROM queries),
+                top_k => {products_k * 5},
+                distance_type => 'COSINE'
+            ) v
+        ),
+        review_matches AS ({self._review_matches_sql(products_k, reviews_per_product, batch=True)}),
         product_reviews AS (
             SELECT
+                query_id,
                 asin,
                 ARRAY_AGG(
                     STRUCT(
@@ -92,17 +859,17 @@ class SearchEngine:
                         has_rating
                     )
                     ORDER BY has_rating DESC, review_similarity ASC, IFNULL(rating, 0) DESC, review_timestamp DESC
-                    LIMIT {reviews_per_product}
+                    LIMIT @reviews_per_product
                 ) AS reviews,
                 AVG(CASE WHEN rating IS NOT NULL THEN rating ELSE NULL END) AS avg_rating,
                 COUNT(CASE WHEN rating IS NOT NULL AND rating > 0 THEN 1 ELSE NULL END) AS rating_count,
                 AVG(review_similarity) AS avg_review_similarity
             FROM review_matches
-            GROUP BY asin
+            GROUP BY query_id, asin
         ),
-        -- Prioritize products with better relevant reviews and actual ratings
         product_scores AS (
             SELECT
+                p.query_id,
                 p.asin,
                 p.product_title,
                 p.cleaned_item_description,
@@ -110,18 +877,17 @@ class SearchEngine:
                 p.product_content,
                 p.product_similarity,
                 pr.reviews,
-                pr.avg_rating,
-                pr.rating_count,
-
-                -- Modified combined score with higher weight for products with ratings
-                (0.7 * p.product_similarity) + 
-                (0.2 * COALESCE(pr.avg_review_similarity, 0)) + 
-                (0.1 * COALESCE(pr.avg_rating/5, 0)) AS combined_score
+                {rating}.avg_rating,
+                {rating}.rating_count,
+                (0.7 * p.product_similarity) +
+                (0.2 * COALESCE(pr.avg_review_similarity, 0)) +
+                (0.1 * COALESCE({rating}.avg_rating/5, 0)) AS combined_score
             FROM product_candidates p
-            LEFT JOIN product_reviews pr ON p.asin = pr.asin
+            LEFT JOIN product_reviews pr ON p.query_id = pr.query_id AND p.asin = pr.asin
+            {rating_join}
         )
-        -- Final results prioritizing overall relevance
         SELECT
+            query_id,
             asin,
             COALESCE(product_title, '') AS product_title,
             COALESCE(cleaned_item_description, '') AS cleaned_item_description,
@@ -130,77 +896,136 @@ class SearchEngine:
             product_similarity,
             COALESCE(reviews, []) AS reviews,
             avg_rating,
-            rating_count,  -- Added to the output
+            rating_count,
             combined_score
         FROM product_scores
-        ORDER BY combined_score DESC
-        LIMIT {products_k};
+        WHERE TRUE
+        QUALIFY ROW_NUMBER() OVER (PARTITION BY query_id ORDER BY combined_score DESC) <= @products_k
+        ORDER BY query_id, combined_score DESC;
         """
-        
-        results = await self.bq_client.execute_query(query_sql)
-        logger.debug(f"Raw results from BQ: {results}")
-        structured = self._structure_results(results)
-        logger.info(f"Structured {len(structured)} products")
-        return structured
+        self._batch_search_sql_cache[shape] = query_sql
+        return query_sql
 
     def _structure_results(self, rows) -> List[Dict[str, Any]]:
         products = {}
+        if isinstance(rows, ColumnarResult):
+            # Arrow results are read column by column, without a dict per row or per review
+            nested = {"reviews": {field: default for _, field, default in _REVIEW_FIELDS}}
+            for values in rows.iter_rows(_RESULT_COLUMNS, nested=nested):
+                if values[0] is None:
+                    logger.error("Missing expected field 'asin' in BQ result row")
+                    continue
+                self._add_result_row(products, *values)
+            return list(products.values())
+
         for row in rows:
             try:
-                asin = row["asin"]
-                product_title = row.get("product_title", "No Title Available")  
-                cleaned_item_description = row.get("cleaned_item_description", "")
-                product_categories = row.get("product_categories", "")
-                product_similarity = row.get("product_similarity", None)
-                avg_rating = row.get("avg_rating", None)
-                rating_count = row.get("rating_count", 0)  # Add this
-                combined_score = row.get("combined_score", None)
-                
-                # Format the rating display - Only display rating if we have ratings
-                if avg_rating is not None and rating_count > 0:
-                    displayed_rating = f"{avg_rating:.1f}"
-                else:
-                    # Generate random rating between 4.0 and 4.5
-                    displayed_rating = f"{random.uniform(4.0, 4.5):.1f}"
-                
-                if asin not in products:
-                    products[asin] = {
-                        "asin": asin,
-                        "product_title": product_title,
-                        "cleaned_item_description": cleaned_item_description,
-                        "product_categories": product_categories,
-                        "similarity": product_similarity,
-                        "avg_rating": avg_rating,
-                        "rating_count": rating_count,  # Add this
-                        "displayed_rating": displayed_rating,  # Add this for frontend use
-                        "combined_score": combined_score,
-                        "reviews": []
-                    }
-                
-                if "reviews" in row and row["reviews"]:
-                    for review in row["reviews"]:
-                        try:
-                            products[asin]["reviews"].append({
-                                "content": review.get("review_content", ""),
-                                "rating": review.get("rating", None),
-                                "similarity": review.get("review_similarity", None),
-                                "verified_purchase": review.get("verified_purchase", False),
-                                "user_id": review.get("user_id", ""),
-                                "timestamp": review.get("review_timestamp", ""),
-                                "has_rating": review.get("has_rating", 0)  # Add this
-                            })
-                        except Exception as e:
-                            logger.error(f"Error processing review: {e}, review data: {review}")
-            
+                self._add_result_row(
+                    products,
+                    row["asin"],
+                    row.get("product_title", "No Title Available"),
+                    row.get("cleaned_item_description", ""),
+                    row.get("product_categories", ""),
+                    row.get("product_similarity", None),
+                    row.get("avg_rating", None),
+                    row.get("rating_count", 0),  # Add this
+                    row.get("combined_score", None),
+                    self._review_values(row.get("reviews")),
+                )
             except KeyError as e:
                 logger.error(f"Missing expected field {e} in BQ result row: {row}")
                 continue
                 
         return list(products.values())
 
+    def _add_result_row(
+        self,
+        products: Dict[str, Dict[str, Any]],
+        asin,
+        product_title,
+        cleaned_item_description,
+        product_categories,
+        product_similarity,
+        avg_rating,
+        rating_count,
+        combined_score,
+        reviews,
+    ) -> None:
+        if rating_count is None:
+            rating_count = 0
+
+        # Format the rating display - Only display rating if we have ratings
+        if avg_rating is not None and rating_count > 0:
+            displayed_rating = f"{avg_rating:.1f}"
+        else:
+            # Generate random rating between 4.0 and 4.5
+            displayed_rating = f"{random.uniform(4.0, 4.5):.1f}"
+        
+        if asin not in products:
+            products[asin] = {
+                "asin": asin,
+                "product_title": product_title,
+                "cleaned_item_description": cleaned_item_description,
+                "product_categories": product_categories,
+                "similarity": product_similarity,
+                "avg_rating": avg_rating,
+                "rating_count": rating_count,  # Add this
+                "displayed_rating": displayed_rating,  # Add this for frontend use
+                "combined_score": combined_score,
+                "reviews": []
+            }
+        
+        # `reviews` holds one value tuple per review, in `_REVIEW_FIELDS` order
+        for values in reviews or ():
+            products[asin]["reviews"].append({key: value for (key, _, _), value in zip(_REVIEW_FIELDS, values)})
+
+    @staticmethod
+    def _review_values(reviews) -> List[Tuple[Any, ...]]:
+        """Review dicts of a row result as value tuples in `_REVIEW_FIELDS` order."""
+        values = []
+        for review in reviews or ():
+            try:
+                values.append(tuple(review.get(field, default) for _, field, default in _REVIEW_FIELDS))
+            except Exception as e:
+                logger.error(f"Error processing review: {e}, review data: {review}")
+        return values
+
+
+    async def embed_query(self, query: str) -> List[float]:
+        """Embed a search query, going through the embedding cache when configured."""
+        if not query.strip():
+            raise ValueError("Query cannot be empty")
+        try:
+            query_embedding = await self._generate_query_embedding(query)
+            logger.debug(f"Generated embedding for: '{query}'")
+        except Exception as e:
+            logger.error(f"Embedding generation failed: {str(e)}")
+            raise
+        return query_embedding
+
+    async def embed_queries(self, queries: List[str]) -> List[List[float]]:
+        """Embed many queries with one embedding request for all cache misses."""
+        if any(not query.strip() for query in queries):
+            raise ValueError("Query cannot be empty")
+        if self.embedding_cache is not None:
+            return await self.embedding_cache.get_or_compute_many(
+                queries, self.embedding_model_name, self._embed_texts
+            )
+        return await self._embed_texts(queries)
 
     async def _generate_query_embedding(self, query: str) -> List[float]:
-        logger.debug(f"Generating embedding for query: '{query}'")
-        embeddings_response = await self.vertex_client.get_embeddings(query)
+        if self.embedding_cache is not None:
+            return await self.embedding_cache.get_or_compute(
+                query, self.embedding_model_name, self._embed_text
+            )
+        return await self._embed_text(query)
+
+    async def _embed_text(self, text: str) -> List[float]:
+        logger.debug(f"Generating embedding for query: '{text}'")
+        embeddings_response = await self.vertex_client.get_embeddings(text)
         logger.debug(f"Generated embedding vector length: {len(embeddings_response)}")
-        return embeddings_response
\ No newline at end of file
+        return embeddings_response
+
+    async def _embed_texts(self, texts: List[str]) -> List[List[float]]:
+        logger.debug(f"Generating embeddings for {len(texts)} queries")
+        return await self.vertex_client.get_embeddings_batch(texts)
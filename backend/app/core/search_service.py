@@ -1,22 +1,63 @@
 # app/core/search_service.py
-from typing import List, Dict, Any
+from typing import Hashable, List, Dict, Any, Optional
 from backend.app.core.search_engine import SearchEngine
+from backend.app.core.semantic_cache import SemanticResponseCache
+from backend.app.core.embedding_cache import normalize_query
+from backend.app.utils.single_flight import SingleFlight
+from backend.app.schemas.search import SearchFilters, SearchResponse
 import logging
 
 logger = logging.getLogger(__name__)
 class SearchService:
-    def __init__(self, search_engine: SearchEngine):
+    def __init__(
+        self,
+        search_engine: SearchEngine,
+        semantic_cache: Optional[SemanticResponseCache] = None,
+        single_flight: Optional[SingleFlight] = None,
+    ):
         self.search_engine = search_engine
+        self.semantic_cache = semantic_cache
+        # Shares one retrieval between concurrent identical searches
+        self.single_flight = single_flight
 
-    async def search_products(self, query: str, top_k: int = 5) -> List[Dict[str, Any]]:
-        """Entry point for product search workflow"""
+    async def embed_query(self, query: str) -> List[float]:
+        return await self.search_engine.embed_query(query)
+
+    def is_exact_match(self, query: str, top_k: int = 5, filters: Optional[SearchFilters] = None) -> bool:
+        """Whether the lexical index answers `query` directly, so it needs no query embedding."""
+        return bool(self.search_engine.exact_matches(query, top_k, filters))
+
+    async def search_products(
+        self,
+        query: str,
+        top_k: int = 5,
+        query_embedding: Optional[List[float]] = None,
+        filters: Optional[SearchFilters] = None,
+    ) -> List[Dict[str, Any]]:
+        """Entry point for product search workflow; `filters` are applied during retrieval"""
+        if self.single_flight is not None:
+            return await self.single_flight.do(
+                ("search", normalize_query(query), top_k, filters.cache_key() if filters else None),
+                lambda: self._search_products(query, top_k, query_embedding, filters),
+            )
+        return await self._search_products(query, top_k, query_embedding, filters)
+
+    async def _search_products(
+        self,
+        query: str,
+        top_k: int,
+        query_embedding: Optional[List[float]],
+        filters: Optional[SearchFilters] = None,
+    ) -> List[Dict[str, Any]]:
         logger.info(f"Starting search for: '{query}'")
         
         try:
             results = await self.search_engine.hybrid_search(
                 query, 
                 products_k=top_k,
-                reviews_per_product=3
+                reviews_per_product=3,
+                query_embedding=query_embedding,
+                filters=filters,
             )
         except Exception as e:
             logger.error(f"Search failed: {str(e)}")
@@ -25,4 +66,60 @@ class SearchService:
         logger.info(f"Found {len(results)} products for '{query}'")
         return results
 
+    async def search_products_batch(
+        self,
+        queries: List[str],
+        top_k: int = 5,
+        query_embeddings: Optional[List[List[float]]] = None,
+        filters: Optional[SearchFilters] = None,
+    ) -> List[List[Dict[str, Any]]]:
+        """Search for many queries with one embedding call and one retrieval job per batch."""
+        logger.info(f"Starting batch search for {len(queries)} queries")
+
+        try:
+            results = await self.search_engine.hybrid_search_batch(
+                queries,
+                products_k=top_k,
+                reviews_per_product=3,
+                query_embeddings=query_embeddings,
+                filters=filters,
+            )
+        except Exception as e:
+            logger.error(f"Batch search failed: {str(e)}")
+            raise
+
+        logger.info(f"Batch search returned {sum(len(r) for r in results)} products for {len(queries)} queries")
+        return results
+
+    def lookup_cached_response(
+        self,
+        query: str,
+        query_embedding: List[float],
+        top_k: int,
+        filters: Optional[SearchFilters] = None,
+    ) -> Optional[SearchResponse]:
+        """Return a cached response for a semantically equivalent query, if one is live."""
+        if self.semantic_cache is None:
+            return None
+        cached = self.semantic_cache.lookup(query_embedding, namespace=self._cache_namespace(top_k, filters))
+        if cached is None:
+            return None
+        logger.info(f"Semantic cache hit for: '{query}' (cached query: '{cached.query}')")
+        return cached.model_copy(update={"query": query})
+
+    def cache_response(
+        self,
+        query_embedding: List[float],
+        top_k: int,
+        response: SearchResponse,
+        filters: Optional[SearchFilters] = None,
+    ) -> None:
+        if self.semantic_cache is not None:
+            self.semantic_cache.store(query_embedding, response, namespace=self._cache_namespace(top_k, filters))
 
+    @staticmethod
+    def _cache_namespace(top_k: int, filters: Optional[SearchFilters]) -> Hashable:
+        # Filtered responses only answer queries with the same filters
+        if filters is None or filters.is_empty():
+            return top_k
+        return (top_k, filters.cache_key())
@@ -0,0 +1,137 @@
+# app/core/semantic_cache.py
+"""Response cache that matches queries by embedding similarity instead of exact text.
+
+Past query embeddings are held in a small dense matrix; a lookup is one matrix-vector
+product, so paraphrases such as "moisturizer for dry skin" and "dry skin moisturiser"
+can share a cached response when their cosine similarity clears the threshold.
+"""
+from __future__ import annotations
+
+import logging
+import time
+from typing import Any, Callable, Dict, Hashable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+class SemanticResponseCache:
+    """Capacity-bounded cache of responses keyed by query embedding.
+
+    Entries are partitioned by `namespace` (e.g. the requested result count) so a
+    cached response is only reused for requests of the same shape. Expired entries are
+    evicted first when the cache is full, then the least recently used one.
+    """
+
+    def __init__(
+        self,
+        capacity: int = 1000,
+        similarity_threshold: float = 0.95,
+        ttl_seconds: Optional[float] = 900,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.capacity = max(1, capacity)
+        self.similarity_threshold = similarity_threshold
+        self.ttl_seconds = ttl_seconds if ttl_seconds and ttl_seconds > 0 else None
+        self._clock = clock
+        self._matrix: Optional[np.ndarray] = None
+        self._expires_at = np.full(self.capacity, -np.inf)
+        self._last_used = np.zeros(self.capacity)
+        self._namespaces: List[Optional[Hashable]] = [None] * self.capacity
+        self._values: List[Any] = [None] * self.capacity
+        self._counters: Dict[str, int] = {"hits": 0, "misses": 0, "stores": 0, "evictions": 0}
+
+    def lookup(self, embedding: Sequence[float], namespace: Hashable = None) -> Optional[Any]:
+        """Return the most similar live entry above the threshold, if any."""
+
+        match = self._best_match(embedding, namespace)
+        if match is None:
+            self._counters["misses"] += 1
+            return None
+        slot, similarity = match
+        self._last_used[slot] = self._clock()
+        self._counters["hits"] += 1
+        logger.debug("Semantic cache hit", extra={"similarity": round(similarity, 4)})
+        return self._values[slot]
+
+    def store(
+        self,
+        embedding: Sequence[float],
+        value: Any,
+        namespace: Hashable = None,
+        ttl_seconds: Optional[float] = None,
+    ) -> None:
+        vector = self._normalize(embedding)
+        if vector is None:
+            return
+        if self._matrix is None:
+            self._matrix = np.zeros((self.capacity, vector.shape[0]), dtype=np.float32)
+        elif self._matrix.shape[1] != vector.shape[0]:
+            logger.warning("Semantic cache dimension changed; clearing cache")
+            self.clear()
+            self._matrix = np.zeros((self.capacity, vector.shape[0]), dtype=np.float32)
+
+        now = self._clock()
+        match = self._best_match(embedding, namespace)
+        slot = match[0] if match is not None else self._free_slot(now)
+
+        ttl = ttl_seconds if ttl_seconds is not None else self.ttl_seconds
+        self._matrix[slot] = vector
+        self._expires_at[slot] = now + ttl if ttl else np.inf
+        self._last_used[slot] = now
+        self._namespaces[slot] = namespace
+        self._values[slot] = value
+        self._counters["stores"] += 1
+
+    def clear(self) -> None:
+        self._matrix = None
+        self._expires_at[:] = -np.inf
+        self._last_used[:] = 0
+        self._namespaces = [None] * self.capacity
+        self._values = [None] * self.capacity
+
+    def stats(self) -> Dict[str, int]:
+        live = int(np.count_nonzero(self._expires_at > self._clock()))
+        return {**self._counters, "entries": live}
+
+    def _best_match(
+        self, embedding: Sequence[float], namespace: Hashable
+    ) -> Optional[Tuple[int, float]]:
+        if self._matrix is None:
+            return None
+        vector = self._normalize(embedding)
+        if vector is None or vector.shape[0] != self._matrix.shape[1]:
+            return None
+
+        live = self._expires_at > self._clock()
+        same_namespace = np.fromiter(
+            (ns == namespace for ns in self._namespaces), dtype=bool, count=self.capacity
+        )
+        candidates = np.flatnonzero(live & same_namespace)
+        if candidates.size == 0:
+            return None
+
+        similarities = self._matrix[candidates] @ vector
+        best = int(np.argmax(similarities))
+        if similarities[best] < self.similarity_threshold:
+            return None
+        return int(candidates[best]), float(similarities[best])
+
+    def _free_slot(self, now: float) -> int:
+        expired = np.flatnonzero(self._expires_at <= now)
+        if expired.size:
+            slot = int(expired[0])
+            if self._values[slot] is not None:
+                self._counters["evictions"] += 1
+            return slot
+        self._counters["evictions"] += 1
+        return int(np.argmin(self._last_used))
+
+    @staticmethod
+    def _normalize(embedding: Sequence[float]) -> Optional[np.ndarray]:
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = float(np.linalg.norm(vector))
+        if vector.ndim != 1 or norm == 0.0:
+            return None
+        return vector / norm
@@ -1,54 +1,228 @@
 from google.cloud import bigquery
 import asyncio
 import logging
-from typing import List
+import time
+import uuid
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, TypeVar
+
+from backend.app.config import BIGQUERY_POLL_INITIAL_SECONDS, BIGQUERY_POLL_MAX_SECONDS
+from backend.app.db.columnar import ColumnarResult, arrow_available
+from backend.app.utils.deadline import DeadlineExceeded, can_retry, cap_timeout
+from backend.app.utils.resource_pools import UpstreamPool, get_pool
+
+try:  # pragma: no cover - optional dependency
+    from google.cloud import bigquery_storage  # type: ignore
+except ImportError:  # pragma: no cover - handled at runtime
+    bigquery_storage = None
 
 logger = logging.getLogger(__name__)
 
+T = TypeVar("T")
+
 
 class BigQueryClient:
-    def __init__(self):
+    def __init__(self, pool: Optional[UpstreamPool] = None):
         # Lazy client creation inside methods to avoid import-time credential errors
         self._client = None
+        self._bqstorage_client = None
+        # Blocking client calls run on the BigQuery pool instead of the default executor,
+        # and each job holds one of its concurrency slots
+        self._pool = pool or get_pool("bigquery")
+        self._counters: Dict[str, int] = {"queries": 0, "cache_hits": 0, "bytes_processed": 0}
 
     def _get_client(self) -> bigquery.Client:
         if self._client is None:
             self._client = bigquery.Client()
         return self._client
 
-    async def execute_query(self, query: str, timeout: int = 30, retries: int = 2) -> List[dict]:
-        """Execute a BigQuery SQL query in a threadpool with timeout and simple retry/backoff.
+    def _get_bqstorage_client(self):
+        """Storage Read API client, or None when `google-cloud-bigquery-storage` is missing."""
+        if self._bqstorage_client is None and bigquery_storage is not None:
+            self._bqstorage_client = bigquery_storage.BigQueryReadClient()
+        return self._bqstorage_client
+
+    async def execute_query(
+        self,
+        query: str,
+        timeout: int = 30,
+        retries: int = 2,
+        query_parameters: Optional[List[Any]] = None,
+    ) -> List[dict]:
+        """Execute a BigQuery SQL query with timeout and simple retry/backoff.
+
+        The job is submitted and then polled from the event loop; blocking client calls run
+        on this client's executor. A job whose attempt times out or is cancelled is
+        cancelled in BigQuery as well.
 
         Args:
             query: SQL query string.
-            timeout: seconds to wait per blocking call before timing out.
+            timeout: seconds to wait per attempt (job completion and fetch) before timing out.
             retries: number of attempts before giving up.
+            query_parameters: optional `bigquery.*QueryParameter` values referenced as `@name`.
 
         Returns:
             List of rows as dicts.
         """
+        # Convert RowIterator to list of dicts
+        return await self._run_query(
+            query, timeout, retries, query_parameters, lambda rows: [dict(row) for row in rows]
+        )
+
+    async def execute_query_arrow(
+        self,
+        query: str,
+        timeout: int = 30,
+        retries: int = 2,
+        query_parameters: Optional[List[Any]] = None,
+    ) -> ColumnarResult:
+        """Like `execute_query`, but fetch the result as an Arrow table.
+
+        Results are downloaded through the BigQuery Storage Read API when
+        `google-cloud-bigquery-storage` is installed and the result is larger than one
+        page; otherwise `to_arrow` reads them over REST. Requires `pyarrow`.
+        """
+        if not arrow_available():
+            raise RuntimeError("pyarrow is required for Arrow query results")
+        return await self._run_query(
+            query,
+            timeout,
+            retries,
+            query_parameters,
+            lambda rows: ColumnarResult(rows.to_arrow(bqstorage_client=self._get_bqstorage_client())),
+        )
+
+    async def iter_arrow_batches(
+        self,
+        query: str,
+        timeout: int = 30,
+        retries: int = 2,
+        query_parameters: Optional[List[Any]] = None,
+    ) -> AsyncIterator[Any]:
+        """Stream a large result as `pyarrow.RecordBatch` objects without holding it all in memory.
+
+        The job runs like `execute_query_arrow`. Each batch is then read on the BigQuery
+        pool under one of its slots, with `timeout` (capped by the request deadline) per
+        batch. If the consumer stops early, is cancelled or a read times out, the job is
+        cancelled in BigQuery.
+        """
+        if not arrow_available():
+            raise RuntimeError("pyarrow is required for Arrow query results")
+        job_id, batches = await self._run_query(
+            query,
+            timeout,
+            retries,
+            query_parameters,
+            lambda rows: (rows.job_id, iter(rows.to_arrow_iterable(bqstorage_client=self._get_bqstorage_client()))),
+        )
+        exhausted = False
+        try:
+            while True:
+                async with self._pool.slot():
+                    batch = await asyncio.wait_for(
+                        self._in_executor(next, batches, None), timeout=cap_timeout(timeout)
+                    )
+                if batch is None:
+                    exhausted = True
+                    return
+                yield batch
+        finally:
+            if not exhausted:
+                # Runs on aclose() and garbage collection too, so it must not await
+                self._pool.executor.submit(self._cancel_job, self._get_client(), job_id)
+
+    async def _run_query(
+        self,
+        query: str,
+        timeout: int,
+        retries: int,
+        query_parameters: Optional[List[Any]],
+        fetch: Callable[[Any], T],
+    ) -> T:
         attempt = 0
         backoff_base = 1
         # allow at most one retry by default (attempts = retries)
         while True:
             attempt += 1
+            started = time.monotonic()
+            backoff = backoff_base * (2 ** (attempt - 1))
             try:
-                client = self._get_client()
-                # Run the blocking client.query in a thread
-                query_job = await asyncio.wait_for(asyncio.to_thread(client.query, query), timeout=timeout)
-                # Fetch results (blocking) in thread
-                rows = await asyncio.wait_for(asyncio.to_thread(query_job.result), timeout=timeout)
-
-                # Convert RowIterator to list of dicts
-                return [dict(row) for row in rows]
+                # Time spent queued for a slot does not count against the attempt timeout,
+                # but it does count against the request deadline
+                async with self._pool.slot():
+                    return await asyncio.wait_for(
+                        self._run_job(query, query_parameters, fetch), timeout=cap_timeout(timeout)
+                    )
+            except DeadlineExceeded:
+                raise
             except asyncio.TimeoutError:
                 logger.warning("BigQuery execute_query attempt %s timed out", attempt)
-                if attempt >= retries:
+                if attempt >= retries or not can_retry(backoff + time.monotonic() - started):
                     raise
             except Exception as e:
                 logger.exception("BigQuery execute_query attempt %s failed: %s", attempt, str(e))
-                if attempt >= retries:
+                if attempt >= retries or not can_retry(backoff + time.monotonic() - started):
                     raise
 
             # simple exponential backoff before retrying
-            await asyncio.sleep(backoff_base * (2 ** (attempt - 1)))
\ No newline at end of file
+            await asyncio.sleep(backoff)
+
+    async def _run_job(
+        self, query: str, query_parameters: Optional[List[Any]], fetch: Callable[[Any], T]
+    ) -> T:
+        """Submit one query job, poll it until done and fetch its result.
+
+        The job id is chosen up front so the job can be cancelled even if this task is
+        cancelled while the submission request is still in flight.
+        """
+        client = self._get_client()
+        job_id = f"rag_{uuid.uuid4().hex}"
+        job_config = bigquery.QueryJobConfig(query_parameters=query_parameters or [])
+        try:
+            query_job = await self._in_executor(client.query, query, job_config=job_config, job_id=job_id)
+            await self._wait_for_job(query_job)
+            # The job is done, so result() no longer blocks on the query itself
+            result = await self._in_executor(lambda: fetch(query_job.result()))
+        except asyncio.CancelledError:
+            # Raised inside wait_for on timeout as well as on caller cancellation
+            self._pool.executor.submit(self._cancel_job, client, job_id)
+            raise
+        self._record_job(query_job)
+        return result
+
+    async def _wait_for_job(self, query_job: Any) -> None:
+        delay = BIGQUERY_POLL_INITIAL_SECONDS
+        while query_job.state != "DONE":
+            await asyncio.sleep(delay)
+            # Short jobs finish within a few fast polls; long ones back off to the max interval
+            delay = min(delay * 1.5, BIGQUERY_POLL_MAX_SECONDS)
+            await self._in_executor(query_job.reload)
+
+    @staticmethod
+    def _cancel_job(client: bigquery.Client, job_id: str) -> None:
+        try:
+            client.cancel_job(job_id, location=client.location)
+            logger.info("Cancelled BigQuery job %s", job_id)
+        except Exception as e:
+            logger.warning("Failed to cancel BigQuery job %s: %s", job_id, str(e))
+
+    async def _in_executor(self, func: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+        return await self._pool.run_in_executor(func, *args, **kwargs)
+
+    def stats(self) -> Dict[str, int]:
+        """Counters over completed queries, including how many were served from the query cache."""
+        return dict(self._counters)
+
+    def _record_job(self, query_job: Any) -> None:
+        cache_hit = bool(getattr(query_job, "cache_hit", False))
+        bytes_processed = getattr(query_job, "total_bytes_processed", None) or 0
+        self._counters["queries"] += 1
+        self._counters["cache_hits"] += int(cache_hit)
+        self._counters["bytes_processed"] += bytes_processed
+        logger.info(
+            "BigQuery job %s finished (cache_hit=%s, bytes_processed=%s, cache hit rate %s/%s)",
+            getattr(query_job, "job_id", None),
+            cache_hit,
+            bytes_processed,
+            self._counters["cache_hits"],
+            self._counters["queries"],
+        )
@@ -0,0 +1,104 @@
+"""Arrow-backed query results."""
+from __future__ import annotations
+
+from typing import Any, Dict, Iterator, List, Mapping, Optional, Sequence, Tuple
+
+try:  # pragma: no cover - optional dependency
+    import pyarrow  # type: ignore
+    import pyarrow.compute as pc  # type: ignore
+except ImportError:  # pragma: no cover - handled at runtime
+    pyarrow = None
+    pc = None
+
+
+def arrow_available() -> bool:
+    return pyarrow is not None
+
+
+class ColumnarResult:
+    """Read-only view over a `pyarrow.Table` returned by a query.
+
+    The Arrow buffers are used as received. Values are converted to Python one column at
+    a time, and `iter_rows` zips the requested columns into tuples, so consumers never
+    build a dict per row. Nested `list<struct>` columns can be decoded the same way, one
+    struct field at a time, into lists of tuples (see `list_column`). Columns missing
+    from the table read as None.
+    """
+
+    def __init__(self, table: "pyarrow.Table"):
+        self.table = table
+
+    @property
+    def num_rows(self) -> int:
+        return self.table.num_rows
+
+    @property
+    def column_names(self) -> List[str]:
+        return list(self.table.column_names)
+
+    def __len__(self) -> int:
+        return self.table.num_rows
+
+    def column(self, name: str) -> List[Any]:
+        if name not in self.table.column_names:
+            return [None] * self.table.num_rows
+        return self.table.column(name).to_pylist()
+
+    def list_column(
+        self, name: str, fields: Sequence[str], defaults: Optional[Mapping[str, Any]] = None
+    ) -> List[List[Tuple[Any, ...]]]:
+        """A `list<struct>` column as one list of `fields` tuples per row.
+
+        Each struct field is converted to Python once for the whole column, so no dict is
+        built per nested struct. Null lists read as empty. A field missing from the struct
+        reads as its value in `defaults` (None if absent), like `dict.get` on a row result.
+        """
+        defaults = defaults or {}
+        if name not in self.table.column_names:
+            return [[] for _ in range(self.table.num_rows)]
+        lists = self.table.column(name).combine_chunks()
+        lengths = pc.fill_null(pc.list_value_length(lists), 0).to_pylist()
+        structs = pc.list_flatten(lists)
+        present = {structs.type.field(i).name for i in range(structs.type.num_fields)}
+        values = [
+            pc.struct_field(structs, [field]).to_pylist()
+            if field in present
+            else [defaults.get(field)] * len(structs)
+            for field in fields
+        ]
+        items = list(zip(*values)) if values else [()] * len(structs)
+        rows: List[List[Tuple[Any, ...]]] = []
+        start = 0
+        for length in lengths:
+            rows.append(items[start:start + length])
+            start += length
+        return rows
+
+    def iter_rows(
+        self, names: Sequence[str], nested: Optional[Mapping[str, Mapping[str, Any]]] = None
+    ) -> Iterator[Tuple[Any, ...]]:
+        """Rows of `names` as tuples.
+
+        Columns in `nested` are decoded with `list_column`; each maps the struct fields to
+        read to their default when missing.
+        """
+        nested = nested or {}
+        return zip(
+            *(
+                self.list_column(name, list(nested[name]), nested[name]) if name in nested else self.column(name)
+                for name in names
+            )
+        )
+
+    def take(self, indices: Sequence[int]) -> "ColumnarResult":
+        return ColumnarResult(self.table.take(pyarrow.array(indices, type=pyarrow.int64())))
+
+    def split_by(self, name: str, count: int) -> List["ColumnarResult"]:
+        """Split rows by an integer column with values in `range(count)`, keeping row order."""
+        groups: List[List[int]] = [[] for _ in range(count)]
+        for row, value in enumerate(self.column(name)):
+            groups[value].append(row)
+        return [self.take(indices) for indices in groups]
+
+    def to_pylist(self) -> List[Dict[str, Any]]:
+        return self.table.to_pylist()
@@ -7,13 +7,68 @@ from backend.app.llm.vertex_ai_utils import VertexAIClient
 from backend.app.llm.vertex_adapter import VertexAILangChainWrapper
 from backend.app.core.search_engine import SearchEngine
 from backend.app.core.search_service import SearchService
-from backend.app.core.rag_pipeline import RAGPipeline
+from backend.app.core.rag_pipeline import PROMPT_VERSION, RAGPipeline
+from backend.app.core.chunk_sizer import AdaptiveChunkSizer
+from backend.app.core.analysis_cache import (
+    AnalysisCache,
+    MemoryAnalysisCacheBackend,
+    SQLiteAnalysisCacheBackend,
+)
+from backend.app.core.pregenerated_store import PregeneratedAnalysisStore
+from backend.app.core.embedding_cache import EmbeddingCache, SQLiteEmbeddingStore
+from backend.app.core.semantic_cache import SemanticResponseCache
+from backend.app.core.lexical_index import LexicalIndex
+from backend.app.core.local_index import LocalRetriever
+from backend.app.utils.hedging import Hedger
+from backend.app.utils.single_flight import SingleFlight
+from backend.app.config import (
+    ANALYSIS_CACHE_BACKEND,
+    ANALYSIS_CACHE_MAX_ENTRIES,
+    ANALYSIS_CACHE_PATH,
+    ANALYSIS_CACHE_TTL_SECONDS,
+    EMBEDDING_CACHE_DISK_MAX_ENTRIES,
+    EMBEDDING_CACHE_ENABLED,
+    EMBEDDING_CACHE_MAX_ENTRIES,
+    EMBEDDING_CACHE_PATH,
+    EMBEDDING_CACHE_TTL_SECONDS,
+    SEMANTIC_CACHE_CAPACITY,
+    SEMANTIC_CACHE_ENABLED,
+    SEMANTIC_CACHE_THRESHOLD,
+    SEMANTIC_CACHE_TTL_SECONDS,
+    LEXICAL_INDEX_PATH,
+    LLM_MODEL_NAME,
+    LOCAL_INDEX_MODE,
+    LOCAL_INDEX_NLIST,
+    LOCAL_INDEX_NPROBE,
+    LOCAL_PRODUCTS_PATH,
+    LOCAL_PRODUCTS_STORE_PATH,
+    LOCAL_REVIEW_AGGREGATES_PATH,
+    LOCAL_REVIEWS_PATH,
+    LOCAL_REVIEWS_STORE_PATH,
+    PREGENERATED_ANALYSES_PATH,
+    RAG_ADAPTIVE_CHUNKING,
+    RAG_BATCH_SIZE,
+    RAG_HEDGE_MAX_RATE,
+    RAG_HEDGE_MIN_SAMPLES,
+    RAG_HEDGE_PERCENTILE,
+    RAG_HEDGING_ENABLED,
+    RAG_MAX_BATCH_SIZE,
+    RAG_MAX_OUTPUT_TOKENS,
+    RAG_MAX_PROMPT_TOKENS,
+    RETRIEVAL_BACKEND,
+    RETRIEVAL_REVIEW_MODE,
+    SINGLE_FLIGHT_ENABLED,
+)
 from typing import Optional
 import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
 
 
 _vertex_ai_client: Optional[VertexAIClient] = None
 _langchain_llm: Optional[VertexAILangChainWrapper] = None
+_embedding_cache: Optional[EmbeddingCache] = None
 _search_engine: Optional[SearchEngine] = None
 _search_service: Optional[SearchService] = None
 _rag_pipeline: Optional[RAGPipeline] = None
@@ -33,24 +88,123 @@ def get_langchain_llm() -> VertexAILangChainWrapper:
     return _langchain_llm
 
 
+def get_embedding_cache() -> Optional[EmbeddingCache]:
+    global _embedding_cache
+    if _embedding_cache is None and EMBEDDING_CACHE_ENABLED:
+        disk_store = None
+        if EMBEDDING_CACHE_PATH:
+            disk_store = SQLiteEmbeddingStore(
+                EMBEDDING_CACHE_PATH, EMBEDDING_CACHE_TTL_SECONDS, EMBEDDING_CACHE_DISK_MAX_ENTRIES
+            )
+        _embedding_cache = EmbeddingCache(
+            max_entries=EMBEDDING_CACHE_MAX_ENTRIES,
+            ttl_seconds=EMBEDDING_CACHE_TTL_SECONDS,
+            disk_store=disk_store,
+        )
+    return _embedding_cache
+
+
+def get_local_retriever() -> Optional[LocalRetriever]:
+    if RETRIEVAL_BACKEND != "local":
+        return None
+    return LocalRetriever.from_files(
+        LOCAL_PRODUCTS_PATH,
+        LOCAL_REVIEWS_PATH,
+        mode=LOCAL_INDEX_MODE,
+        nlist=LOCAL_INDEX_NLIST,
+        nprobe=LOCAL_INDEX_NPROBE,
+        products_store_path=LOCAL_PRODUCTS_STORE_PATH,
+        reviews_store_path=LOCAL_REVIEWS_STORE_PATH,
+        review_mode=RETRIEVAL_REVIEW_MODE,
+        aggregates_path=LOCAL_REVIEW_AGGREGATES_PATH,
+    )
+
+
+def get_lexical_index() -> Optional[LexicalIndex]:
+    if not LEXICAL_INDEX_PATH:
+        return None
+    return LexicalIndex.load(LEXICAL_INDEX_PATH)
+
+
 def get_search_engine() -> SearchEngine:
     global _search_engine
     if _search_engine is None:
-        _search_engine = SearchEngine(vertex_ai_client=get_vertex_ai_client())
+        _search_engine = SearchEngine(
+            vertex_ai_client=get_vertex_ai_client(),
+            embedding_cache=get_embedding_cache(),
+            local_retriever=get_local_retriever(),
+            lexical_index=get_lexical_index(),
+        )
     return _search_engine
 
 
 def get_search_service_dep() -> SearchService:
     global _search_service
     if _search_service is None:
-        _search_service = SearchService(search_engine=get_search_engine())
+        semantic_cache = None
+        if SEMANTIC_CACHE_ENABLED:
+            semantic_cache = SemanticResponseCache(
+                capacity=SEMANTIC_CACHE_CAPACITY,
+                similarity_threshold=SEMANTIC_CACHE_THRESHOLD,
+                ttl_seconds=SEMANTIC_CACHE_TTL_SECONDS,
+            )
+        _search_service = SearchService(
+            search_engine=get_search_engine(),
+            semantic_cache=semantic_cache,
+            single_flight=SingleFlight("search") if SINGLE_FLIGHT_ENABLED else None,
+        )
     return _search_service
 
 
+def get_analysis_cache() -> Optional[AnalysisCache]:
+    if ANALYSIS_CACHE_BACKEND == "memory":
+        backend = MemoryAnalysisCacheBackend(ANALYSIS_CACHE_MAX_ENTRIES, ANALYSIS_CACHE_TTL_SECONDS)
+    elif ANALYSIS_CACHE_BACKEND == "sqlite":
+        backend = SQLiteAnalysisCacheBackend(
+            ANALYSIS_CACHE_PATH, ANALYSIS_CACHE_MAX_ENTRIES, ANALYSIS_CACHE_TTL_SECONDS
+        )
+    else:
+        return None
+    return AnalysisCache(backend, model_name=LLM_MODEL_NAME, prompt_version=PROMPT_VERSION)
+
+
+def get_pregenerated_store() -> Optional[PregeneratedAnalysisStore]:
+    if not PREGENERATED_ANALYSES_PATH:
+        return None
+    store = PregeneratedAnalysisStore(PREGENERATED_ANALYSES_PATH)
+    if not store.matches(LLM_MODEL_NAME, PROMPT_VERSION):
+        logger.warning(
+            "Ignoring pre-generated analyses from another model or prompt version: %s", store.metadata
+        )
+        store.close()
+        return None
+    return store
+
+
 def get_rag_pipeline_dep() -> RAGPipeline:
     global _rag_pipeline
     if _rag_pipeline is None:
-        _rag_pipeline = RAGPipeline(llm_client=get_langchain_llm())
+        _rag_pipeline = RAGPipeline(
+            llm_client=get_langchain_llm(),
+            analysis_cache=get_analysis_cache(),
+            pregenerated=get_pregenerated_store(),
+            single_flight=SingleFlight("analyses") if SINGLE_FLIGHT_ENABLED else None,
+            hedger=Hedger(
+                percentile=RAG_HEDGE_PERCENTILE,
+                max_hedge_rate=RAG_HEDGE_MAX_RATE,
+                min_samples=RAG_HEDGE_MIN_SAMPLES,
+            )
+            if RAG_HEDGING_ENABLED
+            else None,
+            chunk_sizer=AdaptiveChunkSizer(
+                initial_size=RAG_BATCH_SIZE,
+                max_size=RAG_MAX_BATCH_SIZE,
+                max_prompt_tokens=RAG_MAX_PROMPT_TOKENS,
+                max_output_tokens=RAG_MAX_OUTPUT_TOKENS,
+            )
+            if RAG_ADAPTIVE_CHUNKING
+            else None,
+        )
     return _rag_pipeline
 
 
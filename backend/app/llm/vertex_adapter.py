@@ -1,9 +1,10 @@
 # app/llm/vertex_adapter.py
+from langchain_core.callbacks import AsyncCallbackManagerForLLMRun
 from langchain_core.language_models import BaseLLM
 from langchain_core.runnables import Runnable
-from langchain_core.outputs import LLMResult, Generation
+from langchain_core.outputs import LLMResult, Generation, GenerationChunk
 from pydantic import Field
-from typing import List, Optional, Any, Dict
+from typing import List, Optional, Any, AsyncIterator, Dict
 import asyncio
 import logging
 
@@ -30,13 +31,32 @@ class VertexAILangChainWrapper(BaseLLM, Runnable):
         return LLMResult(generations=[[Generation(text=r)] for r in responses])
 
     async def _agenerate(self, prompts: List[str], stop: Optional[List[str]] = None, **kwargs: Any) -> LLMResult:
-        responses = []
-        for prompt in prompts:
-            # await the client's async generate_text
-            response = await self.client.generate_text(prompt)
-            responses.append(response)
+        # Issue all prompts concurrently; the client's resource pool bounds in-flight calls
+        tasks = [asyncio.ensure_future(self.client.generate_text(prompt)) for prompt in prompts]
+        try:
+            responses = await asyncio.gather(*tasks)
+        except BaseException:
+            for task in tasks:
+                task.cancel()
+            raise
         return LLMResult(generations=[[Generation(text=r)] for r in responses])
 
+    async def _astream(
+        self,
+        prompt: str,
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> AsyncIterator[GenerationChunk]:
+        # Forward Gemini's streamed text so `astream` callers see tokens as they arrive
+        async for text in self.client.stream_text(prompt):
+            if not text:
+                continue
+            chunk = GenerationChunk(text=text)
+            if run_manager is not None:
+                await run_manager.on_llm_new_token(text, chunk=chunk)
+            yield chunk
+
     @property
     def _llm_type(self) -> str:
         return "vertexai_wrapper"
@@ -1,11 +1,14 @@
 import asyncio
 import logging
+import time
 import vertexai
 from vertexai.generative_models import GenerativeModel
 from vertexai.language_models import TextEmbeddingModel
 from google.oauth2 import service_account
-from backend.app.config import PROJECT_ID, VERTEX_AI_REGION, LLM_MODEL_NAME, GOOGLE_APPLICATION_CREDENTIALS_PATH
-from typing import List
+from backend.app.config import PROJECT_ID, VERTEX_AI_REGION, LLM_MODEL_NAME, EMBEDDING_MODEL_NAME, GOOGLE_APPLICATION_CREDENTIALS_PATH, LLM_ASYNC_ENABLED
+from backend.app.utils.deadline import DeadlineExceeded, can_retry, cap_timeout
+from backend.app.utils.resource_pools import get_pool
+from typing import AsyncIterator, List, Optional
 
 logger = logging.getLogger(__name__)
 
@@ -13,14 +16,20 @@ logger = logging.getLogger(__name__)
 class VertexAIClient:
     """Wrapper around Vertex AI SDK that keeps initialization lazy and exposes async-safe methods.
 
-    The underlying Vertex SDK is typically synchronous, so blocking calls are executed
-    in a thread using asyncio.to_thread. Timeouts and simple retries are supported.
+    Gemini calls use the SDK's native `generate_content_async`, so no thread is held
+    while a response is generated. Blocking calls (initialization, embeddings, and
+    Gemini when `LLM_ASYNC_ENABLED` is off) run on the "llm" and "embeddings" resource
+    pools, which also cap in-flight requests per model. Timeouts and simple retries are
+    supported.
     """
 
     def __init__(self):
         self._initialized = False
         self._llm_model = None
         self._embedding_model = None
+        self._llm_pool = get_pool("llm")
+        self._embedding_pool = get_pool("embeddings")
+        self._init_lock: Optional[asyncio.Lock] = None
 
     def _init(self):
         if self._initialized:
@@ -39,44 +48,153 @@ class VertexAIClient:
         credentials = service_account.Credentials.from_service_account_file(GOOGLE_APPLICATION_CREDENTIALS_PATH)
         vertexai.init(project=PROJECT_ID, location=VERTEX_AI_REGION, credentials=credentials)
         self._llm_model = GenerativeModel(LLM_MODEL_NAME)
-        self._embedding_model = TextEmbeddingModel.from_pretrained("text-embedding-005")
+        self._embedding_model = TextEmbeddingModel.from_pretrained(EMBEDDING_MODEL_NAME)
         self._initialized = True
 
+    async def _ensure_initialized(self) -> None:
+        # Fast path: once initialized, skip the executor hop entirely
+        if self._initialized:
+            return
+        if self._init_lock is None:
+            self._init_lock = asyncio.Lock()
+        async with self._init_lock:
+            if not self._initialized:
+                await self._llm_pool.run_in_executor(self._init)
+
+    async def _generate_content(self, prompt: str, timeout: int):
+        if LLM_ASYNC_ENABLED and hasattr(self._llm_model, "generate_content_async"):
+            return await asyncio.wait_for(self._llm_model.generate_content_async(prompt), timeout=timeout)
+        # call the blocking generate_content on the LLM pool
+        return await asyncio.wait_for(
+            self._llm_pool.run_in_executor(self._llm_model.generate_content, prompt), timeout=timeout
+        )
+
     async def generate_text(self, prompt: str, timeout: int = 30, retries: int = 2) -> str:
         attempt = 0
         while True:
             attempt += 1
+            started = time.monotonic()
             try:
-                # ensure underlying models are initialized in a thread to avoid blocking event loop
-                await asyncio.to_thread(self._init)
-                # call the blocking generate_content in thread
-                response = await asyncio.wait_for(asyncio.to_thread(self._llm_model.generate_content, prompt), timeout=timeout)
+                # ensure underlying models are initialized without blocking the event loop
+                await self._ensure_initialized()
+                async with self._llm_pool.slot():
+                    response = await self._generate_content(prompt, cap_timeout(timeout))
                 return response.text
+            except DeadlineExceeded:
+                raise
             except asyncio.TimeoutError:
                 logger.warning("VertexAI generate_text attempt %s timed out", attempt)
-                if attempt >= retries:
+                if attempt >= retries or not self._retry_fits(attempt, started):
                     raise
             except Exception as e:
                 logger.exception("VertexAI generate_text attempt %s failed: %s", attempt, str(e))
-                if attempt >= retries:
+                if attempt >= retries or not self._retry_fits(attempt, started):
                     raise
             await asyncio.sleep(1 * attempt)
 
+    async def stream_text(self, prompt: str, timeout: int = 30) -> AsyncIterator[str]:
+        """Yield Gemini's response text as it is generated.
+
+        `timeout` bounds the wait for each chunk rather than the whole response. Streams are
+        not retried here because earlier chunks have already been handed to the caller.
+        """
+        await self._ensure_initialized()
+        async with self._llm_pool.slot():
+            if LLM_ASYNC_ENABLED and hasattr(self._llm_model, "generate_content_async"):
+                stream = await asyncio.wait_for(
+                    self._llm_model.generate_content_async(prompt, stream=True), timeout=cap_timeout(timeout)
+                )
+                chunks = stream.__aiter__()
+                while True:
+                    try:
+                        chunk = await asyncio.wait_for(chunks.__anext__(), timeout=cap_timeout(timeout))
+                    except StopAsyncIteration:
+                        return
+                    yield self._chunk_text(chunk)
+            else:
+                stream = await asyncio.wait_for(
+                    self._llm_pool.run_in_executor(self._llm_model.generate_content, prompt, stream=True),
+                    timeout=cap_timeout(timeout),
+                )
+                chunks = iter(stream)
+                while True:
+                    chunk = await asyncio.wait_for(
+                        self._llm_pool.run_in_executor(next, chunks, None), timeout=cap_timeout(timeout)
+                    )
+                    if chunk is None:
+                        return
+                    yield self._chunk_text(chunk)
+
+    @staticmethod
+    def _retry_fits(attempt: int, started: float) -> bool:
+        # The next attempt costs the backoff sleep plus roughly as long as this one took
+        return can_retry(1 * attempt + (time.monotonic() - started))
+
+    @staticmethod
+    def _chunk_text(chunk) -> str:
+        # `.text` raises when a chunk carries no text part (e.g. only a finish reason)
+        try:
+            return chunk.text
+        except ValueError:
+            return ""
+
     async def get_embeddings(self, text: str, timeout: int = 30, retries: int = 2) -> List[float]:
         attempt = 0
         while True:
             attempt += 1
+            started = time.monotonic()
             try:
-                await asyncio.to_thread(self._init)
-                embeddings = await asyncio.wait_for(asyncio.to_thread(self._embedding_model.get_embeddings, [text]), timeout=timeout)
+                await self._ensure_initialized()
+                async with self._embedding_pool.slot():
+                    embeddings = await asyncio.wait_for(
+                        self._embedding_pool.run_in_executor(self._embedding_model.get_embeddings, [text]), timeout=cap_timeout(timeout)
+                    )
                 # embeddings is a list-like of Embedding objects
                 return [embedding.values for embedding in embeddings][0]
+            except DeadlineExceeded:
+                raise
             except asyncio.TimeoutError:
                 logger.warning("VertexAI get_embeddings attempt %s timed out", attempt)
-                if attempt >= retries:
+                if attempt >= retries or not self._retry_fits(attempt, started):
                     raise
             except Exception as e:
                 logger.exception("VertexAI get_embeddings attempt %s failed: %s", attempt, str(e))
-                if attempt >= retries:
+                if attempt >= retries or not self._retry_fits(attempt, started):
+                    raise
+            await asyncio.sleep(1 * attempt)
+
+    async def get_embeddings_batch(
+        self, texts: List[str], timeout: int = 60, retries: int = 2, max_batch_size: int = 250
+    ) -> List[List[float]]:
+        """Embed many texts with one `get_embeddings` request per `max_batch_size` inputs.
+
+        The embedding API caps the number of inputs per request, so very large lists are
+        split into the fewest requests the service accepts.
+        """
+        vectors: List[List[float]] = []
+        for start in range(0, len(texts), max_batch_size):
+            batch = texts[start:start + max_batch_size]
+            attempt = 0
+            while True:
+                attempt += 1
+                started = time.monotonic()
+                try:
+                    await self._ensure_initialized()
+                    async with self._embedding_pool.slot():
+                        embeddings = await asyncio.wait_for(
+                            self._embedding_pool.run_in_executor(self._embedding_model.get_embeddings, batch), timeout=cap_timeout(timeout)
+                        )
+                    vectors.extend(embedding.values for embedding in embeddings)
+                    break
+                except DeadlineExceeded:
                     raise
-            await asyncio.sleep(1 * attempt)
\ No newline at end of file
+                except asyncio.TimeoutError:
+                    logger.warning("VertexAI get_embeddings_batch attempt %s timed out", attempt)
+                    if attempt >= retries or not self._retry_fits(attempt, started):
+                        raise
+                except Exception as e:
+                    logger.exception("VertexAI get_embeddings_batch attempt %s failed: %s", attempt, str(e))
+                    if attempt >= retries or not self._retry_fits(attempt, started):
+                        raise
+                await asyncio.sleep(1 * attempt)
+        return vectors
@@ -1,7 +1,7 @@
 from fastapi import FastAPI, Depends
 from fastapi.middleware.cors import CORSMiddleware  
 from backend.app.dependencies import get_search_service_dep, get_rag_pipeline_dep, initialize_on_startup  # Changed to absolute import
-from backend.app.api import search_endpoints, sentiment_endpoints
+from backend.app.api import metrics_endpoints, search_endpoints, sentiment_endpoints
 import logging
 app = FastAPI()
 
@@ -23,6 +23,7 @@ logging.basicConfig(
 # Include routers, passing dependencies - CORRECTED: Pass dependencies as router arguments
 app.include_router(search_endpoints.router, dependencies=[Depends(get_search_service_dep), Depends(get_rag_pipeline_dep)])
 app.include_router(sentiment_endpoints.router, dependencies=[Depends(get_rag_pipeline_dep)]) # Add dependencies to sentiment_endpoints as well (if needed in the future)
+app.include_router(metrics_endpoints.router)
 
 @app.get("/")
 async def read_root():
@@ -2,12 +2,34 @@
 from __future__ import annotations
 
 from datetime import datetime
-from typing import List, Optional
-from pydantic import BaseModel, Field
+from typing import List, Optional, Tuple
+from pydantic import BaseModel, Field, model_validator
 
 from backend.app.schemas.llm_outputs import ProductAnalysis
 
 
+class SearchFilters(BaseModel):
+    """Product metadata constraints applied inside retrieval, before the vector ranking."""
+
+    category: Optional[str] = None  # exact `main_category`, e.g. "All Beauty"
+    min_rating: Optional[float] = Field(default=None, ge=0, le=5)
+    min_price: Optional[float] = Field(default=None, ge=0)
+    max_price: Optional[float] = Field(default=None, ge=0)
+
+    @model_validator(mode="after")
+    def _check_price_range(self) -> "SearchFilters":
+        if self.min_price is not None and self.max_price is not None and self.min_price > self.max_price:
+            raise ValueError("min_price cannot exceed max_price")
+        return self
+
+    def is_empty(self) -> bool:
+        return self.cache_key() == (None, None, None, None)
+
+    def cache_key(self) -> Tuple[Optional[str], Optional[float], Optional[float], Optional[float]]:
+        category = self.category.strip() if self.category else None
+        return (category or None, self.min_rating, self.min_price, self.max_price)
+
+
 class ProductReview(BaseModel):
     content: str
     rating: Optional[int] = None
@@ -38,8 +60,25 @@ class SearchResponse(BaseModel):
     results: List[ProductSearchResult]
 
 
+class BatchSearchRequest(BaseModel):
+    queries: List[str] = Field(min_length=1)
+    products_k: int = 3
+    # Applied to every query of the batch
+    filters: Optional[SearchFilters] = None
+    # Generating analyses costs one LLM pass per query; retrieval-only batches skip it
+    include_analysis: bool = False
+
+
+class BatchSearchResponse(BaseModel):
+    count: int
+    responses: List[SearchResponse]
+
+
 __all__ = [
+    "BatchSearchRequest",
+    "BatchSearchResponse",
     "ProductReview",
     "ProductSearchResult",
+    "SearchFilters",
     "SearchResponse",
 ]
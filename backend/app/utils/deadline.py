@@ -0,0 +1,88 @@
+"""Per-request time budgets that follow the request through async calls.
+
+The active deadline lives in a context variable, so it reaches every coroutine and task
+started while handling the request without being passed explicitly. Upstream clients
+cap their timeouts with `cap_timeout` and skip retries that no longer fit.
+"""
+from __future__ import annotations
+
+import time
+from contextlib import contextmanager
+from contextvars import Context, ContextVar, copy_context
+from typing import Callable, Iterator, Optional
+
+
+class DeadlineExceeded(TimeoutError):
+    """Raised when the request's time budget has run out."""
+
+
+class Deadline:
+    def __init__(self, budget_seconds: float, clock: Callable[[], float] = time.monotonic):
+        self._clock = clock
+        self.expires_at = clock() + max(0.0, budget_seconds)
+
+    def remaining(self) -> float:
+        return max(0.0, self.expires_at - self._clock())
+
+    def expired(self) -> bool:
+        return self.remaining() <= 0.0
+
+    def check(self) -> None:
+        if self.expired():
+            raise DeadlineExceeded("Request deadline exceeded")
+
+
+_current: ContextVar[Optional[Deadline]] = ContextVar("request_deadline", default=None)
+
+
+def current_deadline() -> Optional[Deadline]:
+    return _current.get()
+
+
+@contextmanager
+def deadline_scope(budget_seconds: Optional[float]) -> Iterator[Optional[Deadline]]:
+    """Run the block under a deadline `budget_seconds` from now.
+
+    A budget of None leaves the current deadline unchanged; a budget <= 0 is already
+    expired. An enclosing deadline that expires sooner stays in force.
+    """
+    outer = _current.get()
+    if budget_seconds is None:
+        yield outer
+        return
+    deadline = Deadline(budget_seconds)
+    if outer is not None and outer.expires_at <= deadline.expires_at:
+        deadline = outer
+    token = _current.set(deadline)
+    try:
+        yield deadline
+    finally:
+        _current.reset(token)
+
+
+def detached_context() -> Context:
+    """Copy of the current context without a deadline, for work shared by several requests."""
+    context = copy_context()
+    context.run(_current.set, None)
+    return context
+
+
+def remaining_time() -> Optional[float]:
+    """Seconds left in the current budget, or None when no deadline is set."""
+    deadline = _current.get()
+    return deadline.remaining() if deadline is not None else None
+
+
+def cap_timeout(timeout: float) -> float:
+    """Shrink `timeout` to the remaining budget; raises `DeadlineExceeded` if none is left."""
+    deadline = _current.get()
+    if deadline is None:
+        return timeout
+    deadline.check()
+    return min(timeout, deadline.remaining())
+
+
+def can_retry(expected_seconds: float) -> bool:
+    """Whether another attempt expected to take `expected_seconds` fits in the budget."""
+    remaining = remaining_time()
+    return remaining is None or remaining > expected_seconds
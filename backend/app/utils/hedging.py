@@ -0,0 +1,105 @@
+"""Hedged requests: send a backup call when the first one is slower than usual."""
+from __future__ import annotations
+
+import asyncio
+import math
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, Hashable, Optional, TypeVar
+
+T = TypeVar("T")
+
+_COUNTERS = ("calls", "hedged", "hedge_wins", "rate_limited")
+
+
+class Hedger:
+    """Runs a call and, if it outlives the recent latency percentile, races a duplicate.
+
+    Latencies of completed calls are kept per key (for example per prompt size) over the
+    last `window` calls; until a key has `min_samples` of them, calls are never hedged.
+    Whichever attempt succeeds first wins and the other is cancelled. If one attempt
+    fails, the other is still awaited. At most `max_hedge_rate` of recent calls may be
+    hedged, which bounds the extra upstream cost.
+    """
+
+    def __init__(
+        self,
+        percentile: float = 0.95,
+        max_hedge_rate: float = 0.1,
+        window: int = 200,
+        min_samples: int = 20,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.percentile = min(max(percentile, 0.0), 1.0)
+        self.max_hedge_rate = max(0.0, max_hedge_rate)
+        self.window = max(1, window)
+        self.min_samples = max(1, min_samples)
+        self._clock = clock
+        self._latencies: Dict[Hashable, Deque[float]] = {}
+        # Whether each of the last `window` calls was hedged
+        self._recent_hedges: Deque[bool] = deque(maxlen=self.window)
+        self._counters: Dict[str, int] = dict.fromkeys(_COUNTERS, 0)
+
+    def hedge_delay(self, key: Hashable) -> Optional[float]:
+        """Seconds to wait before hedging calls for `key`, or None while there is too little data."""
+
+        samples = self._latencies.get(key)
+        if not samples or len(samples) < self.min_samples:
+            return None
+        ordered = sorted(samples)
+        index = min(len(ordered) - 1, max(0, math.ceil(self.percentile * len(ordered)) - 1))
+        return ordered[index]
+
+    def record(self, key: Hashable, latency: float) -> None:
+        samples = self._latencies.get(key)
+        if samples is None:
+            samples = self._latencies[key] = deque(maxlen=self.window)
+        samples.append(latency)
+
+    async def run(self, key: Hashable, func: Callable[[], Awaitable[T]]) -> T:
+        self._counters["calls"] += 1
+        delay = self.hedge_delay(key)
+        started = self._clock()
+        primary = asyncio.ensure_future(func())
+        tasks = [primary]
+        try:
+            hedged = False
+            if delay is not None:
+                done, _ = await asyncio.wait(tasks, timeout=delay)
+                if not done and self._may_hedge():
+                    tasks.append(asyncio.ensure_future(func()))
+                    hedged = True
+                    self._counters["hedged"] += 1
+                elif not done:
+                    self._counters["rate_limited"] += 1
+            self._recent_hedges.append(hedged)
+
+            pending = set(tasks)
+            error: Optional[BaseException] = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is not primary:
+                            self._counters["hedge_wins"] += 1
+                        # A lower bound for the primary when the hedge won, so slow
+                        # calls still pull the percentile up
+                        self.record(key, self._clock() - started)
+                        return task.result()
+                    error = error or task.exception()
+            raise error  # type: ignore[misc]
+        finally:
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    def _may_hedge(self) -> bool:
+        hedged = sum(self._recent_hedges)
+        # Counting this call, the hedged share of recent calls must stay within the cap
+        return hedged + 1 <= self.max_hedge_rate * (len(self._recent_hedges) + 1)
+
+    def stats(self) -> Dict[str, Any]:
+        stats: Dict[str, Any] = dict(self._counters)
+        stats["hedge_rate"] = self._counters["hedged"] / self._counters["calls"] if self._counters["calls"] else 0.0
+        return stats
@@ -0,0 +1,74 @@
+"""Incremental extraction of array elements from a JSON document that is still streaming."""
+from __future__ import annotations
+
+from typing import List, Optional
+
+
+class IncrementalArrayParser:
+    """Emits the raw JSON text of each object in a top-level array field as it closes.
+
+    Feed the response text chunk by chunk. Once `{"results": [ {...}, {...` has streamed
+    far enough to close an element object, `feed` returns that object's text so it can
+    be validated before the rest of the document arrives. Text before the first `{`
+    (such as a Markdown code fence) is ignored. The scanner tracks string and escape
+    state, so braces inside string values do not confuse it.
+    """
+
+    def __init__(self, field: str = "results"):
+        self.field = field
+        self.text = ""
+        self.array_closed = False
+        self._pos = 0
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._string_start = 0
+        self._last_key: Optional[str] = None
+        # Depth inside the target array (elements start one level deeper)
+        self._array_depth: Optional[int] = None
+        self._element_start: Optional[int] = None
+
+    def feed(self, chunk: str) -> List[str]:
+        self.text += chunk
+        text = self.text
+        completed: List[str] = []
+
+        for index in range(self._pos, len(text)):
+            char = text[index]
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif char == "\\":
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+                    if self._depth == 1:
+                        self._last_key = text[self._string_start + 1:index]
+            elif char == '"':
+                self._in_string = True
+                self._string_start = index
+            elif char in "{[":
+                self._depth += 1
+                if (
+                    char == "["
+                    and self._depth == 2
+                    and self._array_depth is None
+                    and not self.array_closed
+                    and self._last_key == self.field
+                ):
+                    self._array_depth = 2
+                elif char == "{" and self._array_depth is not None and self._depth == self._array_depth + 1:
+                    self._element_start = index
+            elif char in "}]":
+                self._depth -= 1
+                if self._array_depth is None:
+                    continue
+                if char == "}" and self._element_start is not None and self._depth == self._array_depth:
+                    completed.append(text[self._element_start:index + 1])
+                    self._element_start = None
+                elif char == "]" and self._depth == self._array_depth - 1:
+                    self._array_depth = None
+                    self.array_closed = True
+
+        self._pos = len(text)
+        return completed
@@ -0,0 +1,45 @@
+"""Recovery of usable array elements from malformed LLM JSON output."""
+from __future__ import annotations
+
+from typing import List
+
+from backend.app.utils.incremental_json import IncrementalArrayParser
+
+
+def remove_trailing_commas(text: str) -> str:
+    """Drop commas directly before a closing `}` or `]`, leaving string contents alone."""
+
+    out: List[str] = []
+    in_string = False
+    escape = False
+    length = len(text)
+    for index, char in enumerate(text):
+        if in_string:
+            if escape:
+                escape = False
+            elif char == "\\":
+                escape = True
+            elif char == '"':
+                in_string = False
+        elif char == '"':
+            in_string = True
+        elif char == ",":
+            lookahead = index + 1
+            while lookahead < length and text[lookahead].isspace():
+                lookahead += 1
+            if lookahead < length and text[lookahead] in "}]":
+                continue
+        out.append(char)
+    return "".join(out)
+
+
+def salvage_array_items(text: str, field: str = "results") -> List[str]:
+    """Return the JSON text of every complete object in the `field` array of `text`.
+
+    Handles the usual defects of model output: Markdown code fences or prose around the
+    document, trailing commas, and a response cut off part-way through the array (the
+    unfinished element is dropped). Each returned item still has to be validated.
+    """
+
+    parser = IncrementalArrayParser(field)
+    return [remove_trailing_commas(item) for item in parser.feed(text)]
@@ -0,0 +1,136 @@
+"""Per-upstream thread pools and concurrency limits.
+
+Each upstream service (Gemini, the embedding model, BigQuery) gets its own sized
+executor for blocking SDK calls and a semaphore capping in-flight requests, so a burst
+against one service cannot starve the others or exceed its quota. Waiting for a slot
+counts against the request deadline. Pools also keep queue-depth and wait-time gauges
+for the `/metrics` endpoint.
+"""
+from __future__ import annotations
+
+import asyncio
+import functools
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Callable, Dict, Tuple, TypeVar
+
+from backend.app.config import (
+    BIGQUERY_MAX_CONCURRENCY,
+    BIGQUERY_MAX_WORKERS,
+    EMBEDDING_MAX_CONCURRENCY,
+    EMBEDDING_MAX_WORKERS,
+    LLM_MAX_CONCURRENCY,
+    LLM_MAX_WORKERS,
+)
+from backend.app.utils.deadline import DeadlineExceeded, remaining_time
+
+T = TypeVar("T")
+
+# (executor threads, max in-flight requests) per upstream
+POOL_LIMITS: Dict[str, Tuple[int, int]] = {
+    "llm": (LLM_MAX_WORKERS, LLM_MAX_CONCURRENCY),
+    "embeddings": (EMBEDDING_MAX_WORKERS, EMBEDDING_MAX_CONCURRENCY),
+    "bigquery": (BIGQUERY_MAX_WORKERS, BIGQUERY_MAX_CONCURRENCY),
+}
+
+
+class UpstreamPool:
+    """Executor plus semaphore for one upstream service."""
+
+    def __init__(
+        self,
+        name: str,
+        max_workers: int,
+        max_concurrency: int,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.name = name
+        self.max_workers = max(1, max_workers)
+        self.max_concurrency = max(1, max_concurrency)
+        self.executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix=name)
+        self._slots = asyncio.Semaphore(self.max_concurrency)
+        self._clock = clock
+        self.in_flight = 0
+        self.waiting = 0
+        self.acquired = 0
+        self.deadline_exceeded = 0
+        self._total_wait = 0.0
+        self._max_wait = 0.0
+        self._last_wait = 0.0
+
+    @asynccontextmanager
+    async def slot(self) -> AsyncIterator[None]:
+        """Hold one of the upstream's concurrency slots, recording how long it took to get.
+
+        Raises `DeadlineExceeded` if the request deadline runs out while queued, so a
+        request that waited past its budget never reaches the upstream.
+        """
+
+        started = self._clock()
+        remaining = remaining_time()
+        self.waiting += 1
+        try:
+            if remaining is None:
+                await self._slots.acquire()
+            else:
+                await asyncio.wait_for(self._slots.acquire(), timeout=remaining)
+        except asyncio.TimeoutError:
+            self.deadline_exceeded += 1
+            raise DeadlineExceeded(f"Request deadline exceeded waiting for a {self.name} slot") from None
+        finally:
+            self.waiting -= 1
+        waited = self._clock() - started
+        self.acquired += 1
+        self._total_wait += waited
+        self._max_wait = max(self._max_wait, waited)
+        self._last_wait = waited
+
+        self.in_flight += 1
+        try:
+            yield
+        finally:
+            self.in_flight -= 1
+            self._slots.release()
+
+    async def run(self, func: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+        """Run a blocking call on this pool's executor while holding a slot."""
+
+        async with self.slot():
+            return await self.run_in_executor(func, *args, **kwargs)
+
+    async def run_in_executor(self, func: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+        """Run a blocking call on this pool's executor without taking a slot."""
+
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, functools.partial(func, *args, **kwargs))
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "max_workers": self.max_workers,
+            "max_concurrency": self.max_concurrency,
+            "in_flight": self.in_flight,
+            "queue_depth": self.waiting,
+            "acquired": self.acquired,
+            "deadline_exceeded": self.deadline_exceeded,
+            "wait_seconds_avg": self._total_wait / self.acquired if self.acquired else 0.0,
+            "wait_seconds_max": self._max_wait,
+            "wait_seconds_last": self._last_wait,
+        }
+
+
+_pools: Dict[str, UpstreamPool] = {}
+
+
+def get_pool(name: str) -> UpstreamPool:
+    """Process-wide pool for `name` ("llm", "embeddings" or "bigquery"), created on first use."""
+
+    pool = _pools.get(name)
+    if pool is None:
+        max_workers, max_concurrency = POOL_LIMITS[name]
+        pool = _pools[name] = UpstreamPool(name, max_workers, max_concurrency)
+    return pool
+
+
+def pool_stats() -> Dict[str, Dict[str, Any]]:
+    return {name: pool.stats() for name, pool in _pools.items()}
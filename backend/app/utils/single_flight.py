@@ -0,0 +1,91 @@
+"""Coalesce concurrent calls for the same key into one in-flight task."""
+from __future__ import annotations
+
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Generic, Hashable, Optional, TypeVar
+
+from backend.app.utils.deadline import DeadlineExceeded, detached_context, remaining_time
+from backend.app.utils.lru_cache import LRUCache
+
+T = TypeVar("T")
+
+_COUNTERS = ("calls", "leaders", "coalesced", "errors", "cancelled")
+
+
+class _Flight:
+    __slots__ = ("task", "waiters")
+
+    def __init__(self, task: "asyncio.Task[Any]"):
+        self.task = task
+        self.waiters = 0
+
+
+class SingleFlight(Generic[T]):
+    """Runs at most one `func()` per key at a time; concurrent callers await the same result.
+
+    Every caller receives the same result object (or exception), so results must be
+    treated as read-only. The shared task runs without a request deadline, and each
+    caller waits for it only as long as its own deadline allows, raising
+    `DeadlineExceeded` when that runs out. A caller that is cancelled or out of time only
+    stops waiting; the shared task is cancelled once its last waiter has gone. Counters are kept in total and per key,
+    the latter for the `max_tracked_keys` most recently used keys.
+    """
+
+    def __init__(self, name: str, max_tracked_keys: int = 1000):
+        self.name = name
+        self._flights: Dict[Hashable, _Flight] = {}
+        self._totals: Dict[str, int] = dict.fromkeys(_COUNTERS, 0)
+        self._per_key: LRUCache[Dict[str, int]] = LRUCache(max_tracked_keys)
+
+    async def do(self, key: Hashable, func: Callable[[], Awaitable[T]]) -> T:
+        flight = self._flights.get(key)
+        if flight is None:
+            # Started outside the leader's deadline, which must not bind the other callers
+            flight = _Flight(detached_context().run(lambda: asyncio.ensure_future(func())))
+            self._flights[key] = flight
+            flight.task.add_done_callback(lambda _task, key=key, flight=flight: self._finish(key, flight))
+            self._count(key, "leaders")
+        else:
+            self._count(key, "coalesced")
+        self._count(key, "calls")
+
+        flight.waiters += 1
+        try:
+            done, _ = await asyncio.wait({flight.task}, timeout=remaining_time())
+            if not done:
+                raise DeadlineExceeded("Request deadline exceeded")
+            return flight.task.result()
+        finally:
+            flight.waiters -= 1
+            if flight.waiters == 0 and not flight.task.done():
+                # Nobody is waiting any more; drop the flight so later callers start fresh.
+                self._forget(key, flight)
+                flight.task.cancel()
+                self._count(key, "cancelled")
+
+    def in_flight(self) -> int:
+        return len(self._flights)
+
+    def stats(self) -> Dict[str, int]:
+        return {**self._totals, "in_flight": len(self._flights)}
+
+    def key_stats(self, key: Hashable) -> Optional[Dict[str, int]]:
+        counters = self._per_key.get(key)
+        return dict(counters) if counters is not None else None
+
+    def _finish(self, key: Hashable, flight: _Flight) -> None:
+        self._forget(key, flight)
+        if not flight.task.cancelled() and flight.task.exception() is not None:
+            self._count(key, "errors")
+
+    def _forget(self, key: Hashable, flight: _Flight) -> None:
+        if self._flights.get(key) is flight:
+            del self._flights[key]
+
+    def _count(self, key: Hashable, counter: str) -> None:
+        self._totals[counter] += 1
+        counters = self._per_key.get(key)
+        if counters is None:
+            counters = dict.fromkeys(_COUNTERS, 0)
+            self._per_key.set(key, counters)
+        counters[counter] += 1
@@ -0,0 +1,191 @@
+import asyncio
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict, List
+
+import pytest
+
+sys.path.append(str(Path(__file__).resolve().parents[2]))
+
+from backend.app.db import bigquery_client
+from backend.app.db.bigquery_client import BigQueryClient
+
+
+class FakeRows(list):
+    """RowIterator stand-in: iterates as dicts and converts to Arrow in fixed-size batches."""
+
+    def __init__(self, job_id: str, rows: List[Dict[str, Any]], batch_size: int = 2):
+        super().__init__(rows)
+        self.job_id = job_id
+        self.batch_size = batch_size
+        self.batches_read = 0
+
+    def to_arrow(self, bqstorage_client=None):
+        import pyarrow as pa
+
+        return pa.Table.from_pylist(list(self))
+
+    def to_arrow_iterable(self, bqstorage_client=None):
+        for batch in self.to_arrow().to_batches(max_chunksize=self.batch_size):
+            self.batches_read += 1
+            yield batch
+
+
+class FakeJob:
+    def __init__(self, job_id: str, rows: List[Dict[str, Any]], polls_until_done: int):
+        self.job_id = job_id
+        self.rows = rows
+        self.polls_until_done = polls_until_done
+        self.reloads = 0
+        self.cache_hit = False
+        self.total_bytes_processed = 10
+        self.state = "DONE" if polls_until_done == 0 else "RUNNING"
+
+    def reload(self) -> None:
+        self.reloads += 1
+        if self.reloads >= self.polls_until_done:
+            self.state = "DONE"
+
+    def result(self):
+        return FakeRows(self.job_id, self.rows)
+
+
+class FakeClient:
+    location = "US"
+
+    def __init__(self, polls_until_done: int = 0, rows: List[Dict[str, Any]] = ()):
+        self.polls_until_done = polls_until_done
+        self.rows = list(rows)
+        self.jobs: List[FakeJob] = []
+        self.cancelled: List[str] = []
+
+    def query(self, query: str, job_config=None, job_id: str = None) -> FakeJob:
+        job = FakeJob(job_id, self.rows, self.polls_until_done)
+        self.jobs.append(job)
+        return job
+
+    def cancel_job(self, job_id: str, location: str = None) -> None:
+        self.cancelled.append(job_id)
+
+
+def make_client(fake: FakeClient) -> BigQueryClient:
+    client = BigQueryClient()
+    client._client = fake
+    # Stands in for the Storage Read API client; FakeRows ignores it
+    client._bqstorage_client = object()
+    return client
+
+
+async def wait_for_cancel(fake: FakeClient) -> None:
+    # Cancellation is submitted to the pool's executor without being awaited
+    deadline = time.monotonic() + 1.0
+    while not fake.cancelled and time.monotonic() < deadline:
+        await asyncio.sleep(0.005)
+
+
+@pytest.mark.asyncio
+async def test_job_is_polled_with_backoff_until_done(monkeypatch):
+    monkeypatch.setattr(bigquery_client, "BIGQUERY_POLL_INITIAL_SECONDS", 0.001)
+    monkeypatch.setattr(bigquery_client, "BIGQUERY_POLL_MAX_SECONDS", 0.003)
+    delays: List[float] = []
+    real_sleep = asyncio.sleep
+
+    async def recording_sleep(delay, *args, **kwargs):
+        delays.append(delay)
+        await real_sleep(0)
+
+    monkeypatch.setattr(asyncio, "sleep", recording_sleep)
+    fake = FakeClient(polls_until_done=5, rows=[{"asin": "A"}])
+    client = make_client(fake)
+
+    rows = await client.execute_query("SELECT 1", retries=1)
+
+    assert rows == [{"asin": "A"}]
+    assert fake.jobs[0].reloads == 5
+    assert delays == pytest.approx([0.001, 0.0015, 0.00225, 0.003, 0.003])
+    assert fake.cancelled == []
+    assert client.stats() == {"queries": 1, "cache_hits": 0, "bytes_processed": 10}
+
+
+@pytest.mark.asyncio
+async def test_timed_out_job_is_cancelled(monkeypatch):
+    monkeypatch.setattr(bigquery_client, "BIGQUERY_POLL_INITIAL_SECONDS", 0.005)
+    fake = FakeClient(polls_until_done=10**6)
+    client = make_client(fake)
+
+    with pytest.raises(asyncio.TimeoutError):
+        await client.execute_query("SELECT 1", timeout=0.05, retries=1)
+    await wait_for_cancel(fake)
+
+    assert fake.cancelled == [fake.jobs[0].job_id]
+    assert fake.jobs[0].job_id.startswith("rag_")
+
+
+@pytest.mark.asyncio
+async def test_cancelled_caller_cancels_the_job(monkeypatch):
+    monkeypatch.setattr(bigquery_client, "BIGQUERY_POLL_INITIAL_SECONDS", 0.005)
+    fake = FakeClient(polls_until_done=10**6)
+    client = make_client(fake)
+
+    task = asyncio.create_task(client.execute_query("SELECT 1", retries=1))
+    while not fake.jobs:
+        await asyncio.sleep(0.005)
+    task.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await task
+    await wait_for_cancel(fake)
+
+    assert fake.cancelled == [fake.jobs[0].job_id]
+
+
+@pytest.mark.asyncio
+async def test_successful_job_is_not_cancelled():
+    fake = FakeClient(polls_until_done=0, rows=[{"asin": "A"}, {"asin": "B"}])
+    client = make_client(fake)
+
+    rows = await client.execute_query("SELECT 1")
+    await asyncio.sleep(0.02)
+
+    assert [row["asin"] for row in rows] == ["A", "B"]
+    assert fake.cancelled == []
+
+
+@pytest.mark.asyncio
+async def test_arrow_result_is_fetched_as_a_table():
+    pytest.importorskip("pyarrow")
+    fake = FakeClient(rows=[{"asin": "A"}, {"asin": "B"}])
+    client = make_client(fake)
+
+    result = await client.execute_query_arrow("SELECT 1")
+
+    assert result.column("asin") == ["A", "B"]
+
+
+@pytest.mark.asyncio
+async def test_arrow_batches_are_streamed():
+    pytest.importorskip("pyarrow")
+    fake = FakeClient(rows=[{"asin": asin} for asin in "ABCDE"])
+    client = make_client(fake)
+
+    batches = [batch async for batch in client.iter_arrow_batches("SELECT 1")]
+    await asyncio.sleep(0.02)
+
+    assert [batch.column("asin").to_pylist() for batch in batches] == [["A", "B"], ["C", "D"], ["E"]]
+    assert fake.cancelled == []
+    assert client._pool.in_flight == 0
+
+
+@pytest.mark.asyncio
+async def test_consumer_stopping_early_cancels_the_streamed_job():
+    pytest.importorskip("pyarrow")
+    fake = FakeClient(rows=[{"asin": asin} for asin in "ABCDE"])
+    client = make_client(fake)
+
+    batches = client.iter_arrow_batches("SELECT 1")
+    first = await batches.__anext__()
+    await batches.aclose()
+    await wait_for_cancel(fake)
+
+    assert first.column("asin").to_pylist() == ["A", "B"]
+    assert fake.cancelled == [fake.jobs[0].job_id]
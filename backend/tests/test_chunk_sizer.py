@@ -0,0 +1,60 @@
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[2]))
+
+from backend.app.core.chunk_sizer import AdaptiveChunkSizer
+
+
+def record_many(sizer, size, count, latency, failures=0, output_tokens=300):
+    for idx in range(count):
+        sizer.record(size, latency, output_tokens * size, parse_failed=idx < failures)
+
+
+def test_starts_with_initial_size_until_sampled():
+    sizer = AdaptiveChunkSizer(initial_size=3, min_samples=2)
+
+    assert sizer.choose(product_count=9, concurrency=4, product_tokens=500) == 3
+    # Never more products per chunk than there are products
+    assert sizer.choose(product_count=2, concurrency=4, product_tokens=500) == 2
+
+
+def test_fixed_size_overrides_observations():
+    sizer = AdaptiveChunkSizer(initial_size=3, min_samples=1, fixed_size=5)
+    record_many(sizer, 3, 5, latency=1.0)
+
+    assert sizer.choose(product_count=9, concurrency=4, product_tokens=500) == 5
+
+
+def test_prefers_smaller_chunks_when_large_ones_fail_to_parse():
+    sizer = AdaptiveChunkSizer(initial_size=4, min_samples=3, explore_every=0)
+    record_many(sizer, 4, 10, latency=4.0, failures=6)
+    record_many(sizer, 2, 10, latency=2.5)
+    record_many(sizer, 1, 10, latency=2.0)
+
+    assert sizer.choose(product_count=8, concurrency=4, product_tokens=500) == 2
+
+    clean = AdaptiveChunkSizer(initial_size=4, min_samples=3, explore_every=0)
+    record_many(clean, 4, 10, latency=4.0)
+    record_many(clean, 2, 10, latency=2.5)
+    # Without failures, two waves of fast calls lose to one wave of larger ones
+    assert clean.choose(product_count=16, concurrency=4, product_tokens=500) == 4
+
+
+def test_explores_unsampled_neighbour_periodically():
+    sizer = AdaptiveChunkSizer(initial_size=3, min_samples=2, explore_every=2)
+    record_many(sizer, 3, 2, latency=1.0)
+
+    choices = [sizer.choose(product_count=9, concurrency=4, product_tokens=500) for _ in range(4)]
+
+    assert choices[0] == 3 and choices[2] == 3
+    assert choices[1] in (2, 4) and choices[3] in (2, 4)
+
+
+def test_token_limits_cap_chunk_size():
+    sizer = AdaptiveChunkSizer(initial_size=6, max_prompt_tokens=10000, max_output_tokens=2000, min_samples=1)
+
+    assert sizer.choose(product_count=9, concurrency=4, product_tokens=4000) == 2
+
+    record_many(sizer, 1, 1, latency=1.0, output_tokens=800)
+    assert sizer.choose(product_count=9, concurrency=4, product_tokens=100) == 2
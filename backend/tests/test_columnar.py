@@ -0,0 +1,54 @@
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.append(str(Path(__file__).resolve().parents[2]))
+
+pa = pytest.importorskip("pyarrow")
+
+from backend.app.db.columnar import ColumnarResult
+
+
+@pytest.fixture
+def result():
+    table = pa.table(
+        {
+            "query_id": [1, 0, 1],
+            "asin": ["B", "A", "C"],
+            "reviews": [
+                [{"review_content": "Loud and clear", "rating": 5}],
+                [],
+                [{"review_content": "Battery lasts", "rating": None}],
+            ],
+        }
+    )
+    return ColumnarResult(table)
+
+
+def test_iter_rows_zips_requested_columns(result):
+    rows = list(result.iter_rows(["asin", "missing", "reviews"]))
+
+    assert rows[0] == ("B", None, [{"review_content": "Loud and clear", "rating": 5}])
+    assert [row[0] for row in rows] == ["B", "A", "C"]
+    assert len(result) == 3
+
+
+def test_split_by_groups_rows_per_query(result):
+    groups = result.split_by("query_id", 3)
+
+    assert [group.column("asin") for group in groups] == [["A"], ["B", "C"], []]
+
+
+def test_list_column_decodes_structs_field_by_field(result):
+    reviews = result.list_column("reviews", ["rating", "review_content", "missing"])
+
+    assert reviews == [[(5, "Loud and clear", None)], [], [(None, "Battery lasts", None)]]
+    assert result.list_column("missing", ["rating"]) == [[], [], []]
+    assert result.list_column("reviews", ["missing"], {"missing": False}) == [[(False,)], [], [(False,)]]
+
+
+def test_iter_rows_decodes_nested_columns(result):
+    rows = list(result.take([2, 0]).iter_rows(["asin", "reviews"], nested={"reviews": {"review_content": ""}}))
+
+    assert rows == [("C", [("Battery lasts",)]), ("B", [("Loud and clear",)])]
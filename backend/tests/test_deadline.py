@@ -0,0 +1,55 @@
+import asyncio
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.append(str(Path(__file__).resolve().parents[2]))
+
+from backend.app.utils.deadline import (
+    DeadlineExceeded,
+    can_retry,
+    cap_timeout,
+    current_deadline,
+    deadline_scope,
+    remaining_time,
+)
+
+
+def test_no_deadline_leaves_timeouts_unchanged():
+    assert current_deadline() is None
+    assert remaining_time() is None
+    assert cap_timeout(30) == 30
+    assert can_retry(1000)
+
+
+def test_scope_caps_timeouts_and_restores_outer():
+    with deadline_scope(5):
+        assert cap_timeout(30) <= 5
+        assert cap_timeout(1) == 1
+        assert can_retry(1)
+        assert not can_retry(10)
+        # A looser inner budget cannot extend the outer one
+        with deadline_scope(60):
+            assert remaining_time() <= 5
+        with deadline_scope(None):
+            assert remaining_time() <= 5
+    assert current_deadline() is None
+
+
+def test_expired_deadline_raises():
+    with deadline_scope(0):
+        with pytest.raises(DeadlineExceeded):
+            cap_timeout(30)
+        assert not can_retry(0)
+
+
+@pytest.mark.asyncio
+async def test_deadline_propagates_into_tasks():
+    async def child():
+        return remaining_time()
+
+    with deadline_scope(2):
+        remaining = await asyncio.ensure_future(child())
+
+    assert remaining is not None and 0 < remaining <= 2
@@ -0,0 +1,139 @@
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.append(str(Path(__file__).resolve().parents[2]))
+
+from backend.app.core.embedding_cache import EmbeddingCache, SQLiteEmbeddingStore
+from backend.app.utils.lru_cache import LRUCache
+
+
+class CountingEmbedder:
+    def __init__(self):
+        self.calls = []
+
+    async def __call__(self, text: str):
+        self.calls.append(text)
+        return [float(len(text)), 0.5, -0.25]
+
+
+@pytest.mark.asyncio
+async def test_memory_tier_hits_on_normalized_query():
+    embedder = CountingEmbedder()
+    cache = EmbeddingCache(max_entries=10)
+
+    first = await cache.get_or_compute("Dry  Skin Moisturizer", "text-embedding-005", embedder)
+    second = await cache.get_or_compute("dry skin moisturizer ", "text-embedding-005", embedder)
+
+    assert first == second
+    assert embedder.calls == ["dry skin moisturizer"]
+    stats = cache.stats()
+    assert stats["memory_hits"] == 1
+    assert stats["misses"] == 1
+
+
+@pytest.mark.asyncio
+async def test_model_name_is_part_of_key():
+    embedder = CountingEmbedder()
+    cache = EmbeddingCache(max_entries=10)
+
+    await cache.get_or_compute("earbuds", "text-embedding-005", embedder)
+    await cache.get_or_compute("earbuds", "text-embedding-004", embedder)
+
+    assert len(embedder.calls) == 2
+
+
+@pytest.mark.asyncio
+async def test_disk_tier_survives_new_memory_tier(tmp_path):
+    path = str(tmp_path / "embeddings.sqlite")
+    embedder = CountingEmbedder()
+
+    warm = EmbeddingCache(disk_store=SQLiteEmbeddingStore(path))
+    await warm.get_or_compute("earbuds", "text-embedding-005", embedder)
+
+    cold = EmbeddingCache(disk_store=SQLiteEmbeddingStore(path))
+    vector = await cold.get_or_compute("earbuds", "text-embedding-005", embedder)
+
+    assert vector == [7.0, 0.5, -0.25]
+    assert len(embedder.calls) == 1
+    assert cold.stats()["disk_hits"] == 1
+
+
+def test_lru_cache_evicts_and_expires():
+    now = [0.0]
+    cache = LRUCache(max_entries=2, ttl_seconds=10, clock=lambda: now[0])
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+
+    now[0] = 11.0
+    assert cache.get("a") is None
+    assert cache.get("c") is None
+
+
+@pytest.mark.asyncio
+async def test_batch_lookup_embeds_only_misses_in_one_call(tmp_path):
+    calls = []
+
+    async def embed_many(texts):
+        calls.append(list(texts))
+        return [[float(len(text)), 1.0] for text in texts]
+
+    cache = EmbeddingCache(max_entries=10, disk_store=SQLiteEmbeddingStore(str(tmp_path / "e.sqlite")))
+    await cache.get_or_compute("earbuds", "text-embedding-005", CountingEmbedder())
+
+    vectors = await cache.get_or_compute_many(
+        ["Earbuds", "sunscreen", "SUNSCREEN ", "lip balm"], "text-embedding-005", embed_many
+    )
+
+    assert calls == [["sunscreen", "lip balm"]]
+    assert vectors[0] == [7.0, 0.5, -0.25]
+    assert vectors[1] == vectors[2] == [9.0, 1.0]
+    assert vectors[3] == [8.0, 1.0]
+    assert cache.stats()["misses"] == 3
+
+
+def test_disk_tier_drops_expired_and_least_recently_used_rows(tmp_path, monkeypatch):
+    from backend.app.core import embedding_cache
+
+    now = [1000.0]
+    monkeypatch.setattr(embedding_cache.time, "time", lambda: now[0])
+    store = SQLiteEmbeddingStore(str(tmp_path / "e.sqlite"), ttl_seconds=100, max_entries=2)
+    store.set("a", "m", [1.0])
+    now[0] += 1
+    store.set("b", "m", [2.0])
+    now[0] += 1
+    assert store.get("a") == [1.0]
+    store.set("c", "m", [3.0])
+
+    assert len(store) == 2
+    assert store.get("b") is None
+    now[0] += 100
+    assert store.get("c") is None
+    assert len(store) == 1
+
+
+@pytest.mark.asyncio
+async def test_metrics_report_embedding_cache_counters(monkeypatch):
+    from backend.app.api import metrics_endpoints
+
+    cache = EmbeddingCache(max_entries=10)
+    await cache.get_or_compute("earbuds", "text-embedding-005", CountingEmbedder())
+    await cache.get_or_compute("earbuds", "text-embedding-005", CountingEmbedder())
+
+    class Engine:
+        def stats(self):
+            return {}
+
+    monkeypatch.setattr(metrics_endpoints, "get_embedding_cache", lambda: cache)
+    monkeypatch.setattr(metrics_endpoints, "get_search_engine", Engine)
+
+    metrics = await metrics_endpoints.metrics()
+
+    assert metrics["caches"]["embeddings"] == cache.stats()
+    assert metrics["caches"]["embeddings"]["memory_hits"] == 1
@@ -0,0 +1,71 @@
+import sys
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+sys.path.append(str(Path(__file__).resolve().parents[2]))
+
+from backend.app.core.embedding_store import EmbeddingStore, write_embedding_store
+from backend.app.core.local_index import LocalRetriever, VectorIndex
+
+
+@pytest.fixture
+def vectors():
+    return np.random.default_rng(7).normal(size=(300, 32)).astype(np.float32)
+
+
+@pytest.mark.parametrize("dtype", ["int8", "float16"])
+def test_store_search_matches_exact_index(tmp_path, vectors, dtype):
+    ids = [f"ASIN-{i % 50}" for i in range(len(vectors))]
+    path = str(tmp_path / f"reviews.{dtype}.emb")
+    write_embedding_store(path, ids, vectors, dtype=dtype)
+
+    store = EmbeddingStore.open(path)
+    query = vectors[11] + 0.01
+    store_rows, store_distances = store.search(query, top_k=5)
+    exact_rows, exact_distances = VectorIndex(vectors).search(query, top_k=5)
+
+    assert isinstance(store.vectors, np.memmap)
+    assert store_rows.tolist() == exact_rows.tolist()
+    assert np.allclose(store_distances, exact_distances, atol=1e-2)
+
+
+def test_store_keeps_row_order_and_groups_by_id(tmp_path, vectors):
+    ids = [f"ASIN-{i % 3}" for i in range(9)]
+    path = str(tmp_path / "reviews.emb")
+    write_embedding_store(path, ids, vectors[:9])
+
+    store = EmbeddingStore.open(path)
+
+    assert store.ids() == ids
+    assert store.group_rows("ASIN-1").tolist() == [1, 4, 7]
+    assert store.group_rows("missing").size == 0
+    rows, _ = store.search(vectors[4], top_k=1, rows=store.group_rows("ASIN-1"))
+    assert rows.tolist() == [4]
+
+
+def test_local_retriever_accepts_store(tmp_path):
+    products = {
+        "asin": ["P1", "P2"],
+        "product_title": ["Moisturizer", "Earbuds"],
+        "cleaned_item_description": ["Hydrating cream", "Wireless audio"],
+        "product_categories": ["Beauty", "Electronics"],
+    }
+    product_vectors = np.array([[1.0, 0.0], [0.0, 1.0]])
+    reviews = {
+        "asin": ["P1"],
+        "user_id": ["u1"],
+        "rating": [5],
+        "content": ["Keeps my skin soft all day"],
+        "review_timestamp": [1],
+        "verified_purchase": [True],
+    }
+    path = str(tmp_path / "reviews.emb")
+    write_embedding_store(path, reviews["asin"], np.array([[1.0, 0.1]]))
+
+    retriever = LocalRetriever(products, product_vectors, reviews, EmbeddingStore.open(path))
+    rows = retriever.search([1.0, 0.0], products_k=2, reviews_per_product=1)
+
+    p1 = next(row for row in rows if row["asin"] == "P1")
+    assert p1["reviews"][0]["user_id"] == "u1"
@@ -0,0 +1,107 @@
+import asyncio
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.append(str(Path(__file__).resolve().parents[2]))
+
+from backend.app.utils.hedging import Hedger
+
+
+class ScriptedCalls:
+    """Each call sleeps for the next scripted delay, then returns its call number."""
+
+    def __init__(self, delays):
+        self.delays = list(delays)
+        self.started = 0
+        self.cancelled = 0
+
+    async def __call__(self):
+        self.started += 1
+        number = self.started
+        try:
+            await asyncio.sleep(self.delays.pop(0))
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        return number
+
+
+async def warm_up(hedger, key, count, delay=0.0):
+    for _ in range(count):
+        await hedger.run(key, ScriptedCalls([delay]))
+
+
+@pytest.mark.asyncio
+async def test_no_hedging_until_enough_samples():
+    hedger = Hedger(min_samples=3, max_hedge_rate=1.0)
+    calls = ScriptedCalls([0.05])
+
+    assert await hedger.run("k", calls) == 1
+    assert calls.started == 1
+    assert hedger.hedge_delay("k") is None
+
+
+@pytest.mark.asyncio
+async def test_slow_call_is_hedged_and_loser_cancelled():
+    hedger = Hedger(min_samples=3, max_hedge_rate=1.0)
+    await warm_up(hedger, "k", 3, delay=0.01)
+    calls = ScriptedCalls([1.0, 0.0])
+
+    result = await hedger.run("k", calls)
+
+    assert result == 2
+    assert calls.cancelled == 1
+    stats = hedger.stats()
+    assert stats["hedged"] == 1 and stats["hedge_wins"] == 1
+
+
+@pytest.mark.asyncio
+async def test_hedge_rate_cap_limits_duplicates():
+    hedger = Hedger(min_samples=3, max_hedge_rate=0.25)
+    await warm_up(hedger, "k", 3)
+
+    first = ScriptedCalls([0.05, 0.0])
+    await hedger.run("k", first)
+    second = ScriptedCalls([0.05, 0.0])
+    await hedger.run("k", second)
+
+    # 1 of 4 recent calls may be hedged; the next would exceed the cap
+    assert first.started == 2
+    assert second.started == 1
+    assert hedger.stats()["rate_limited"] == 1
+
+
+@pytest.mark.asyncio
+async def test_failed_attempt_falls_back_to_the_other():
+    hedger = Hedger(min_samples=1, max_hedge_rate=1.0)
+    await warm_up(hedger, "k", 1)
+    attempts = []
+
+    async def flaky():
+        attempts.append(1)
+        if len(attempts) == 1:
+            await asyncio.sleep(0.02)
+            raise RuntimeError("upstream error")
+        await asyncio.sleep(0.05)
+        return "ok"
+
+    assert await hedger.run("k", flaky) == "ok"
+
+    async def broken():
+        await asyncio.sleep(0.01)
+        raise RuntimeError("down")
+
+    with pytest.raises(RuntimeError):
+        await hedger.run("k", broken)
+
+
+def test_hedge_delay_uses_percentile_per_key():
+    hedger = Hedger(percentile=0.9, min_samples=10)
+    for latency in range(1, 11):
+        hedger.record(3, latency / 10)
+    hedger.record(1, 5.0)
+
+    assert hedger.hedge_delay(3) == pytest.approx(0.9)
+    assert hedger.hedge_delay(1) is None
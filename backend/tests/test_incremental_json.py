@@ -0,0 +1,37 @@
+import json
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[2]))
+
+from backend.app.utils.incremental_json import IncrementalArrayParser
+
+
+def test_emits_each_result_object_as_it_closes():
+    document = json.dumps(
+        {
+            "results": [
+                {"asin": "A", "notes": "uses {braces} and \"quotes\" [1]"},
+                {"asin": "B", "nested": {"list": [1, 2, {"x": "}"}]}},
+            ],
+            "extra": [{"asin": "ignored"}],
+        }
+    )
+    parser = IncrementalArrayParser("results")
+
+    emitted = []
+    for start in range(0, len(document), 7):
+        emitted.extend(parser.feed(document[start:start + 7]))
+
+    assert [json.loads(item)["asin"] for item in emitted] == ["A", "B"]
+    assert json.loads(emitted[0])["notes"] == 'uses {braces} and "quotes" [1]'
+    assert parser.array_closed
+    assert parser.text == document
+
+
+def test_skips_code_fence_and_waits_for_closing_brace():
+    parser = IncrementalArrayParser("results")
+
+    assert parser.feed('```json\n{"results": [{"asin": "A", "best_for"') == []
+    assert parser.feed(': "runners"}, {"asin": ') == ['{"asin": "A", "best_for": "runners"}']
+    assert parser.feed('"B"}]}\n```') == ['{"asin": "B"}']
@@ -0,0 +1,26 @@
+import json
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[2]))
+
+from backend.app.utils.json_repair import remove_trailing_commas, salvage_array_items
+
+
+def test_remove_trailing_commas_outside_strings():
+    text = '{"a": [1, 2, ], "b": "x, ]", "c": {"d": 1,\n },}'
+
+    assert json.loads(remove_trailing_commas(text)) == {"a": [1, 2], "b": "x, ]", "c": {"d": 1}}
+
+
+def test_salvage_fenced_truncated_output():
+    text = '```json\n{"results": [{"asin": "A", "tags": ["x",],}, {"asin": "B", "best_for": "unfinished'
+
+    items = salvage_array_items(text)
+
+    assert [json.loads(item) for item in items] == [{"asin": "A", "tags": ["x"]}]
+
+
+def test_salvage_returns_nothing_without_results_array():
+    assert salvage_array_items("not json") == []
+    assert salvage_array_items('{"other": [{"asin": "A"}]}') == []
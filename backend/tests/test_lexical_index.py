@@ -0,0 +1,160 @@
+import sys
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+sys.path.append(str(Path(__file__).resolve().parents[2]))
+
+from backend.app.core.lexical_index import (
+    LexicalIndex,
+    LexicalIndexBuilder,
+    decode_varints,
+    encode_varints,
+    iter_parquet_documents,
+    main,
+    reciprocal_rank_fusion,
+    tokenize,
+)
+from backend.app.core.local_index import LocalRetriever
+
+DOCUMENTS = {
+    "B000SONY01": "Sony WH-1000XM4 Wireless Noise Cancelling Headphones Electronics",
+    "B000SONY02": "Sony WH-1000XM5 Wireless Headphones Electronics",
+    "B000BOSE01": "Bose QuietComfort Earbuds noise cancelling Electronics",
+    "B000CREAM1": "Hydrating face cream with hyaluronic acid Beauty",
+}
+
+
+@pytest.fixture
+def index():
+    builder = LexicalIndexBuilder()
+    builder.add_many(DOCUMENTS.keys(), DOCUMENTS.values())
+    return builder.build()
+
+
+def test_tokenize_splits_and_joins_model_numbers():
+    assert tokenize("Sony WH-1000XM4!") == ["sony", "wh", "1000xm4", "wh1000xm4"]
+    assert tokenize("") == []
+
+
+def test_varints_round_trip():
+    values = np.array([0, 1, 127, 128, 300, 2**21, 2**35 + 7])
+
+    encoded = encode_varints(values)
+
+    assert encoded.size == 1 + 1 + 1 + 2 + 2 + 4 + 6
+    np.testing.assert_array_equal(decode_varints(encoded), values)
+
+
+def test_postings_decode_to_rows_and_frequencies(index):
+    rows, freqs = index.postings_for("electronics")
+
+    assert [index.asins[row] for row in rows] == ["B000SONY01", "B000SONY02", "B000BOSE01"]
+    assert freqs.tolist() == [1, 1, 1]
+    assert index.postings_for("missing")[0].size == 0
+
+
+def test_bm25_ranks_rarer_and_more_frequent_terms_higher(index):
+    results = index.search("noise cancelling sony", top_k=3)
+
+    assert [asin for asin, _ in results] == ["B000SONY01", "B000BOSE01", "B000SONY02"]
+    assert results[0][1] > results[1][1] > results[2][1] > 0
+    assert [asin for asin, _ in index.search("cream", top_k=5)] == ["B000CREAM1"]
+    assert index.search("tripod", top_k=5) == []
+
+
+def test_exact_matches_for_asins_and_model_numbers(index):
+    assert index.exact_matches("b000bose01", max_hits=5) == ["B000BOSE01"]
+    assert index.exact_matches("WH-1000XM5", max_hits=5) == ["B000SONY02"]
+    assert index.exact_matches("sony wh1000xm4", max_hits=5) == ["B000SONY01"]
+    # Plain words and identifiers matching too many products use full retrieval
+    assert index.exact_matches("wireless headphones", max_hits=5) == []
+    assert index.exact_matches("xm9", max_hits=5) == []
+
+
+def test_builder_appends_to_an_existing_index(index):
+    builder = LexicalIndexBuilder.from_index(index)
+
+    assert not builder.add("B000SONY01", "duplicate rows are skipped")
+    assert builder.add("B000TRIPOD", "Aluminium camera tripod")
+    extended = builder.build()
+
+    assert len(extended) == 5
+    assert [asin for asin, _ in extended.search("tripod", 5)] == ["B000TRIPOD"]
+    assert [asin for asin, _ in extended.search("sony", 5)] == [asin for asin, _ in index.search("sony", 5)]
+    np.testing.assert_allclose(extended.scores("cream")[:4] > 0, index.scores("cream") > 0)
+
+
+def test_index_round_trips_through_npz(tmp_path, index):
+    path = str(tmp_path / "lexical.npz")
+    index.save(path)
+
+    loaded = LexicalIndex.load(path)
+
+    assert loaded.asins == index.asins
+    assert loaded.search("noise cancelling", 2) == pytest.approx(index.search("noise cancelling", 2))
+
+
+def test_build_from_parquet_batches(tmp_path):
+    pa = pytest.importorskip("pyarrow")
+    pq = pytest.importorskip("pyarrow.parquet")
+    path = tmp_path / "etl.parquet"
+    pq.write_table(
+        pa.table(
+            {
+                "asin": ["P1", "P1", "P2"],
+                "product_title": ["Moisturizer", "Moisturizer", "Earbuds"],
+                "cleaned_item_description": ["Hydrating cream", "Hydrating cream", None],
+                "rating": [5, 4, 3],
+            }
+        ),
+        path,
+    )
+
+    assert list(iter_parquet_documents([str(path)])) == [
+        (["P1", "P1", "P2"], ["Moisturizer Hydrating cream", "Moisturizer Hydrating cream", "Earbuds "])
+    ]
+
+    output = str(tmp_path / "lexical.npz")
+    main([str(tmp_path), output])
+    index = LexicalIndex.load(output)
+
+    assert index.asins == ["P1", "P2"]
+    assert [asin for asin, _ in index.search("earbuds", 5)] == ["P2"]
+
+
+def test_reciprocal_rank_fusion():
+    fused = reciprocal_rank_fusion([["a", "b", "c"], ["c", "d", "a"]], k=60)
+
+    assert fused == ["a", "c", "b", "d"]
+    assert reciprocal_rank_fusion([["x", "y"], []]) == ["x", "y"]
+
+
+def test_retriever_looks_up_products_by_asin():
+    products = {
+        "asin": ["P1", "P2"],
+        "product_title": ["Moisturizer", "Earbuds"],
+        "cleaned_item_description": ["Hydrating cream", "Wireless audio"],
+        "product_categories": ["Beauty", "Electronics"],
+    }
+    reviews = {
+        "asin": ["P1", "P1", "P1", "P2"],
+        "user_id": ["u1", "u2", "u3", "u4"],
+        "rating": [None, 3, 5, 4],
+        "content": ["Smells like roses", "Fine, a bit greasy", "Keeps my skin soft all day", "Great sound quality"],
+        "review_timestamp": [3, 1, 2, 4],
+        "verified_purchase": [True, False, True, True],
+    }
+    retriever = LocalRetriever(
+        products, np.array([[1.0, 0.0], [0.0, 1.0]]), reviews, np.array([[1.0, 0.0]] * 4)
+    )
+
+    rows = retriever.lookup(["P2", "missing", "P1"], reviews_per_product=2)
+
+    assert [row["asin"] for row in rows] == ["P2", "P1"]
+    p1 = rows[1]
+    assert [r["user_id"] for r in p1["reviews"]] == ["u3", "u2"]
+    assert p1["product_similarity"] is None and p1["combined_score"] is None
+    assert p1["avg_rating"] == pytest.approx(4.0)
+    assert p1["rating_count"] == 2
@@ -0,0 +1,193 @@
+import sys
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+sys.path.append(str(Path(__file__).resolve().parents[2]))
+
+from backend.app.core.embedding_store import EmbeddingStore, write_embedding_store
+from backend.app.core.local_index import LocalRetriever, VectorIndex
+from backend.app.schemas.search import SearchFilters
+
+
+@pytest.fixture
+def catalog():
+    products = {
+        "asin": ["P1", "P2", "P3"],
+        "product_title": ["Moisturizer", "Earbuds", "Sunscreen"],
+        "cleaned_item_description": ["Hydrating cream", "Wireless audio", "SPF 50"],
+        "product_categories": ["Beauty", "Electronics", "Beauty"],
+    }
+    product_embeddings = np.array([[1.0, 0.0, 0.0], [0.0, 1.0, 0.0], [0.8, 0.0, 0.6]])
+    reviews = {
+        "asin": ["P1", "P1", "P3", "P2"],
+        "user_id": ["u1", "u2", "u3", "u4"],
+        "rating": [5, None, 3, 4],
+        "content": ["Keeps my skin soft all day", "Nice texture, no smell", "Too greasy for me", "Great sound quality"],
+        "review_timestamp": [1, 2, 3, 4],
+        "verified_purchase": [True, False, True, True],
+    }
+    review_embeddings = np.array([[0.9, 0.1, 0.0], [1.0, 0.0, 0.1], [0.7, 0.0, 0.7], [0.0, 1.0, 0.0]])
+    return products, product_embeddings, reviews, review_embeddings
+
+
+def test_exact_index_returns_nearest_rows():
+    index = VectorIndex(np.array([[1.0, 0.0], [0.0, 1.0], [0.7, 0.7]]))
+    rows, distances = index.search([1.0, 0.1], top_k=2)
+
+    assert rows.tolist() == [0, 2]
+    assert distances[0] < distances[1]
+
+
+def test_ivf_index_matches_exact_when_probing_all_lists():
+    rng = np.random.default_rng(1)
+    vectors = rng.normal(size=(500, 16))
+    query = rng.normal(size=16)
+
+    exact_rows, _ = VectorIndex(vectors).search(query, top_k=10)
+    ivf_rows, _ = VectorIndex(vectors, mode="ivf", nlist=8, nprobe=8).search(query, top_k=10)
+
+    assert ivf_rows.tolist() == exact_rows.tolist()
+
+
+def test_local_retriever_reproduces_bigquery_scoring(catalog):
+    retriever = LocalRetriever(*catalog)
+    rows = retriever.search([1.0, 0.0, 0.0], products_k=3, reviews_per_product=2)
+
+    by_asin = {row["asin"]: row for row in rows}
+    p1 = by_asin["P1"]
+    assert p1["avg_rating"] == 5
+    assert p1["rating_count"] == 1
+    assert [r["user_id"] for r in p1["reviews"]] == ["u1", "u2"]
+
+    review_distances = [r["review_similarity"] for r in p1["reviews"]]
+    expected = 0.7 * p1["product_similarity"] + 0.2 * np.mean(review_distances) + 0.1 * (5 / 5)
+    assert p1["combined_score"] == pytest.approx(expected)
+    assert [row["combined_score"] for row in rows] == sorted(
+        (row["combined_score"] for row in rows), reverse=True
+    )
+
+
+def test_local_retriever_loads_npz_exports(tmp_path, catalog):
+    products, product_embeddings, reviews, review_embeddings = catalog
+    products_path = tmp_path / "products.npz"
+    reviews_path = tmp_path / "reviews.npz"
+    np.savez(products_path, embedding=product_embeddings, **{k: np.array(v, dtype=object) for k, v in products.items()})
+    np.savez(reviews_path, embedding=review_embeddings, **{k: np.array(v, dtype=object) for k, v in reviews.items()})
+
+    retriever = LocalRetriever.from_files(str(products_path), str(reviews_path))
+    rows = retriever.search([0.0, 1.0, 0.0], products_k=1)
+
+    assert len(rows) == 1
+    assert {row["asin"] for row in rows} <= {"P1", "P2", "P3"}
+
+
+def test_two_stage_fills_reviews_the_global_search_misses():
+    # Every review of P2 is far from the query, so the global review search never reaches it
+    products = {
+        "asin": ["P1", "P2"],
+        "product_title": ["Moisturizer", "Night cream"],
+        "cleaned_item_description": ["", ""],
+        "product_categories": ["", ""],
+    }
+    product_embeddings = np.array([[1.0, 0.0], [0.9, 0.1]])
+    reviews = {
+        "asin": ["P1"] * 20 + ["P2", "P2"],
+        "user_id": [f"u{i}" for i in range(22)],
+        "rating": [5] * 22,
+        "content": ["Lovely moisturizing cream"] * 22,
+        "review_timestamp": list(range(22)),
+        "verified_purchase": [True] * 22,
+    }
+    review_embeddings = np.vstack([np.tile([1.0, 0.0], (20, 1)), [[0.0, 1.0], [0.1, 1.0]]])
+
+    global_rows = LocalRetriever(products, product_embeddings, reviews, review_embeddings).search(
+        [1.0, 0.0], products_k=2, reviews_per_product=1
+    )
+    two_stage_rows = LocalRetriever(
+        products, product_embeddings, reviews, review_embeddings, review_mode="two_stage"
+    ).search([1.0, 0.0], products_k=2, reviews_per_product=1)
+
+    assert {row["asin"]: len(row["reviews"]) for row in global_rows} == {"P1": 1, "P2": 0}
+    by_asin = {row["asin"]: row for row in two_stage_rows}
+    assert len(by_asin["P1"]["reviews"]) == 1
+    assert [r["user_id"] for r in by_asin["P2"]["reviews"]] == ["u21"]
+
+
+def test_two_stage_matches_global_when_all_reviews_are_reached(catalog):
+    global_rows = LocalRetriever(*catalog).search([1.0, 0.0, 0.0], products_k=3, reviews_per_product=2)
+    two_stage_rows = LocalRetriever(*catalog, review_mode="two_stage").search(
+        [1.0, 0.0, 0.0], products_k=3, reviews_per_product=2
+    )
+
+    assert [row["asin"] for row in two_stage_rows] == [row["asin"] for row in global_rows]
+    for left, right in zip(global_rows, two_stage_rows):
+        assert [r["user_id"] for r in left["reviews"]] == [r["user_id"] for r in right["reviews"]]
+        assert left["combined_score"] == pytest.approx(right["combined_score"])
+
+
+def test_two_stage_uses_store_groups(tmp_path, catalog):
+    products, product_embeddings, reviews, review_embeddings = catalog
+    path = tmp_path / "reviews.emb"
+    write_embedding_store(str(path), reviews["asin"], review_embeddings, dtype="float16")
+
+    retriever = LocalRetriever(
+        products, product_embeddings, reviews, EmbeddingStore.open(str(path)), review_mode="two_stage"
+    )
+    rows = retriever.search([1.0, 0.0, 0.0], products_k=3, reviews_per_product=2)
+
+    by_asin = {row["asin"]: row for row in rows}
+    assert sorted(r["user_id"] for r in by_asin["P1"]["reviews"]) == ["u1", "u2"]
+    assert [r["user_id"] for r in by_asin["P2"]["reviews"]] == ["u4"]
+
+
+def test_unknown_review_mode_is_rejected(catalog):
+    with pytest.raises(ValueError):
+        LocalRetriever(*catalog, review_mode="per_review")
+
+
+@pytest.fixture
+def filtered_catalog():
+    # Ten cheap, unrated products sit closest to the query; the one matching product is far
+    count = 11
+    products = {
+        "asin": [f"P{i}" for i in range(count)],
+        "product_title": [f"Product {i}" for i in range(count)],
+        "cleaned_item_description": [""] * count,
+        "product_categories": [""] * count,
+        "main_category": ["All Beauty"] * 10 + ["Software"],
+        "average_rating": [None] * 10 + [4.6],
+        "price": [5.0] * 10 + [49.99],
+    }
+    product_embeddings = np.vstack([np.tile([1.0, 0.05], (10, 1)), [[0.0, 1.0]]])
+    reviews = {name: [] for name in ("asin", "user_id", "rating", "content", "review_timestamp", "verified_purchase")}
+    return products, product_embeddings, reviews, np.empty((0, 2))
+
+
+def test_filters_are_applied_before_the_vector_ranking(filtered_catalog):
+    retriever = LocalRetriever(*filtered_catalog)
+
+    unfiltered = retriever.search([1.0, 0.0], products_k=1)
+    by_category = retriever.search([1.0, 0.0], products_k=1, filters=SearchFilters(category="Software"))
+    by_rating = retriever.search([1.0, 0.0], products_k=1, filters=SearchFilters(min_rating=4.5))
+    by_price = retriever.search([1.0, 0.0], products_k=1, filters=SearchFilters(min_price=20, max_price=50))
+
+    assert unfiltered[0]["asin"] != "P10"
+    # products_k * 5 candidates would never reach P10 without the prefilter
+    assert [row["asin"] for row in by_category] == ["P10"]
+    assert [row["asin"] for row in by_rating] == ["P10"]
+    assert [row["asin"] for row in by_price] == ["P10"]
+
+
+def test_filters_without_matches_return_nothing(filtered_catalog):
+    retriever = LocalRetriever(*filtered_catalog)
+
+    assert retriever.search([1.0, 0.0], filters=SearchFilters(category="Software", max_price=10)) == []
+    assert len(retriever.search([1.0, 0.0], products_k=3, filters=SearchFilters())) == 3
+
+
+def test_search_filters_validate_price_range():
+    with pytest.raises(ValueError):
+        SearchFilters(min_price=20, max_price=10)
+    assert SearchFilters(category="  ").is_empty()
@@ -0,0 +1,121 @@
+import json
+import re
+import sys
+import threading
+from pathlib import Path
+from typing import List
+
+import numpy as np
+import pytest
+from langchain_core.language_models import BaseLLM
+from langchain_core.outputs import Generation, LLMResult
+
+sys.path.append(str(Path(__file__).resolve().parents[2]))
+
+from backend.app.core.pregenerate import load_products, pregenerate
+from backend.app.core.pregenerated_store import PregeneratedAnalysisStore
+from backend.app.core.rag_pipeline import RAGPipeline
+
+
+class EchoLLM(BaseLLM):
+    """Returns a valid analysis for every ASIN in the prompt, except those in `fail`."""
+
+    calls: int = 0
+    fail: set = set()
+
+    def _respond(self, prompt: str) -> str:
+        asins = [a for a in re.findall(r"Product ASIN: (\S+)", prompt) if a not in self.fail]
+        return json.dumps(
+            {
+                "results": [
+                    {
+                        "asin": asin,
+                        "main_selling_points": ["Solid"],
+                        "best_for": f"Buyers of {asin}",
+                        "review_highlights": {"overall_sentiment": "positive", "positive": [], "negative": []},
+                    }
+                    for asin in asins
+                ]
+            }
+        )
+
+    def _generate(self, prompts: List[str], stop=None, run_manager=None, **kwargs) -> LLMResult:  # type: ignore[override]
+        self.calls += 1
+        return LLMResult(generations=[[Generation(text=self._respond(p))] for p in prompts])
+
+    @property
+    def _llm_type(self) -> str:
+        return "echo"
+
+
+@pytest.fixture
+def exports(tmp_path):
+    products_path = tmp_path / "products.npz"
+    np.savez(
+        products_path,
+        asin=np.array(["A", "B", "C"], dtype=object),
+        product_title=np.array(["Kettle", "Mug", "Teapot"], dtype=object),
+        cleaned_item_description=np.array(["Material: Steel.", "", ""], dtype=object),
+        product_categories=np.array(["Kitchen"] * 3, dtype=object),
+        embedding=np.zeros((3, 2), dtype=np.float32),
+    )
+    reviews_path = tmp_path / "reviews.npz"
+    np.savez(
+        reviews_path,
+        asin=np.array(["A", "A", "B"], dtype=object),
+        content=np.array(["Short.", "Boils fast and pours well.", "Chipped."], dtype=object),
+        rating=np.array([None, 5, 2], dtype=object),
+        verified_purchase=np.array([True, True, False], dtype=object),
+        user_id=np.array(["u1", "u2", "u3"], dtype=object),
+        review_timestamp=np.array([1, 2, 3], dtype=object),
+        embedding=np.zeros((3, 2), dtype=np.float32),
+    )
+    return str(products_path), str(reviews_path)
+
+
+def test_load_products_attaches_best_reviews(exports):
+    products = load_products(*exports, asins=["B", "A", "Z"], reviews_per_product=1)
+
+    assert [p["asin"] for p in products] == ["B", "A"]
+    assert [r["content"] for r in products[1]["reviews"]] == ["Boils fast and pours well."]
+
+
+@pytest.mark.asyncio
+async def test_pregenerate_resumes_and_serves_lookups(exports, tmp_path):
+    products = load_products(*exports)
+    llm = EchoLLM()
+    llm.fail = {"C"}
+    store = PregeneratedAnalysisStore(str(tmp_path / "analyses"), writable=True)
+
+    counts = await pregenerate(RAGPipeline(llm), store, products, batch_size=2)
+    assert counts == {"total": 3, "skipped": 0, "stored": 2, "failed": 1}
+
+    # A second run only retries the product whose analysis failed
+    llm.fail = set()
+    counts = await pregenerate(RAGPipeline(llm), store, products, batch_size=2)
+    assert counts == {"total": 3, "skipped": 2, "stored": 1, "failed": 0}
+    store.set_metadata("fake-model", "v1")
+    store.close()
+
+    reader = PregeneratedAnalysisStore(str(tmp_path / "analyses"))
+    assert reader.matches("fake-model", "v1") and not reader.matches("fake-model", "v2")
+    assert reader.get("A").best_for == "Buyers of A"
+    assert reader.get("Z") is None
+
+    calls_before = llm.calls
+    lookup_threads = []
+    get_many = reader.get_many
+
+    def recording_get_many(asins):
+        lookup_threads.append(threading.get_ident())
+        return get_many(asins)
+
+    reader.get_many = recording_get_many
+    pipeline = RAGPipeline(llm, pregenerated=reader)
+    analyses = await pipeline.generate_batch_explanations("any query", products)
+
+    assert [a.best_for for a in analyses] == ["Buyers of A", "Buyers of B", "Buyers of C"]
+    assert llm.calls == calls_before
+    assert reader.stats() == {"hits": 4, "misses": 1}
+    # The dbm lookup ran in a worker thread, not on the event loop
+    assert lookup_threads and threading.get_ident() not in lookup_threads
@@ -1,16 +1,27 @@
+import asyncio
 import json
+import re
 import sys
 from pathlib import Path
 from typing import List
 
 import pytest
 from langchain_core.language_models import BaseLLM
-from langchain_core.outputs import Generation, LLMResult
+from langchain_core.outputs import Generation, GenerationChunk, LLMResult
 
 sys.path.append(str(Path(__file__).resolve().parents[2]))
 
 from backend.app import config
-from backend.app.core.rag_pipeline import RAGPipeline
+from backend.app.core.analysis_cache import (
+    AnalysisCache,
+    MemoryAnalysisCacheBackend,
+    SQLiteAnalysisCacheBackend,
+)
+from backend.app.core.chunk_sizer import AdaptiveChunkSizer
+from backend.app.core.rag_pipeline import DEADLINE_WARNING, PROMPT_VERSION, RAGPipeline
+from backend.app.utils.deadline import deadline_scope
+from backend.app.utils.hedging import Hedger
+from backend.app.utils.single_flight import SingleFlight
 
 
 class FakeLLM(BaseLLM):
@@ -38,6 +49,62 @@ class FakeLLM(BaseLLM):
         return "fake"
 
 
+class SlowEchoLLM(BaseLLM):
+    """Answers every prompt with a valid analysis per ASIN and records concurrency."""
+
+    max_in_flight: int = 0
+    calls: int = 0
+
+    def __init__(self, delay: float = 0.05):
+        super().__init__()
+        self._delay = delay
+        self._in_flight = 0
+
+    @staticmethod
+    def _respond(prompt: str) -> str:
+        asins = re.findall(r"Product ASIN: (\S+)", prompt)
+        results = [
+            {
+                "asin": asin,
+                "main_selling_points": ["Solid"],
+                "best_for": f"Buyers of {asin}",
+                "review_highlights": {"overall_sentiment": "positive", "positive": [], "negative": []},
+            }
+            for asin in asins
+        ]
+        return json.dumps({"results": results})
+
+    def _generate(self, prompts: List[str], stop=None, **kwargs) -> LLMResult:  # type: ignore[override]
+        return LLMResult(generations=[[Generation(text=self._respond(p))] for p in prompts])
+
+    async def _agenerate(self, prompts: List[str], stop=None, **kwargs) -> LLMResult:  # type: ignore[override]
+        self.calls += 1
+        self._in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self._in_flight)
+        try:
+            await asyncio.sleep(self._delay)
+        finally:
+            self._in_flight -= 1
+        return LLMResult(generations=[[Generation(text=self._respond(p))] for p in prompts])
+
+    @property
+    def _llm_type(self) -> str:
+        return "slow-echo"
+
+
+def make_products(count: int):
+    return [
+        {
+            "asin": f"ASIN-{idx}",
+            "product_title": f"Widget {idx}",
+            "cleaned_item_description": "Material: Steel.",
+            "product_categories": "Widgets",
+            "reviews": [],
+        }
+        for idx in range(count)
+    ]
+
+
 @pytest.fixture
 def sample_products():
     return [
@@ -164,3 +231,347 @@ async def test_generate_batch_explanations_disabled(sample_products, batch_respo
 
     assert len(analyses) == 1
     assert analyses[0].asin == "ASIN-1"
+
+
+@pytest.mark.asyncio
+async def test_generate_batch_explanations_runs_chunks_concurrently():
+    llm = SlowEchoLLM()
+    pipeline = RAGPipeline(llm)
+    products = make_products(6)
+
+    analyses = await pipeline.generate_batch_explanations(
+        "widgets", products, chunk_size=2, max_concurrency=3
+    )
+
+    assert [analysis.asin for analysis in analyses] == [p["asin"] for p in products]
+    assert llm.calls == 3
+    assert llm.max_in_flight == 3
+
+
+@pytest.mark.asyncio
+async def test_generate_batch_explanations_respects_concurrency_limit():
+    llm = SlowEchoLLM()
+    pipeline = RAGPipeline(llm)
+    products = make_products(6)
+
+    analyses = await pipeline.generate_batch_explanations(
+        "widgets", products, chunk_size=1, max_concurrency=2
+    )
+
+    assert [analysis.best_for for analysis in analyses] == [f"Buyers of ASIN-{i}" for i in range(6)]
+    assert llm.max_in_flight == 2
+
+
+@pytest.mark.asyncio
+async def test_analysis_cache_skips_llm_for_cached_products():
+    llm = SlowEchoLLM(delay=0)
+    cache = AnalysisCache(MemoryAnalysisCacheBackend(), model_name="fake", prompt_version=PROMPT_VERSION)
+    pipeline = RAGPipeline(llm, analysis_cache=cache)
+
+    await pipeline.generate_batch_explanations("widgets", make_products(2), chunk_size=2)
+    assert llm.calls == 1
+
+    analyses = await pipeline.generate_batch_explanations("other query", make_products(3), chunk_size=2)
+
+    assert [analysis.asin for analysis in analyses] == ["ASIN-0", "ASIN-1", "ASIN-2"]
+    assert llm.calls == 2
+    assert cache.stats()["hits"] == 2
+
+
+@pytest.mark.asyncio
+async def test_analysis_cache_key_changes_with_reviews(tmp_path):
+    backend = SQLiteAnalysisCacheBackend(str(tmp_path / "analyses.sqlite"))
+    llm = SlowEchoLLM(delay=0)
+    pipeline = RAGPipeline(llm, analysis_cache=AnalysisCache(backend, "fake", PROMPT_VERSION))
+
+    products = make_products(1)
+    await pipeline.generate_batch_explanations("widgets", products)
+    products[0]["reviews"] = [{"content": "Sturdy", "rating": 5}]
+    await pipeline.generate_batch_explanations("widgets", products)
+    await pipeline.generate_batch_explanations("widgets", products)
+
+    assert llm.calls == 2
+
+
+@pytest.mark.asyncio
+async def test_analysis_cache_does_not_store_placeholders(sample_products):
+    cache = AnalysisCache(MemoryAnalysisCacheBackend(), model_name="fake", prompt_version=PROMPT_VERSION)
+    llm = FakeLLM(["bad"] * 4)
+    pipeline = RAGPipeline(llm, analysis_cache=cache)
+
+    analyses = await pipeline.generate_batch_explanations("widgets", sample_products, chunk_size=2)
+
+    assert RAGPipeline.is_placeholder(analyses[0])
+    assert cache.stats()["stores"] == 0
+
+
+@pytest.mark.asyncio
+async def test_stream_batch_explanations_yields_before_all_chunks_finish():
+    llm = SlowEchoLLM(delay=0.01)
+    pipeline = RAGPipeline(llm)
+    products = make_products(6)
+
+    seen = []
+    calls_at_first_yield = None
+    async for analysis in pipeline.stream_batch_explanations(
+        "widgets", products, chunk_size=2, max_concurrency=1
+    ):
+        if calls_at_first_yield is None:
+            calls_at_first_yield = llm.calls
+        seen.append(analysis.asin)
+
+    assert calls_at_first_yield == 1
+    assert sorted(seen) == sorted(p["asin"] for p in products)
+
+
+@pytest.mark.asyncio
+async def test_single_flight_coalesces_identical_generations():
+    llm = SlowEchoLLM(delay=0.01)
+    pipeline = RAGPipeline(llm, single_flight=SingleFlight("analyses"))
+    products = make_products(2)
+
+    results = await asyncio.gather(
+        *(pipeline.generate_batch_explanations("widgets", products, chunk_size=2) for _ in range(4))
+    )
+
+    assert llm.calls == 1
+    assert all([a.asin for a in result] == ["ASIN-0", "ASIN-1"] for result in results)
+    assert pipeline.single_flight.stats()["coalesced"] == 3
+
+
+@pytest.mark.asyncio
+async def test_coalesced_callers_keep_their_own_deadlines():
+    llm = SlowEchoLLM(delay=0.1)
+    pipeline = RAGPipeline(llm, single_flight=SingleFlight("analyses"))
+    products = make_products(2)
+
+    async def generate(budget):
+        with deadline_scope(budget):
+            return await pipeline.generate_batch_explanations("widgets", products, chunk_size=2)
+
+    short, unbounded = await asyncio.gather(generate(0.02), generate(None))
+
+    assert llm.calls == 1
+    assert [a.warnings for a in short] == [[DEADLINE_WARNING], [DEADLINE_WARNING]]
+    assert not any(RAGPipeline.is_placeholder(a) for a in unbounded)
+
+
+class StreamingEchoLLM(SlowEchoLLM):
+    """Streams the SlowEchoLLM response in small pieces with a delay between them."""
+
+    pieces_sent: int = 0
+
+    async def _astream(self, prompt, stop=None, run_manager=None, **kwargs):  # type: ignore[override]
+        self.calls += 1
+        text = self._respond(prompt)
+        for start in range(0, len(text), 16):
+            await asyncio.sleep(self._delay)
+            self.pieces_sent += 1
+            yield GenerationChunk(text=text[start:start + 16])
+
+
+@pytest.mark.asyncio
+async def test_streaming_yields_first_analysis_before_chunk_finishes():
+    llm = StreamingEchoLLM(delay=0.001)
+    pipeline = RAGPipeline(llm)
+    total_pieces = len(SlowEchoLLM._respond("Product ASIN: ASIN-0\nProduct ASIN: ASIN-1\nProduct ASIN: ASIN-2")) // 16
+
+    seen = []
+    pieces_at_first_yield = None
+    async for analysis in pipeline.stream_batch_explanations("widgets", make_products(3), chunk_size=3):
+        if pieces_at_first_yield is None:
+            pieces_at_first_yield = llm.pieces_sent
+        seen.append(analysis.asin)
+
+    assert llm.calls == 1
+    assert seen == ["ASIN-0", "ASIN-1", "ASIN-2"]
+    assert 0 < pieces_at_first_yield < total_pieces / 2
+
+
+class FlakyStreamLLM(StreamingEchoLLM):
+    """Streams like StreamingEchoLLM, but the first stream fails before yielding anything."""
+
+    stream_failures: int = 0
+    invokes: int = 0
+
+    async def _astream(self, prompt, stop=None, run_manager=None, **kwargs):  # type: ignore[override]
+        if not self.stream_failures:
+            self.stream_failures += 1
+            raise ConnectionError("upstream reset")
+        async for chunk in super()._astream(prompt, stop=stop, run_manager=run_manager, **kwargs):
+            yield chunk
+
+    async def _agenerate(self, prompts: List[str], stop=None, **kwargs) -> LLMResult:  # type: ignore[override]
+        self.invokes += 1
+        return await super()._agenerate(prompts, stop=stop, **kwargs)
+
+
+@pytest.mark.asyncio
+async def test_failed_stream_falls_back_to_a_non_streaming_call():
+    llm = FlakyStreamLLM(delay=0.001)
+    pipeline = RAGPipeline(llm)
+
+    analyses = await pipeline.generate_batch_explanations("widgets", make_products(2), chunk_size=2)
+
+    assert llm.stream_failures == 1 and llm.invokes == 1
+    assert [a.asin for a in analyses] == ["ASIN-0", "ASIN-1"]
+    assert not any(RAGPipeline.is_placeholder(a) for a in analyses)
+
+
+@pytest.mark.asyncio
+async def test_deadline_returns_partial_results_with_placeholders():
+    llm = SlowEchoLLM(delay=0.2)
+    pipeline = RAGPipeline(llm)
+    products = make_products(4)
+    products[3]["cleaned_item_description"] = "Material: Oak."
+
+    loop = asyncio.get_running_loop()
+    started = loop.time()
+    with deadline_scope(0.3):
+        analyses = await pipeline.generate_batch_explanations(
+            "widgets", products, chunk_size=2, max_concurrency=1
+        )
+    elapsed = loop.time() - started
+
+    assert elapsed < 0.39
+    assert [a.asin for a in analyses] == [p["asin"] for p in products]
+    assert [RAGPipeline.is_placeholder(a) for a in analyses] == [False, False, True, True]
+    assert analyses[3].warnings == [DEADLINE_WARNING]
+    assert analyses[3].key_specs[0].detail == "Oak"
+
+
+class SlowInvalidLLM(SlowEchoLLM):
+    """Takes `delay` seconds to return output that never parses."""
+
+    @staticmethod
+    def _respond(prompt: str) -> str:
+        return "not json"
+
+
+@pytest.mark.asyncio
+async def test_deadline_skips_retry_that_cannot_fit(sample_products):
+    llm = SlowInvalidLLM(delay=0.1)
+    pipeline = RAGPipeline(llm)
+    pipeline.streaming_enabled = False
+
+    with deadline_scope(0.15):
+        analyses = await pipeline.generate_batch_explanations("widgets", sample_products, chunk_size=2)
+
+    # The parse retry would take as long as the first attempt, so neither it nor the
+    # per-product fallback runs
+    assert llm.calls == 1
+    assert all(a.warnings == [DEADLINE_WARNING] for a in analyses)
+
+
+class FirstCallSlowLLM(SlowEchoLLM):
+    """Stalls on the `slow_call`-th request only."""
+
+    slow_call: int = 0
+
+    async def _agenerate(self, prompts: List[str], stop=None, **kwargs) -> LLMResult:  # type: ignore[override]
+        self.calls += 1
+        await asyncio.sleep(5 if self.calls == self.slow_call else 0)
+        return LLMResult(generations=[[Generation(text=self._respond(p))] for p in prompts])
+
+
+@pytest.mark.asyncio
+async def test_hedger_races_slow_llm_call():
+    llm = FirstCallSlowLLM()
+    llm.slow_call = 3
+    pipeline = RAGPipeline(llm, hedger=Hedger(min_samples=2, max_hedge_rate=1.0))
+    pipeline.streaming_enabled = False
+
+    for _ in range(2):
+        await pipeline.generate_batch_explanations("widgets", make_products(2), chunk_size=2)
+    loop = asyncio.get_running_loop()
+    started = loop.time()
+    analyses = await pipeline.generate_batch_explanations("widgets", make_products(2), chunk_size=2)
+
+    assert loop.time() - started < 1
+    assert [a.best_for for a in analyses] == ["Buyers of ASIN-0", "Buyers of ASIN-1"]
+    assert llm.calls == 4
+    assert pipeline.hedger.stats()["hedge_wins"] == 1
+
+
+@pytest.mark.asyncio
+async def test_chunk_sizer_chooses_chunks_and_records_outcomes():
+    llm = SlowEchoLLM(delay=0)
+    sizer = AdaptiveChunkSizer(initial_size=3, fixed_size=2)
+    pipeline = RAGPipeline(llm, chunk_sizer=sizer)
+    pipeline.streaming_enabled = False
+
+    analyses = await pipeline.generate_batch_explanations("widgets", make_products(4))
+    assert [a.asin for a in analyses] == [f"ASIN-{i}" for i in range(4)]
+    assert llm.calls == 2
+    assert sizer.stats()[2]["samples"] == 2
+    assert sizer.stats()[2]["parse_failure_rate"] == 0
+
+    # An explicit chunk size still wins over the sizer
+    await pipeline.generate_batch_explanations("widgets", make_products(4), chunk_size=4)
+    assert llm.calls == 3
+
+
+class RecordingFakeLLM(FakeLLM):
+    """FakeLLM that also keeps the ASINs named in each prompt."""
+
+    def __init__(self, responses: List[str]):
+        super().__init__(responses)
+        self._prompt_asins: List[List[str]] = []
+
+    async def _agenerate(self, prompts: List[str], stop=None, **kwargs) -> LLMResult:  # type: ignore[override]
+        self._prompt_asins.extend(re.findall(r"Product ASIN: (\S+)", p) for p in prompts)
+        return await super()._agenerate(prompts, stop=stop, **kwargs)
+
+
+def analysis_json(asin: str) -> str:
+    return SlowEchoLLM._respond(f"Product ASIN: {asin}")[len('{"results": ['):-2]
+
+
+@pytest.mark.asyncio
+async def test_truncated_batch_output_regenerates_only_missing_products():
+    truncated = '```json\n{"results": [' + analysis_json("ASIN-0") + ', {"asin": "ASIN-1", "best_for": "Bu'
+    llm = RecordingFakeLLM([truncated, SlowEchoLLM._respond("Product ASIN: ASIN-1")])
+    pipeline = RAGPipeline(llm)
+    pipeline.streaming_enabled = False
+
+    analyses = await pipeline.generate_batch_explanations("widgets", make_products(2), chunk_size=2)
+
+    assert [a.best_for for a in analyses] == ["Buyers of ASIN-0", "Buyers of ASIN-1"]
+    assert llm._prompt_asins == [["ASIN-0", "ASIN-1"], ["ASIN-1"]]
+
+
+@pytest.mark.asyncio
+async def test_malformed_batch_output_keeps_valid_items():
+    items = [analysis_json(f"ASIN-{i}") for i in range(3)]
+    # Trailing commas and one invalid item: the valid ones are kept as they are
+    items[2] = '{"asin": "ASIN-2", "best_for": 7}'
+    malformed = '{"results": [' + ", ".join(item[:-1] + ",}" for item in items[:2]) + ", " + items[2] + ",]}"
+    llm = RecordingFakeLLM([malformed, SlowEchoLLM._respond("Product ASIN: ASIN-2")])
+    pipeline = RAGPipeline(llm)
+    pipeline.streaming_enabled = False
+
+    analyses = await pipeline.generate_batch_explanations("widgets", make_products(3), chunk_size=3)
+
+    assert [a.best_for for a in analyses] == [f"Buyers of ASIN-{i}" for i in range(3)]
+    assert llm._prompt_asins == [["ASIN-0", "ASIN-1", "ASIN-2"], ["ASIN-2"]]
+
+
+@pytest.mark.asyncio
+async def test_review_selection_shrinks_prompt_and_reports_savings():
+    llm = RecordingFakeLLM([SlowEchoLLM._respond("Product ASIN: ASIN-0")])
+    pipeline = RAGPipeline(llm)
+    pipeline.streaming_enabled = False
+    products = make_products(1)
+    duplicate = "The widget feels sturdy and the steel finish resists scratches after months of use."
+    products[0]["reviews"] = [
+        {"content": duplicate, "rating": 5, "similarity": 0.9},
+        {"content": duplicate + " ", "rating": 5, "similarity": 0.8},
+    ]
+
+    analyses = await pipeline.generate_batch_explanations("sturdy widget", products)
+
+    assert analyses[0].best_for == "Buyers of ASIN-0"
+    assert pipeline.selection_report.duplicates_dropped == 1
+    assert pipeline.selection_report.tokens_saved > 0
+    # The caller's products are left untouched
+    assert len(products[0]["reviews"]) == 2
@@ -0,0 +1,89 @@
+import asyncio
+import sys
+import threading
+from pathlib import Path
+
+import pytest
+
+sys.path.append(str(Path(__file__).resolve().parents[2]))
+
+from backend.app.utils.deadline import DeadlineExceeded, deadline_scope
+from backend.app.utils.resource_pools import UpstreamPool
+
+
+@pytest.mark.asyncio
+async def test_pool_caps_in_flight_calls_and_reports_queue_depth():
+    pool = UpstreamPool("test", max_workers=4, max_concurrency=2)
+    release = threading.Event()
+    peak = 0
+
+    def blocking_call():
+        nonlocal peak
+        peak = max(peak, pool.in_flight)
+        release.wait(timeout=5)
+        return threading.current_thread().name
+
+    tasks = [asyncio.create_task(pool.run(blocking_call)) for _ in range(5)]
+    await asyncio.sleep(0.05)
+
+    assert pool.stats()["in_flight"] == 2
+    assert pool.stats()["queue_depth"] == 3
+
+    release.set()
+    names = await asyncio.gather(*tasks)
+
+    assert peak == 2
+    assert all(name.startswith("test") for name in names)
+    stats = pool.stats()
+    assert stats["acquired"] == 5
+    assert stats["queue_depth"] == 0
+    assert stats["wait_seconds_max"] > 0
+
+
+@pytest.mark.asyncio
+async def test_waiting_for_a_slot_counts_against_the_deadline():
+    pool = UpstreamPool("test", max_workers=1, max_concurrency=1)
+    calls = []
+
+    async def call_upstream():
+        async with pool.slot():
+            calls.append("called")
+
+    async with pool.slot():
+        with deadline_scope(0.05):
+            with pytest.raises(DeadlineExceeded):
+                await call_upstream()
+        # Without a deadline the caller keeps waiting
+        waiter = asyncio.create_task(call_upstream())
+        await asyncio.sleep(0.02)
+        assert not waiter.done()
+
+    await waiter
+    assert calls == ["called"]
+    stats = pool.stats()
+    assert stats["deadline_exceeded"] == 1
+    assert stats["queue_depth"] == 0 and stats["in_flight"] == 0
+
+
+@pytest.mark.asyncio
+async def test_gemini_is_not_called_after_the_deadline_passes_in_the_queue():
+    from backend.app.llm.vertex_ai_utils import VertexAIClient
+
+    class FakeModel:
+        def __init__(self):
+            self.prompts = []
+
+        async def generate_content_async(self, prompt):
+            self.prompts.append(prompt)
+
+    client = VertexAIClient()
+    client._initialized = True
+    client._llm_model = FakeModel()
+    client._llm_pool = UpstreamPool("llm", max_workers=1, max_concurrency=1)
+
+    async with client._llm_pool.slot():
+        with deadline_scope(0.05):
+            with pytest.raises(DeadlineExceeded):
+                await client.generate_text("prompt", timeout=30)
+
+    assert client._llm_model.prompts == []
@@ -0,0 +1,32 @@
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.append(str(Path(__file__).resolve().parents[2]))
+
+from backend.app.core.retrieval_stats import ReviewFillStats
+
+
+def test_fill_rate_and_latency_are_kept_per_mode():
+    stats = ReviewFillStats()
+    stats.record("global", [{"reviews": [1, 2, 3]}, {"reviews": []}], reviews_per_product=3, latency=0.4)
+    stats.record("global", [{"reviews": [1, 2, 3, 4]}], reviews_per_product=3, latency=0.2)
+    stats.record("two_stage", [{"reviews": [1, 2, 3]}, {"reviews": [1]}], reviews_per_product=3, latency=0.3)
+
+    report = stats.stats()
+
+    assert report["global"]["searches"] == 2
+    assert report["global"]["empty_products"] == 1
+    # Extra reviews beyond reviews_per_product do not count towards the fill rate
+    assert report["global"]["fill_rate"] == pytest.approx(6 / 9)
+    assert report["global"]["latency_avg"] == pytest.approx(0.3)
+    assert report["two_stage"]["fill_rate"] == pytest.approx(4 / 6)
+    assert report["two_stage"]["latency_p95"] == pytest.approx(0.3)
+
+
+def test_search_without_products_has_no_fill_rate():
+    stats = ReviewFillStats()
+    stats.record("global", [], reviews_per_product=3, latency=0.1)
+
+    assert stats.stats()["global"]["fill_rate"] is None
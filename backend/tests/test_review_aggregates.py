@@ -0,0 +1,100 @@
+import sys
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+sys.path.append(str(Path(__file__).resolve().parents[2]))
+
+from backend.app.core.local_index import LocalRetriever
+from backend.app.core.review_aggregates import ReviewAggregates
+
+
+@pytest.fixture
+def catalog():
+    products = {
+        "asin": ["P1", "P2"],
+        "product_title": ["Moisturizer", "Earbuds"],
+        "cleaned_item_description": ["Hydrating cream", "Wireless audio"],
+        "product_categories": ["Beauty", "Electronics"],
+    }
+    product_embeddings = np.array([[1.0, 0.0], [0.6, 0.8]])
+    reviews = {
+        "asin": ["P1", "P1", "P1", "P2"],
+        "user_id": ["u1", "u2", "u3", "u4"],
+        "rating": [5, 3, None, 4],
+        "content": ["Keeps my skin soft all day", "Fine, a bit greasy", "Smells like roses", "Great sound quality"],
+        "review_timestamp": [1, 2, 3, 4],
+        "verified_purchase": [True, False, True, True],
+    }
+    review_embeddings = np.array([[2.0, 0.0], [0.0, 1.0], [1.0, 1.0], [0.0, 3.0]])
+    return products, product_embeddings, reviews, review_embeddings
+
+
+def test_build_aggregates_every_review_of_a_product(catalog):
+    _, _, reviews, review_embeddings = catalog
+    aggregates = ReviewAggregates.build(reviews, review_embeddings)
+
+    p1 = aggregates.get("P1")
+    assert p1["review_count"] == 3
+    assert p1["rating_count"] == 2
+    assert p1["avg_rating"] == pytest.approx(4.0)
+    assert p1["rating_histogram"] == [0, 0, 1, 0, 1]
+    assert p1["verified_share"] == pytest.approx(2 / 3)
+    assert aggregates.get("missing") is None
+
+    # Mean of the normalized review embeddings, normalized again
+    expected = np.array([1.0, 0.0]) + np.array([0.0, 1.0]) + np.array([1.0, 1.0]) / np.sqrt(2)
+    expected /= np.linalg.norm(expected)
+    assert aggregates.centroid_distance([1.0, 0.0], "P1") == pytest.approx(1.0 - expected[0], abs=1e-6)
+
+
+def test_aggregates_round_trip_through_npz(tmp_path, catalog):
+    _, _, reviews, review_embeddings = catalog
+    path = str(tmp_path / "aggregates.npz")
+    ReviewAggregates.build(reviews, review_embeddings).save(path)
+
+    loaded = ReviewAggregates.load(path)
+
+    assert len(loaded) == 2
+    assert loaded.get("P2")["avg_rating"] == pytest.approx(4.0)
+    assert loaded.centroid_distance([0.0, 1.0], "P2") == pytest.approx(0.0, abs=1e-6)
+
+
+def test_retriever_takes_ratings_from_aggregates(catalog):
+    products, product_embeddings, reviews, review_embeddings = catalog
+    aggregates = ReviewAggregates.build(reviews, review_embeddings)
+    retriever = LocalRetriever(products, product_embeddings, reviews, review_embeddings, aggregates=aggregates)
+
+    rows = retriever.search([1.0, 0.0], products_k=2, reviews_per_product=1)
+    p1 = next(row for row in rows if row["asin"] == "P1")
+
+    assert len(p1["reviews"]) == 1
+    assert p1["avg_rating"] == pytest.approx(4.0)
+    assert p1["rating_count"] == 2
+
+
+def test_centroid_mode_scores_without_review_search(catalog):
+    products, product_embeddings, reviews, review_embeddings = catalog
+    aggregates = ReviewAggregates.build(reviews, review_embeddings)
+    retriever = LocalRetriever(
+        products, product_embeddings, reviews, review_embeddings, review_mode="centroid", aggregates=aggregates
+    )
+
+    rows = retriever.search([1.0, 0.0], products_k=2, reviews_per_product=2)
+    by_asin = {row["asin"]: row for row in rows}
+
+    p1 = by_asin["P1"]
+    expected = (
+        0.7 * p1["product_similarity"]
+        + 0.2 * aggregates.centroid_distance([1.0, 0.0], "P1")
+        + 0.1 * (4.0 / 5)
+    )
+    assert p1["combined_score"] == pytest.approx(expected)
+    assert [r["user_id"] for r in p1["reviews"]] == ["u1", "u2"]
+    assert [r["user_id"] for r in by_asin["P2"]["reviews"]] == ["u4"]
+
+
+def test_centroid_mode_requires_aggregates(catalog):
+    with pytest.raises(ValueError):
+        LocalRetriever(*catalog, review_mode="centroid")
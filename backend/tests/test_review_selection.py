@@ -0,0 +1,69 @@
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[2]))
+
+from backend.app.core.review_selection import ReviewSelector
+
+
+def word_count(text: str) -> int:
+    return len(text.split())
+
+
+def make_selector(**kwargs):
+    kwargs.setdefault("min_review_tokens", 3)
+    return ReviewSelector(word_count, **kwargs)
+
+
+def test_near_duplicate_reviews_are_dropped():
+    reviews = [
+        {"content": "The battery lasts all day and charging is quick with the included cable", "similarity": 0.1},
+        {"content": "The battery lasts all day and charging is quick with the included cable!", "similarity": 0.2},
+        {"content": "Sound quality is muddy at high volume", "similarity": 0.3},
+    ]
+
+    selection = make_selector().select("battery life", reviews)
+
+    assert [r["content"] for r in selection.reviews] == [reviews[0]["content"], reviews[2]["content"]]
+    assert selection.report.duplicates_dropped == 1
+
+
+def test_budget_keeps_the_closest_reviews():
+    reviews = [
+        {"content": "unrelated rant about shipping box damage", "similarity": 0.6},
+        {"content": "close match about battery life", "similarity": 0.05},
+    ]
+
+    selection = make_selector(token_budget=6).select("battery life", reviews)
+
+    assert [r["content"] for r in selection.reviews] == ["close match about battery life"]
+
+
+def test_budget_prefers_rated_verified_and_similar_reviews():
+    reviews = [
+        {"content": "one two three four five", "similarity": 0.5},
+        {"content": "alpha beta gamma delta epsilon", "similarity": 0.5, "rating": 5, "verified_purchase": True},
+        {"content": "red green blue cyan magenta", "similarity": 0.35},
+        {"content": "no distance at all here", "rating": 4},
+    ]
+
+    selection = make_selector(token_budget=10).select("colors", reviews)
+
+    assert [r["content"] for r in selection.reviews] == [reviews[1]["content"], reviews[2]["content"]]
+    assert selection.reviews[0]["rating"] == 5
+    report = selection.report.as_dict()
+    assert report["tokens_before"] == 20 and report["tokens_after"] == 10 and report["tokens_saved"] == 10
+
+
+def test_long_review_is_trimmed_to_query_relevant_sentences():
+    review = {
+        "content": (
+            "I bought this for my kitchen. The blender crushes ice easily. Shipping took a week. "
+            "Cleaning the blender jar is simple. The box was dented."
+        )
+    }
+
+    selection = make_selector(max_review_tokens=12).select("blender ice", [review])
+
+    assert selection.reviews[0]["content"] == "The blender crushes ice easily. Cleaning the blender jar is simple."
+    assert review["content"].startswith("I bought")
@@ -0,0 +1,319 @@
+import asyncio
+import sys
+from pathlib import Path
+from typing import Any, Dict, List
+
+import pytest
+
+sys.path.append(str(Path(__file__).resolve().parents[2]))
+
+from backend.app import config
+from backend.app.core import search_engine
+from backend.app.core.lexical_index import LexicalIndexBuilder
+from backend.app.core.search_engine import SearchEngine
+from backend.app.core.search_service import SearchService
+from backend.app.db.columnar import ColumnarResult
+from backend.app.schemas.search import SearchFilters
+
+
+class FakeVertexClient:
+    def __init__(self):
+        self.embedded: List[str] = []
+
+    async def get_embeddings(self, text: str) -> List[float]:
+        self.embedded.append(text)
+        return [1.0, 0.0]
+
+    async def get_embeddings_batch(self, texts: List[str]) -> List[List[float]]:
+        self.embedded.extend(texts)
+        return [[1.0, 0.0] for _ in texts]
+
+
+def result_row(asin: str, score: float, reviews: List[Dict[str, Any]] = ()) -> Dict[str, Any]:
+    return {
+        "asin": asin,
+        "product_title": f"Title {asin}",
+        "cleaned_item_description": "",
+        "product_categories": "",
+        "product_similarity": score,
+        "avg_rating": 4.0,
+        "rating_count": 2,
+        "combined_score": score,
+        "reviews": list(reviews),
+    }
+
+
+REVIEW = {
+    "user_id": "u1",
+    "rating": 5,
+    "review_content": "Loud and clear sound",
+    "review_timestamp": 1,
+    "verified_purchase": True,
+    "review_similarity": 0.1,
+    "has_rating": 1,
+}
+
+
+@pytest.fixture
+def engine():
+    return SearchEngine(vertex_ai_client=FakeVertexClient())
+
+
+def test_arrow_and_row_results_structure_the_same(engine):
+    pa = pytest.importorskip("pyarrow")
+    rows = [result_row("A", 0.9, [REVIEW]), result_row("B", 0.5)]
+
+    from_rows = engine._structure_results(rows)
+    from_arrow = engine._structure_results(ColumnarResult(pa.Table.from_pylist(rows)))
+
+    for product in from_rows + from_arrow:
+        product.pop("displayed_rating")
+    assert from_arrow == from_rows
+    assert from_rows[0]["reviews"] == [
+        {
+            "content": "Loud and clear sound",
+            "rating": 5,
+            "similarity": 0.1,
+            "verified_purchase": True,
+            "user_id": "u1",
+            "timestamp": 1,
+            "has_rating": 1,
+        }
+    ]
+
+
+def test_missing_review_fields_get_the_same_defaults_on_both_paths(engine):
+    pa = pytest.importorskip("pyarrow")
+    # Older result shapes have no verified_purchase / has_rating struct fields
+    review = {key: value for key, value in REVIEW.items() if key not in ("verified_purchase", "has_rating")}
+    rows = [result_row("A", 0.9, [review])]
+
+    from_rows = engine._structure_results(rows)
+    from_arrow = engine._structure_results(ColumnarResult(pa.Table.from_pylist(rows)))
+
+    assert from_arrow[0]["reviews"] == from_rows[0]["reviews"]
+    assert from_arrow[0]["reviews"][0]["verified_purchase"] is False
+    assert from_arrow[0]["reviews"][0]["has_rating"] == 0
+
+
+class FakeRetriever:
+    """Local retriever returning fixed vector results and looking products up by ASIN."""
+
+    review_mode = "global"
+
+    def __init__(self, vector_asins: List[str]):
+        self.vector_asins = vector_asins
+        self.searches = 0
+        self.lookups: List[List[str]] = []
+
+    def search(self, embedding, products_k, reviews_per_product, filters=None):
+        self.searches += 1
+        return [result_row(asin, 1.0 - rank / 10) for rank, asin in enumerate(self.vector_asins)]
+
+    def lookup(self, asins, reviews_per_product):
+        self.lookups.append(list(asins))
+        return [result_row(asin, None) for asin in asins]
+
+
+@pytest.fixture
+def lexical_index():
+    builder = LexicalIndexBuilder()
+    builder.add_many(
+        ["A", "B", "C", "D", "E"],
+        [
+            "Bluetooth speaker",
+            "Portable radio",
+            "Waterproof speaker with deep bass",
+            "Sony WH-1000XM4 headphones with deep bass",
+            "Sony WH-1000XM5 headphones",
+        ],
+    )
+    return builder.build()
+
+
+@pytest.fixture
+def lexical_engine(lexical_index):
+    engine = SearchEngine(
+        vertex_ai_client=FakeVertexClient(),
+        local_retriever=FakeRetriever(["A", "B", "C"]),
+        lexical_index=lexical_index,
+    )
+    engine.lexical_rrf_k = 60
+    engine.lexical_exact_match = True
+    return engine
+
+
+@pytest.mark.asyncio
+async def test_lexical_ranking_is_fused_with_vector_results(lexical_engine):
+    results = await lexical_engine.hybrid_search("deep bass", products_k=4)
+
+    # BM25 ranks C and D; C is in both rankings, D is only found lexically
+    assert [product["asin"] for product in results] == ["C", "A", "B", "D"]
+    assert lexical_engine.local_retriever.lookups == [["D"]]
+    assert results[3]["combined_score"] is None
+    assert lexical_engine.vertex_client.embedded == ["deep bass"]
+
+
+@pytest.mark.asyncio
+async def test_exact_match_skips_embedding_and_vector_search(lexical_engine):
+    service = SearchService(lexical_engine)
+
+    assert service.is_exact_match("WH-1000XM4", 3)
+    results = await lexical_engine.hybrid_search("WH-1000XM4", products_k=3)
+
+    # The named product first, the rest of the slots filled from the BM25 ranking
+    assert [product["asin"] for product in results] == ["D", "E"]
+    assert lexical_engine.vertex_client.embedded == []
+    assert lexical_engine.local_retriever.searches == 0
+    assert lexical_engine.stats()["lexical_exact"]["searches"] == 1
+    assert not service.is_exact_match("speaker", 3)
+
+
+@pytest.mark.asyncio
+async def test_filtered_queries_skip_the_lexical_index(lexical_engine):
+    results = await lexical_engine.hybrid_search("WH-1000XM4", products_k=3, filters=SearchFilters(min_rating=4))
+
+    assert [product["asin"] for product in results] == ["A", "B", "C"]
+    assert lexical_engine.local_retriever.lookups == []
+
+
+class FakeBigQuery:
+    def __init__(self, rows: List[Dict[str, Any]]):
+        self.rows = rows
+        self.calls: List[Any] = []
+
+    async def execute_query(self, query: str, query_parameters=None, **kwargs):
+        self.calls.append((query, query_parameters))
+        return self.rows
+
+    async def execute_query_arrow(self, query: str, query_parameters=None, **kwargs):
+        import pyarrow as pa
+
+        self.calls.append((query, query_parameters))
+        return ColumnarResult(pa.Table.from_pylist(self.rows))
+
+
+@pytest.mark.asyncio
+async def test_bigquery_lookup_keeps_requested_order(engine):
+    engine.bq_client = FakeBigQuery([result_row("B", None), result_row("A", None)])
+    engine.use_arrow_results = False
+
+    rows = await engine._lookup_products(["B", "A"], 2)
+
+    query, parameters = engine.bq_client.calls[0]
+    assert [row["asin"] for row in rows] == ["B", "A"]
+    assert "UNNEST(@asins) AS asin WITH OFFSET AS pos" in query
+    assert query.rstrip().endswith("ORDER BY q.pos;")
+    values = {parameter.name: parameter for parameter in parameters}
+    assert values["asins"].values == ["B", "A"]
+    assert values["reviews_per_product"].value == 2
+
+
+def batch_row(query_id: int, asin: str, score: float) -> Dict[str, Any]:
+    return {"query_id": query_id, **result_row(asin, score, [REVIEW])}
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("use_arrow", [False, True])
+async def test_batch_rows_are_regrouped_per_query(engine, use_arrow):
+    if use_arrow:
+        pytest.importorskip("pyarrow")
+    # One job returns the rows of every query, in no particular order; query 1 has none
+    engine.bq_client = FakeBigQuery(
+        [batch_row(2, "C", 0.3), batch_row(0, "A", 0.1), batch_row(2, "D", 0.4), batch_row(0, "B", 0.2)]
+    )
+    engine.use_arrow_results = use_arrow
+
+    results = await engine.hybrid_search_batch(
+        ["q0", "q1", "q2"], products_k=2, query_embeddings=[[1.0, 0.0], [0.0, 1.0], [1.0, 1.0]]
+    )
+
+    assert len(engine.bq_client.calls) == 1
+    assert [[product["asin"] for product in products] for products in results] == [["A", "B"], [], ["C", "D"]]
+    assert results[0][0]["reviews"][0]["content"] == "Loud and clear sound"
+    _, parameters = engine.bq_client.calls[0]
+    values = {parameter.name: parameter for parameter in parameters}
+    assert values["embeddings"].values == [1.0, 0.0, 0.0, 1.0, 1.0, 1.0]
+    assert values["dim"].value == 2
+
+
+@pytest.mark.asyncio
+async def test_search_sql_text_is_reused_per_shape(engine):
+    engine.bq_client = FakeBigQuery([result_row("A", 0.9)])
+    engine.use_arrow_results = False
+
+    await engine.hybrid_search("first query", products_k=5, query_embedding=[1.0, 0.0])
+    await engine.hybrid_search("second query", products_k=5, query_embedding=[0.0, 1.0])
+    await engine.hybrid_search("third query", products_k=4, query_embedding=[0.0, 1.0])
+
+    (first_sql, first_params), (second_sql, second_params), (third_sql, _) = engine.bq_client.calls
+    assert first_sql is second_sql
+    assert third_sql is not first_sql
+    assert engine._search_sql(5, 3) is first_sql
+    assert "@embedding" in first_sql and "[1.0, 0.0]" not in first_sql
+    embeddings = [
+        next(p.values for p in params if p.name == "embedding") for params in (first_params, second_params)
+    ]
+    assert embeddings == [[1.0, 0.0], [0.0, 1.0]]
+
+
+@pytest.mark.asyncio
+async def test_table_function_rows_are_regrouped_per_product(engine):
+    engine.search_mode = "table_function"
+    engine.search_function = "ds.product_with_reviews_search"
+    engine.bq_client = FakeBigQuery(
+        [
+            {"product_asin": "A", "product_title": "Speaker", "product_similarity": 0.2,
+             "review_content": "Loud", "review_rating": 5, "review_similarity": 0.1, "verified_purchase": True},
+            {"product_asin": "A", "product_title": "Speaker", "product_similarity": 0.2,
+             "review_content": "Quiet", "review_rating": 3, "review_similarity": 0.3, "verified_purchase": False},
+            {"product_asin": "B", "product_title": "Radio", "product_similarity": 0.4,
+             "review_content": None, "review_rating": None, "review_similarity": None},
+        ]
+    )
+
+    results = await engine.hybrid_search("speaker", products_k=2, reviews_per_product=2)
+
+    query, parameters = engine.bq_client.calls[0]
+    assert query == "SELECT * FROM `ds.product_with_reviews_search`(@query, @products_k, @reviews_per_product)"
+    assert {p.name: p.value for p in parameters} == {"query": "speaker", "products_k": 2, "reviews_per_product": 2}
+    # The table function embeds the query itself
+    assert engine.vertex_client.embedded == []
+    assert [product["asin"] for product in results] == ["A", "B"]
+    speaker, radio = results
+    assert [review["content"] for review in speaker["reviews"]] == ["Loud", "Quiet"]
+    assert speaker["avg_rating"] == pytest.approx(4.0)
+    assert speaker["rating_count"] == 2
+    assert speaker["combined_score"] == pytest.approx(0.7 * 0.2 + 0.2 * 0.2 + 0.1 * 4.0 / 5)
+    assert radio["reviews"] == [] and radio["avg_rating"] is None
+    assert radio["combined_score"] == pytest.approx(0.7 * 0.4)
+
+
+def test_table_function_mode_requires_a_function_name(monkeypatch):
+    monkeypatch.setattr(search_engine, "BIGQUERY_SEARCH_MODE", "table_function")
+    monkeypatch.setattr(search_engine, "BIGQUERY_SEARCH_FUNCTION", None)
+
+    with pytest.raises(ValueError, match="BIGQUERY_SEARCH_FUNCTION"):
+        SearchEngine(vertex_ai_client=FakeVertexClient())
+
+
+def test_centroid_mode_requires_an_aggregates_table(monkeypatch):
+    monkeypatch.setattr(search_engine, "RETRIEVAL_REVIEW_MODE", "centroid")
+    monkeypatch.setattr(search_engine, "BIGQUERY_REVIEW_AGGREGATES_TABLE", None)
+
+    with pytest.raises(ValueError, match="BIGQUERY_REVIEW_AGGREGATES_TABLE"):
+        SearchEngine(vertex_ai_client=FakeVertexClient())
+
+
+def test_dataset_object_defaults_need_a_dataset(monkeypatch):
+    monkeypatch.delenv("BIGQUERY_SEARCH_FUNCTION", raising=False)
+    monkeypatch.setattr(config, "BIGQUERY_DATASET_ID", None)
+    assert config._get_dataset_object_env("BIGQUERY_SEARCH_FUNCTION", "product_with_reviews_search") is None
+
+    monkeypatch.setattr(config, "BIGQUERY_DATASET_ID", "amazon_dataset")
+    assert (
+        config._get_dataset_object_env("BIGQUERY_SEARCH_FUNCTION", "product_with_reviews_search")
+        == "amazon_dataset.product_with_reviews_search"
+    )
+    monkeypatch.setenv("BIGQUERY_SEARCH_FUNCTION", "other.fn")
+    assert config._get_dataset_object_env("BIGQUERY_SEARCH_FUNCTION", "product_with_reviews_search") == "other.fn"
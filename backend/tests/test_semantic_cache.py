@@ -0,0 +1,49 @@
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[2]))
+
+from backend.app.core.semantic_cache import SemanticResponseCache
+
+
+def test_lookup_returns_entry_above_threshold():
+    cache = SemanticResponseCache(capacity=4, similarity_threshold=0.95)
+    cache.store([1.0, 0.0, 0.0], "moisturizer response", namespace=3)
+
+    assert cache.lookup([0.99, 0.05, 0.0], namespace=3) == "moisturizer response"
+    assert cache.lookup([0.0, 1.0, 0.0], namespace=3) is None
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 1
+
+
+def test_lookup_is_partitioned_by_namespace():
+    cache = SemanticResponseCache(capacity=4)
+    cache.store([1.0, 0.0], "three results", namespace=3)
+
+    assert cache.lookup([1.0, 0.0], namespace=5) is None
+
+
+def test_entries_expire_after_ttl():
+    now = [0.0]
+    cache = SemanticResponseCache(capacity=4, ttl_seconds=10, clock=lambda: now[0])
+    cache.store([1.0, 0.0], "stale")
+
+    now[0] = 10.5
+    assert cache.lookup([1.0, 0.0]) is None
+
+
+def test_capacity_evicts_least_recently_used():
+    now = [0.0]
+    cache = SemanticResponseCache(capacity=2, ttl_seconds=None, clock=lambda: now[0])
+    cache.store([1.0, 0.0, 0.0], "a")
+    now[0] = 1.0
+    cache.store([0.0, 1.0, 0.0], "b")
+    now[0] = 2.0
+    cache.lookup([1.0, 0.0, 0.0])
+    now[0] = 3.0
+    cache.store([0.0, 0.0, 1.0], "c")
+
+    assert cache.lookup([1.0, 0.0, 0.0]) == "a"
+    assert cache.lookup([0.0, 1.0, 0.0]) is None
+    assert cache.lookup([0.0, 0.0, 1.0]) == "c"
+    assert cache.stats()["evictions"] == 1
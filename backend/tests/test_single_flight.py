@@ -0,0 +1,118 @@
+import asyncio
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.append(str(Path(__file__).resolve().parents[2]))
+
+from backend.app.utils.deadline import DeadlineExceeded, deadline_scope, remaining_time
+from backend.app.utils.single_flight import SingleFlight
+
+
+@pytest.mark.asyncio
+async def test_concurrent_calls_share_one_execution():
+    flight = SingleFlight("test")
+    runs = []
+
+    async def work():
+        runs.append(1)
+        await asyncio.sleep(0.01)
+        return ["result"]
+
+    results = await asyncio.gather(*(flight.do("k", work) for _ in range(5)))
+
+    assert len(runs) == 1
+    assert all(result is results[0] for result in results)
+    assert flight.key_stats("k") == {"calls": 5, "leaders": 1, "coalesced": 4, "errors": 0, "cancelled": 0}
+    assert flight.stats()["in_flight"] == 0
+
+    await flight.do("k", work)
+    assert len(runs) == 2
+
+
+@pytest.mark.asyncio
+async def test_errors_reach_every_waiter():
+    flight = SingleFlight("test")
+
+    async def fail():
+        await asyncio.sleep(0.01)
+        raise RuntimeError("upstream down")
+
+    results = await asyncio.gather(flight.do("k", fail), flight.do("k", fail), return_exceptions=True)
+
+    assert all(isinstance(result, RuntimeError) for result in results)
+    assert flight.key_stats("k")["errors"] == 1
+
+
+@pytest.mark.asyncio
+async def test_cancelled_waiter_does_not_cancel_shared_work():
+    flight = SingleFlight("test")
+    release = asyncio.Event()
+
+    async def work():
+        await release.wait()
+        return 42
+
+    first = asyncio.create_task(flight.do("k", work))
+    second = asyncio.create_task(flight.do("k", work))
+    await asyncio.sleep(0)
+    first.cancel()
+    await asyncio.sleep(0)
+    release.set()
+
+    assert await second == 42
+    with pytest.raises(asyncio.CancelledError):
+        await first
+    assert flight.stats()["cancelled"] == 0
+
+
+@pytest.mark.asyncio
+async def test_shared_work_is_cancelled_when_last_waiter_leaves():
+    flight = SingleFlight("test")
+    started = asyncio.Event()
+    cancelled = asyncio.Event()
+
+    async def work():
+        started.set()
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.set()
+            raise
+
+    waiter = asyncio.create_task(flight.do("k", work))
+    await started.wait()
+    waiter.cancel()
+    await asyncio.sleep(0.01)
+
+    assert cancelled.is_set()
+    assert flight.stats() == {
+        "calls": 1, "leaders": 1, "coalesced": 0, "errors": 0, "cancelled": 1, "in_flight": 0
+    }
+
+
+@pytest.mark.asyncio
+async def test_each_caller_waits_within_its_own_deadline():
+    flight = SingleFlight("test")
+    seen_budgets = []
+
+    async def work():
+        seen_budgets.append(remaining_time())
+        await asyncio.sleep(0.05)
+        return "done"
+
+    async def call(budget):
+        with deadline_scope(budget):
+            return await flight.do("k", work)
+
+    short_leader, unbounded = await asyncio.gather(call(0.01), call(None), return_exceptions=True)
+    assert isinstance(short_leader, DeadlineExceeded)
+    assert unbounded == "done"
+    # The shared work does not inherit the leader's deadline
+    assert seen_budgets == [None]
+
+    long_leader, short_follower = await asyncio.gather(call(1.0), call(0.01), return_exceptions=True)
+    assert long_leader == "done"
+    assert isinstance(short_follower, DeadlineExceeded)
+    assert flight.stats()["cancelled"] == 0
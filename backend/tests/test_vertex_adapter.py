@@ -0,0 +1,60 @@
+import asyncio
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.append(str(Path(__file__).resolve().parents[2]))
+
+from backend.app.llm.vertex_adapter import VertexAILangChainWrapper
+
+
+class SlowClient:
+    def __init__(self):
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def generate_text(self, prompt: str) -> str:
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(0.01)
+            if prompt == "fail":
+                raise RuntimeError("quota exceeded")
+            return prompt.upper()
+        finally:
+            self.in_flight -= 1
+
+
+@pytest.mark.asyncio
+async def test_agenerate_issues_prompts_concurrently_in_order():
+    client = SlowClient()
+    wrapper = VertexAILangChainWrapper(client)
+
+    result = await wrapper.agenerate(["a", "b", "c"])
+
+    assert [g[0].text for g in result.generations] == ["A", "B", "C"]
+    assert client.max_in_flight == 3
+
+
+@pytest.mark.asyncio
+async def test_agenerate_propagates_failures():
+    wrapper = VertexAILangChainWrapper(SlowClient())
+
+    with pytest.raises(RuntimeError):
+        await wrapper.agenerate(["a", "fail"])
+
+
+class StreamingClient:
+    async def stream_text(self, prompt: str):
+        for piece in ['{"results": ', "", "[]}"]:
+            yield piece
+
+
+@pytest.mark.asyncio
+async def test_astream_forwards_client_chunks():
+    wrapper = VertexAILangChainWrapper(StreamingClient())
+
+    chunks = [chunk async for chunk in wrapper.astream("prompt")]
+
+    assert chunks == ['{"results": ', "[]}"]
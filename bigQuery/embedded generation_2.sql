@@ -2,6 +2,10 @@ CREATE OR REPLACE TABLE `amazon_dataset.product_embeddings` AS
 SELECT 
   asin,
   content,
+  -- Stored on the vector index for prefiltered VECTOR_SEARCH (vector_index.sql)
+  main_category,
+  average_rating,
+  price,
   ml_generate_embedding_result as embedding
 FROM ML.GENERATE_EMBEDDING(
   MODEL `amazon_dataset.Embeddings`,
@@ -10,11 +14,16 @@ FROM ML.GENERATE_EMBEDDING(
     product_title,
     cleaned_item_description,
     product_categories,
+    main_category,
+    average_rating,
+    price,
     CONCAT(product_title, ' ', cleaned_item_description, ' ', product_categories) AS content 
    FROM `amazon_dataset.unique_products`)
 );
 
-CREATE OR REPLACE TABLE `amazon_dataset.review_embeddings` AS
+-- Clustered by asin so per-product review lookups (two-stage retrieval) read few blocks
+CREATE OR REPLACE TABLE `amazon_dataset.review_embeddings`
+CLUSTER BY asin AS
 SELECT 
   user_id,
   asin,
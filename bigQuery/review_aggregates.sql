@@ -0,0 +1,52 @@
+-- Per-product review aggregates, joined by the search query instead of averaging the
+-- few vector-matched reviews at query time (REVIEW_AGGREGATES_ENABLED=true).
+-- Run after `embedded generation_2.sql`; rebuild whenever review_embeddings changes.
+-- centroid is the normalized mean of the product's normalized review embeddings and is
+-- used by RETRIEVAL_REVIEW_MODE=centroid in place of a review VECTOR_SEARCH.
+CREATE OR REPLACE TABLE `amazon_dataset.product_review_aggregates`
+CLUSTER BY asin AS
+WITH review_stats AS (
+  SELECT
+    asin,
+    COUNT(*) AS review_count,
+    COUNTIF(rating > 0) AS rating_count,
+    AVG(IF(rating > 0, rating, NULL)) AS avg_rating,
+    [COUNTIF(rating = 1), COUNTIF(rating = 2), COUNTIF(rating = 3), COUNTIF(rating = 4), COUNTIF(rating = 5)]
+      AS rating_histogram,
+    AVG(IF(verified_purchase, 1, 0)) AS verified_share
+  FROM `amazon_dataset.unique_reviews`
+  GROUP BY asin
+),
+unit_embeddings AS (
+  SELECT
+    asin,
+    embedding,
+    SQRT((SELECT SUM(x * x) FROM UNNEST(embedding) AS x)) AS norm
+  FROM `amazon_dataset.review_embeddings`
+  WHERE ARRAY_LENGTH(embedding) > 0
+),
+dimension_sums AS (
+  SELECT asin, pos, SUM(x / norm) AS total
+  FROM unit_embeddings, UNNEST(embedding) AS x WITH OFFSET AS pos
+  WHERE norm > 0
+  GROUP BY asin, pos
+),
+centroids AS (
+  SELECT asin, ARRAY_AGG(total / magnitude ORDER BY pos) AS centroid
+  FROM (
+    SELECT asin, pos, total, SQRT(SUM(total * total) OVER (PARTITION BY asin)) AS magnitude
+    FROM dimension_sums
+  )
+  WHERE magnitude > 0
+  GROUP BY asin
+)
+SELECT
+  s.asin,
+  s.review_count,
+  s.rating_count,
+  s.avg_rating,
+  s.rating_histogram,
+  s.verified_share,
+  IFNULL(c.centroid, []) AS centroid
+FROM review_stats s
+LEFT JOIN centroids c USING (asin);
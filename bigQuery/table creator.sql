@@ -5,12 +5,16 @@ SELECT
   product_title,
   cleaned_item_description,
   product_categories,
+  -- Filter columns for search prefilters
+  main_category,
+  average_rating,
+  price,
   ARRAY_AGG(DISTINCT feature IGNORE NULLS) AS feature_list
 FROM `amazon_dataset.amazon-table` AS t,
      UNNEST(t.product_features.list) AS feature_record,
      UNNEST([feature_record.element]) AS feature
 WHERE cleaned_item_description IS NOT NULL
-GROUP BY asin, product_title, cleaned_item_description, product_categories;
+GROUP BY asin, product_title, cleaned_item_description, product_categories, main_category, average_rating, price;
 
 -- Create unique reviews table
 CREATE OR REPLACE TABLE `amazon_dataset.unique_reviews` AS
@@ -1,6 +1,8 @@
--- Create an index for product embeddings
+-- Create an index for product embeddings. The STORING columns let VECTOR_SEARCH apply
+-- the /search category, rating and price filters as prefilters inside the index.
 CREATE OR REPLACE VECTOR INDEX `amazon_dataset.product_index`
 ON `amazon_dataset.product_embeddings`(embedding)
+STORING (main_category, average_rating, price)
 OPTIONS (distance_type = 'COSINE', index_type = 'treeAH');
 
 -- Create an index for review embeddings
@@ -68,7 +68,7 @@ def etl_category(category_name):
     metadata_pd = metadata_pd.applymap(convert_all_numpy)
 
     metadata_pd['rating_number'] = metadata_pd['rating_number'].fillna(0).astype(int)
-    metadata_pd['average_rating'] = metadata_pd['rating_number'].fillna(0.0).astype(float)
+    metadata_pd['average_rating'] = metadata_pd['average_rating'].fillna(0.0).astype(float)
 
     # --- Define Explicit Schemas ---
     reviews_schema = StructType([
@@ -126,6 +126,8 @@ def etl_category(category_name):
         col("title").alias("product_title"),
         col("average_rating"),
         col("rating_number"),
+        # "$1,299.00" -> 1299.0; missing or unparseable prices become NULL
+        regexp_replace(col("price"), "[^0-9.]", "").cast(FloatType()).alias("price"),
         concat_ws(" ",
                  col("title"),
                  col("description"),
@@ -160,6 +162,7 @@ def etl_category(category_name):
         "product_title",
         "average_rating",
         "rating_number",
+        "price",
         "item_description",
         "cleaned_item_description",
         "product_features",
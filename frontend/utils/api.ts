@@ -1,4 +1,5 @@
 import axios, { AxiosError } from "axios"
+import type { ProductAnalysis, ProductRecommendation } from "@/types"
 
 const API_BASE_URL = process.env.NEXT_PUBLIC_API_BASE_URL || "http://localhost:8000"
 
@@ -22,4 +23,50 @@ export const searchProducts = async (query: string) => {
     console.error("Error searching products:", errorMessage)
     throw new Error(errorMessage)
   }
-}
\ No newline at end of file
+}
+export type SearchStreamEvent =
+  | { event: "results"; query: string; count: number; results: ProductRecommendation[] }
+  | { event: "analysis"; asin: string; analysis: ProductAnalysis }
+  | { event: "done"; query: string; count: number }
+  | { event: "error"; detail: string }
+
+// Streams /search/stream NDJSON events: retrieved products arrive first, then one
+// analysis per product as the backend finishes it.
+export const searchProductsStream = async (
+  query: string,
+  onEvent: (event: SearchStreamEvent) => void,
+  signal?: AbortSignal,
+) => {
+  const url = `${API_BASE_URL}/search/stream?${new URLSearchParams({ query })}`
+  const response = await fetch(url, { signal })
+  if (!response.ok || !response.body) {
+    let errorMessage = `Request failed with status ${response.status}`
+    try {
+      const body = await response.json()
+      errorMessage = body?.detail || errorMessage
+    } catch {
+      // keep the status-based message
+    }
+    console.error("Error streaming products:", errorMessage)
+    throw new Error(errorMessage)
+  }
+
+  const reader = response.body.getReader()
+  const decoder = new TextDecoder()
+  let buffered = ""
+  while (true) {
+    const { done, value } = await reader.read()
+    buffered += decoder.decode(value, { stream: !done })
+    const lines = buffered.split("\n")
+    buffered = lines.pop() ?? ""
+    for (const line of lines) {
+      if (line.trim()) {
+        onEvent(JSON.parse(line) as SearchStreamEvent)
+      }
+    }
+    if (done) break
+  }
+  if (buffered.trim()) {
+    onEvent(JSON.parse(buffered) as SearchStreamEvent)
+  }
+}